@@ -1,4 +1,5 @@
 import os
+import time
 from datetime import timedelta
 from flask import Flask, render_template_string
 from werkzeug.middleware.proxy_fix import ProxyFix  # CRÍTICO PARA O RENDER
@@ -8,6 +9,7 @@ from .extensions import db, migrate, login_manager, limiter
 
 
 def create_app():
+    inicio = time.perf_counter()
     app = Flask(__name__, instance_relative_config=False)
 
     # --------------------------
@@ -21,6 +23,12 @@ def create_app():
         x_prefix=1
     )
 
+    # gzip/brotli das respostas de texto (HTML, JSON); SIIF_COMPRESSAO=0 desliga
+    # (ex: quando o proxy na frente já comprime)
+    if os.environ.get('SIIF_COMPRESSAO', '1') == '1':
+        from app.compressao import Compressao
+        app.wsgi_app = Compressao(app.wsgi_app, minimo=int(os.environ.get('COMPRESSAO_MINIMO', 1024)))
+
     # --------------------------
     # 2. BANCO DE DADOS (CORREÇÃO POSTGRESQL)
     # --------------------------
@@ -63,11 +71,62 @@ def create_app():
     app.config['FORUM_POSTS_PER_PAGE'] = int(os.environ.get('FORUM_POSTS_PER_PAGE', 30))
     app.config['FORUM_MIN_REPLY_INTERVAL'] = float(os.environ.get('FORUM_MIN_REPLY_INTERVAL', 2.0))
 
+    # Tempo real (SSE): cada conexão fica aberta no worker, então limitamos
+    # quantas existem e por quanto tempo (o navegador reconecta sozinho).
+    # Desligado por padrão: com workers síncronos do gunicorn cada aba aberta
+    # prende um worker inteiro. Ligar (SIIF_TEMPO_REAL=1) só rodando com
+    # `gunicorn -k gevent` (ver README). SSE_MAX_CONEXOES vale por worker.
+    app.config['TEMPO_REAL_ATIVO'] = os.environ.get('SIIF_TEMPO_REAL', '0') == '1'
+    app.config['SSE_MAX_CONEXOES'] = int(os.environ.get('SSE_MAX_CONEXOES', 200))
+    app.config['SSE_HEARTBEAT'] = float(os.environ.get('SSE_HEARTBEAT', 15))
+    app.config['SSE_DURACAO_MAXIMA'] = float(os.environ.get('SSE_DURACAO_MAXIMA', 300))
+
+    # Tarefas em segundo plano (ex: notificar membros de uma comunidade)
+    app.config['TAREFAS_MAX_THREADS'] = int(os.environ.get('TAREFAS_MAX_THREADS', 2))
+    app.config['TAREFAS_SINCRONAS'] = os.environ.get('TAREFAS_SINCRONAS', '0') == '1'
+
+    # Cache do app (app/cache.py): 'memoria' (LRU por processo) ou 'sqlite' (arquivo compartilhado pelos workers)
+    app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'memoria')
+    app.config['CACHE_ARQUIVO'] = os.environ.get('CACHE_ARQUIVO', os.path.join(app.instance_path, 'cache.sqlite3'))
+    app.config['CACHE_MAX_ITENS'] = int(os.environ.get('CACHE_MAX_ITENS', 10000))
+    app.config['CACHE_TTL'] = float(os.environ.get('CACHE_TTL', 60))
+
+    # Painel admin: por quantos segundos os contadores do topo ficam em cache
+    app.config['ESTATISTICAS_TTL'] = float(os.environ.get('ESTATISTICAS_TTL', 10))
+
+    # "Meu feed" do fórum: por quantos segundos a página de cada usuário fica em cache
+    app.config['FEED_TTL'] = float(os.environ.get('FEED_TTL', 30))
+
+    # Corpo dos cards de tópico já renderizado: validade máxima no cache (segundos)
+    app.config['FRAGMENTOS_TTL'] = float(os.environ.get('FRAGMENTOS_TTL', 300))
+
+    # Orçamento de tempo do create_app (ms); acima disso fica um aviso no log
+    app.config['ORCAMENTO_INICIALIZACAO_MS'] = float(os.environ.get('ORCAMENTO_INICIALIZACAO_MS', 400))
+
+    # Instrumentação de SQL por requisição (Server-Timing, log de lentas, histogramas)
+    app.config['INSTRUMENTACAO_SQL'] = os.environ.get('SIIF_INSTRUMENTACAO', '0') == '1'
+    app.config['INSTRUMENTACAO_LIMITE_MS'] = float(os.environ.get('INSTRUMENTACAO_LIMITE_MS', 500))
+    app.config['INSTRUMENTACAO_TOP_CONSULTAS'] = int(os.environ.get('INSTRUMENTACAO_TOP_CONSULTAS', 5))
+
+    # Métricas do Prometheus em /metrics (token opcional; sem token só admin logado vê)
+    app.config['METRICAS_ATIVAS'] = os.environ.get('SIIF_METRICAS', '1') == '1'
+    app.config['METRICAS_TOKEN'] = os.environ.get('METRICAS_TOKEN')
+    app.config['METRICAS_ARQUIVO_AGREGADOR'] = os.environ.get(
+        'METRICAS_ARQUIVO_AGREGADOR',
+        os.path.join(app.instance_path, 'agregador_metricas.json')
+    )
+    # Um arquivo por worker, somados no /metrics (vazio desliga: cada processo só os seus)
+    app.config['METRICAS_DIRETORIO'] = os.environ.get(
+        'METRICAS_DIRETORIO', os.path.join(app.instance_path, 'metricas')
+    )
+    app.config['METRICAS_INTERVALO'] = float(os.environ.get('METRICAS_INTERVALO', 5))
+
     # --------------------------
     # 5. INICIALIZAÇÃO DE EXTENSÕES
     # --------------------------
     db.init_app(app)
-    migrate.init_app(app, db)
+    # Caminho absoluto: o `flask siif init` aplica as migrações de qualquer pasta
+    migrate.init_app(app, db, directory=os.path.join(os.path.dirname(app.root_path), 'migrations'))
 
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
@@ -75,6 +134,9 @@ def create_app():
 
     limiter.init_app(app)
 
+    from app.cache import cache
+    cache.init_app(app)
+
     # Importa o User APÓS inicializar o db para evitar ciclo
     from app.models import User
 
@@ -87,6 +149,9 @@ def create_app():
     # --------------------------
     @app.errorhandler(429)
     def ratelimit_handler(e):
+        from app.metricas import contar_rate_limit
+        contar_rate_limit()
+
         error_template = '''
         <!DOCTYPE html>
         <html lang="pt-BR">
@@ -126,27 +191,54 @@ def create_app():
     from app.api import api
     app.register_blueprint(api)
 
+    # Tempo real: no PostgreSQL os eventos passam entre os workers por NOTIFY
+    from app import tempo_real
+    tempo_real.init_app(app)
+
+    # Eventos do ORM que mantêm a relevância dos tópicos (feed "em alta")
+    from app import relevancia  # noqa: F401
+
+    # Instrumentação de SQL (só se SIIF_INSTRUMENTACAO=1)
+    from app import instrumentacao
+    instrumentacao.init_app(app)
+
+    # /static com nomes com hash e pré-comprimidos (se `flask siif assets` rodou no build)
+    from app import assets
+    assets.init_app(app)
+
+    # Cache-Control/ETag por rota (padrão: no-store)
+    from app import cache_http
+    cache_http.init_app(app)
+
+    # Métricas (/metrics)
+    from app import metricas
+    metricas.init_app(app)
+
+    # Estatísticas do painel admin (usuários ativos por dia)
+    from app.estatisticas import registrar_usuario_ativo
+    app.before_request(registrar_usuario_ativo)
+
+    # Comandos de manutenção (flask siif ...)
+    from app.comandos import siif_cli
+    app.cli.add_command(siif_cli)
+
     # --------------------------
-    # 8. CRIAÇÃO DO ADMIN (CORRIGIDO)
+    # 8. BANCO E ADMIN PADRÃO
     # --------------------------
-    with app.app_context():
-        db.create_all()
-
-        # Verifica se admin existe, se não, cria
-        if not User.query.filter_by(matricula="1234").first():
-            print("--- CRIANDO USUÁRIO ADMINISTRADOR PADRÃO ---")
-            admin_user = User(
-                matricula="1234",
-                is_admin=True,
-                email="admin@siif.com",
-                name="Administrador",
-                tipo_usuario="Servidor"  # Ajuste conforme seu model
-            )
-            # Define a senha corretamente usando o hash
-            admin_user.set_password("admin")
+    # Não roda mais em todo create_app (cada worker do gunicorn, o agregador e os
+    # scripts pagavam a reflexão do schema e uma consulta, e corriam no 1º deploy).
+    # Use `flask siif init` no deploy; SIIF_AUTO_INIT=1 mantém o comportamento antigo.
+    if os.environ.get('SIIF_AUTO_INIT') == '1':
+        from app.comandos import inicializar_banco
+        with app.app_context():
+            inicializar_banco()
 
-            db.session.add(admin_user)
-            db.session.commit()
-            print("--- ADMIN CRIADO COM SUCESSO ---")
+    # Tempo de boot: avisa no log se passar do orçamento
+    app.config['TEMPO_INICIALIZACAO_MS'] = (time.perf_counter() - inicio) * 1000
+    if app.config['TEMPO_INICIALIZACAO_MS'] > app.config['ORCAMENTO_INICIALIZACAO_MS']:
+        app.logger.warning(
+            'create_app levou %.0f ms (orçamento: %.0f ms). Rode `flask siif perfil-importacao`.',
+            app.config['TEMPO_INICIALIZACAO_MS'], app.config['ORCAMENTO_INICIALIZACAO_MS']
+        )
 
     return app
@@ -11,11 +11,14 @@ from bs4 import BeautifulSoup
 import datetime
 from datetime import timedelta
 import re
+import time
 
 # Importações do seu projeto
 from app import create_app
 from app.extensions import db
 from app.models import NoticiaAgregada
+from app.metricas import registrar_execucao_agregador
+from app.cache import cache
 # URL da página de notícias da Reitoria
 URL_ALVO = "https://portal.ifrn.edu.br/campus/reitoria/noticias/"
 DOMINIO = "https://portal.ifrn.edu.br"
@@ -72,7 +75,7 @@ def buscar_noticias_ifrn():
         response.raise_for_status()
     except Exception as e:
         print(f"ERRO DE CONEXÃO: {e}")
-        return
+        return None
 
     soup = BeautifulSoup(response.content, 'html.parser')
 
@@ -81,7 +84,7 @@ def buscar_noticias_ifrn():
 
     if not itens_noticia:
         print("AVISO: Nenhuma notícia encontrada com a classe 'grid-item'.")
-        return
+        return 0
 
     novas_count = 0
 
@@ -143,12 +146,19 @@ def buscar_noticias_ifrn():
 
     if novas_count > 0:
         db.session.commit()
+        # Com CACHE_BACKEND=sqlite a home dos workers vê as novas na hora; em memória, ao vencer o CACHE_TTL
+        cache.invalidar('noticias')
         print(f"\n--- SUCESSO! {novas_count} notícias novas salvas. ---")
     else:
         print("\n--- Nenhuma notícia nova encontrada. ---")
 
+    return novas_count
+
 
 if __name__ == "__main__":
     app = create_app()
     with app.app_context():
-        buscar_noticias_ifrn()
+        inicio = time.perf_counter()
+        novas = buscar_noticias_ifrn()
+        # Duração e resultado vão para o /metrics dos workers
+        registrar_execucao_agregador(time.perf_counter() - inicio, novas)
@@ -1,10 +1,26 @@
-from flask import Blueprint, request, jsonify, render_template, current_app
-from app.models import Noticia, Evento, db, User, Material, Comentario, NoticiaAgregada
+from flask import Blueprint, request, jsonify, render_template, current_app, Response, stream_with_context, url_for
+from app.models import Noticia, Evento, db, User, Material, Comentario, NoticiaAgregada, Comunidade, Topico
+from app import notificacoes as notificacoes_service
+from app import estatisticas, instrumentacao, metricas, enquetes
+from app.extensions import limiter
+from app.cache import cache
+from app.cache_http import politica_cache, validador, PUBLICO
+from app.fluxo_json import lista_json, percorrer
+from app.papeis import eh_membro
+from app.tempo_real import barramento, formatar_sse, garantir_ouvinte
 from datetime import datetime, timezone
+import csv
+import heapq
+import io
+import time
 import os
 from werkzeug.utils import secure_filename
 from flask_login import login_required, current_user
-import bleach
+from sqlalchemy import select, or_, and_, func, literal
+from app.importacao import modulo_tardio
+
+# bleach só é carregado quando alguém comenta (boot mais rápido)
+bleach = modulo_tardio('bleach')
 
 api = Blueprint("api", __name__)
 from typing import Tuple
@@ -30,6 +46,11 @@ def validate_comment_text(texto: str) -> Tuple[bool, str]:
     return True, ""
 
 
+def _foto_url(foto_perfil):
+    """URL da foto de perfil (o User guarda só o nome do arquivo em foto_perfil)."""
+    return url_for('static', filename='fotos_perfil/' + (foto_perfil or 'default.png'))
+
+
 
 @api.route("/api/noticias", methods=["POST"])
 @login_required
@@ -72,87 +93,109 @@ def criar_noticia():
 
     db.session.add(noticia)
     db.session.commit()
+    cache.invalidar('noticias')
 
     return jsonify({"msg": "Notícia criada com sucesso!"}), 201
 
 
+def _noticia_dict(n):
+    # Tenta pegar campos de forma segura (lidando com inconsistências de nome)
+    # Model: imagem | API antiga: imagem_url
+    img = getattr(n, 'imagem_url', getattr(n, 'imagem', None))
+
+    # Model: user_id | API antiga: autor_id
+    autor = getattr(n, 'autor_id', getattr(n, 'user_id', None))
+
+    return {
+        "id": n.id,
+        "titulo": n.titulo,
+        "conteudo": n.conteudo,
+        "imagem_url": img,
+        "arquivo_url": getattr(n, 'arquivo_url', None),
+        "link_externo": getattr(n, 'link_externo', None),
+        "campus": n.campus,
+        "categoria": n.categoria,
+        "data_postagem": n.data_publicacao.isoformat(),
+        "autor_id": autor,
+        "tipo": "interna"
+    }
+
+
+def _evento_dict(e):
+    return {
+        "id": e.id,
+        "titulo": e.titulo,
+        "descricao": e.descricao,
+        "data_hora_inicio": e.data_hora_inicio.isoformat()
+    }
+
+
+def _agregada_dict(na, agora=None):
+    return {
+        "id": f"ext_{na.id}", # Prefixo para evitar colisão com IDs de Noticia (int) e exclusão acidental
+        "titulo": na.titulo,
+        "conteudo": na.conteudo,
+        "imagem_url": na.imagem_url, # Model NoticiaAgregada tem imagem_url
+        "arquivo_url": None,
+        "link_externo": na.link_externo,
+        "campus": na.campus,
+        "categoria": na.categoria,
+        "data_postagem": (na.data_publicacao or agora or datetime.now()).isoformat(),
+        "autor_id": None, # Sem autor específico
+        "tipo": "externa"
+    }
+
+
 # Para que corresponda ao JavaScript
 @api.route("/api/noticias", methods=["GET"])
+@politica_cache(PUBLICO)
 def listar_noticias():
-    # 1. Notícias Internas (Do Banco)
-    noticias = Noticia.query.all()
-    
-    # 2. Notícias Externas (Do Agregador)
-    agregadas = NoticiaAgregada.query.all()
+    """
+    Notícias internas (do banco) e externas (do agregador), da mais recente
+    para a mais antiga. As duas consultas já vêm ordenadas e são intercaladas
+    enquanto a resposta é enviada (sem montar a lista inteira na memória).
 
-    resultado = []
+    A ETag sai de um resumo das duas tabelas (notícias só entram e saem, não
+    são editadas), então o 304 é respondido sem ler nenhuma notícia.
+    """
+    # Sem data conta como "agora" (vai para o topo). Truncado no minuto: senão o
+    # corpo mudaria a cada requisição
+    agora = datetime.now().replace(second=0, microsecond=0)
+    resumo_internas = db.session.execute(
+        select(func.count(), func.max(Noticia.id), func.max(Noticia.data_publicacao))
+    ).one()
+    resumo_externas = db.session.execute(
+        select(func.count(), func.count(NoticiaAgregada.data_publicacao),
+               func.max(NoticiaAgregada.id), func.max(NoticiaAgregada.data_publicacao))
+    ).one()
+    # Se alguma externa não tem data, o "agora" dela também entra na ETag
+    sem_data = resumo_externas[0] != resumo_externas[1]
+    etag = validador(tuple(resumo_internas), tuple(resumo_externas), agora if sem_data else None)
+
+    internas = percorrer(select(Noticia).order_by(Noticia.data_publicacao.desc()), escalares=True)
+    externas = percorrer(
+        select(NoticiaAgregada).order_by(NoticiaAgregada.data_publicacao.desc().nulls_first()), escalares=True
+    )
 
-    # Processa Internas
-    for n in noticias:
-        # Tenta pegar campos de forma segura (lidando com inconsistências de nome)
-        # Model: imagem | API antiga: imagem_url
-        img = getattr(n, 'imagem_url', getattr(n, 'imagem', None))
-        
-        # Model: user_id | API antiga: autor_id
-        autor = getattr(n, 'autor_id', getattr(n, 'user_id', None))
-        
-        # Outros campos opcionais
-        link = getattr(n, 'link_externo', None)
-        arquivo = getattr(n, 'arquivo_url', None)
-
-        resultado.append({
-            "id": n.id,
-            "titulo": n.titulo,
-            "conteudo": n.conteudo,
-            "imagem_url": img,
-            "arquivo_url": arquivo,
-            "link_externo": link,
-            "campus": n.campus,
-            "categoria": n.categoria,
-            "data_postagem": n.data_publicacao.isoformat(),
-            "autor_id": autor,
-            "tipo": "interna"
-        })
-
-    # Processa Externas (Agregadas)
-    for na in agregadas:
-        resultado.append({
-            "id": f"ext_{na.id}", # Prefixo para evitar colisão com IDs de Noticia (int) e exclusão acidental
-            "titulo": na.titulo,
-            "conteudo": na.conteudo,
-            "imagem_url": na.imagem_url, # Model NoticiaAgregada tem imagem_url
-            "arquivo_url": None,
-            "link_externo": na.link_externo,
-            "campus": na.campus,
-            "categoria": na.categoria,
-            "data_postagem": na.data_publicacao.isoformat() if na.data_publicacao else datetime.now().isoformat(),
-            "autor_id": None, # Sem autor específico
-            "tipo": "externa"
-        })
-
-    # Ordena tudo por data (mais recente primeiro)
-    resultado.sort(key=lambda x: x['data_postagem'], reverse=True)
-
-    return jsonify(resultado)
+    return lista_json(heapq.merge(
+        (_noticia_dict(n) for n in internas),
+        (_agregada_dict(na, agora) for na in externas),
+        key=lambda x: x['data_postagem'], reverse=True
+    ), etag=etag)
 
 
 @api.route("/api/eventos", methods=["GET"])
+@politica_cache(PUBLICO)
 def listar_eventos():
-    try:
-        # Busca do modelo Evento que você definiu
-        eventos = Evento.query.order_by(Evento.data_hora_inicio.desc()).all() 
-
-        resultado = []
-        for e in eventos:
-            resultado.append({
-                "id": e.id,
-                "titulo": e.titulo,
-                "descricao": e.descricao,
-                "data_hora_inicio": e.data_hora_inicio.isoformat()
-            })
-        return jsonify(resultado)
-    except Exception as e:
-        return jsonify({"erro": str(e)}), 500
+    # Eventos só são criados e excluídos: contagem + maior id + data mais recente bastam para a ETag
+    resumo = db.session.execute(
+        select(func.count(), func.max(Evento.id), func.max(Evento.data_hora_inicio))
+    ).one()
+
+    # Busca do modelo Evento que você definiu
+    eventos = percorrer(select(Evento).order_by(Evento.data_hora_inicio.desc()), escalares=True)
+
+    return lista_json((_evento_dict(e) for e in eventos), etag=validador(*resumo))
 
 
 # Rota POST corrigida para receber JSON e processar data ISO 8601
@@ -222,6 +265,7 @@ def excluir_noticia(id):
 
         db.session.delete(noticia_manual)
         db.session.commit()
+        cache.invalidar('noticias')
         return jsonify({"msg": "Notícia manual excluída"}), 200
 
     # 2. Se não achou manual, tenta excluir do RSS (Notícia Agregada)
@@ -232,6 +276,7 @@ def excluir_noticia(id):
 
         db.session.delete(noticia_rss)
         db.session.commit()
+        cache.invalidar('noticias')
         return jsonify({"msg": "Notícia RSS excluída"}), 200
 
     return jsonify({"erro": "Notícia não encontrada"}), 404
@@ -253,27 +298,172 @@ def excluir_evento(evento_id):
         return jsonify({"erro": str(e)}), 500
 
 
-@api.route("/api/usuarios")
-def api_usuarios():
-    users = User.query.filter_by(is_admin=False).order_by(User.matricula.asc()).all()
+# ===================================================================
+# API DE USUÁRIOS DO PAINEL ADMIN (PAGINADA, SÓ AS COLUNAS NECESSÁRIAS)
+# ===================================================================
+
+# Colunas que o painel usa. Selecionar só elas evita montar objetos User
+# completos (com relações) para milhares de contas do SUAP.
+COLUNAS_USUARIO_ADMIN = (User.id, User.name, User.matricula, User.curso, User.campus, User.suspenso_ate)
 
+
+# Maior code point do Unicode: "termo" + ele vem depois de tudo que começa com "termo"
+FIM_DO_PREFIXO = "\U0010ffff"
+
+
+def _escapar_like(termo):
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _consulta_usuarios_admin(termo=None):
+    """
+    Usuários comuns, com busca por prefixo de matrícula ou de nome (sem diferenciar
+    maiúsculas no nome). Cada lado do OR usa um índice (ver models, depois do User):
+    no PostgreSQL, LIKE 'termo%' com os índices text_pattern_ops; no SQLite, cujo
+    LIKE nunca usa índice, a faixa [termo, termo + FIM_DO_PREFIXO).
+    """
+    query = select(*COLUNAS_USUARIO_ADMIN).where(User.is_admin == False)
+    if not termo:
+        return query
+
+    nome = func.lower(User.name)
+    if db.session.get_bind().dialect.name == "postgresql":
+        prefixo = _escapar_like(termo) + "%"
+        return query.where(or_(
+            User.matricula.like(prefixo, escape="\\"),
+            nome.like(prefixo.lower(), escape="\\")
+        ))
+
+    # lower() do próprio banco dos dois lados (o do SQLite só converte ASCII)
+    termo_minusculo = func.lower(literal(termo))
+    return query.where(or_(
+        and_(User.matricula >= termo, User.matricula < termo + FIM_DO_PREFIXO),
+        and_(nome >= termo_minusculo, nome < termo_minusculo + FIM_DO_PREFIXO)
+    ))
+
+
+def _usuario_admin_dict(linha, agora):
     return {
-        "usuarios": [
-            {
-                "id": u.id,
-                "name": u.name or "",
-                "matricula": u.matricula,
-                "is_suspenso": u.is_suspenso(),
-                "suspenso_ate": u.suspenso_ate.isoformat() if u.suspenso_ate else None,
-                "motivo_suspensao": u.motivo_suspensao or None,
-                "foto_url": u.foto_url or None,
-                "curso": u.curso or None,
-                "campus": u.campus or None
-            }
-            for u in users
-        ]
+        "id": linha.id,
+        "name": linha.name or "",
+        "matricula": linha.matricula,
+        "curso": linha.curso or None,
+        "campus": linha.campus or None,
+        "is_suspenso": bool(linha.suspenso_ate and agora < linha.suspenso_ate),
+        "suspenso_ate": linha.suspenso_ate.isoformat() if linha.suspenso_ate else None
     }
 
+
+@api.route("/api/admin/usuarios", methods=["GET"])
+@api.route("/api/usuarios", methods=["GET"])
+@login_required
+def api_usuarios():
+    """
+    Lista os usuários para o painel admin, ordenados por matrícula.
+    Parâmetros: ?q=<prefixo de matrícula ou nome>&apos=<última matrícula recebida>&limite=<n>
+    Com ?formato=ndjson exporta todos os usuários do filtro (sem paginação), um por linha.
+    """
+    if not current_user.is_admin:
+        return jsonify({"erro": "Acesso negado"}), 403
+
+    termo = request.args.get("q", "").strip()
+    apos = request.args.get("apos")
+    limite = min(max(request.args.get("limite", 20, type=int), 1), 100)
+
+    query = _consulta_usuarios_admin(termo)
+    agora = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    if request.args.get("formato") == "ndjson":
+        linhas = percorrer(query.order_by(User.matricula.asc()))
+        return lista_json((_usuario_admin_dict(linha, agora) for linha in linhas), ndjson=True)
+
+    if apos:
+        query = query.where(User.matricula > apos)
+
+    linhas = db.session.execute(
+        query.order_by(User.matricula.asc()).limit(limite + 1)
+    ).all()
+
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = linhas[-1].matricula
+
+    return jsonify({
+        "usuarios": [_usuario_admin_dict(linha, agora) for linha in linhas],
+        "proximo": proximo
+    })
+
+
+@api.route("/api/admin/usuarios/exportar.csv", methods=["GET"])
+@login_required
+def exportar_usuarios():
+    """Exporta os usuários (com o mesmo filtro ?q=) em CSV, gerado aos poucos."""
+    if not current_user.is_admin:
+        return jsonify({"erro": "Acesso negado"}), 403
+
+    query = _consulta_usuarios_admin(request.args.get("q", "").strip()).order_by(User.matricula.asc())
+
+    def gerar():
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(["id", "nome", "matricula", "curso", "campus", "suspenso_ate"])
+
+        # yield_per: o banco entrega as linhas em lotes, sem carregar tudo na memória
+        resultado = db.session.execute(query.execution_options(yield_per=1000))
+        for lote in resultado.partitions():
+            for linha in lote:
+                escritor.writerow([
+                    linha.id, linha.name or "", linha.matricula, linha.curso or "", linha.campus or "",
+                    linha.suspenso_ate.isoformat() if linha.suspenso_ate else ""
+                ])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+        yield buffer.getvalue()
+
+    return Response(
+        stream_with_context(gerar()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=usuarios.csv"}
+    )
+
+@api.route("/api/admin/estatisticas", methods=["GET"])
+@login_required
+def estatisticas_admin():
+    """Contadores do painel + série diária. Parâmetro: ?dias=<n> (padrão 30, máx. 365)."""
+    if not current_user.is_admin:
+        return jsonify({"erro": "Acesso negado"}), 403
+
+    dias = min(max(request.args.get("dias", 30, type=int), 1), 365)
+    return jsonify({
+        "contadores": estatisticas.contadores_painel(),
+        "diario": estatisticas.serie_diaria(dias),
+        "cache": cache.estatisticas()
+    })
+
+
+@api.route("/api/admin/instrumentacao", methods=["GET", "DELETE"])
+@login_required
+def instrumentacao_admin():
+    """Histogramas de latência/consultas por endpoint (DELETE zera os dados)."""
+    if not current_user.is_admin:
+        return jsonify({"erro": "Acesso negado"}), 403
+
+    if not current_app.config.get("INSTRUMENTACAO_SQL"):
+        return jsonify({"erro": "Instrumentação desligada (defina SIIF_INSTRUMENTACAO=1)"}), 404
+
+    if request.method == "DELETE":
+        instrumentacao.zerar()
+        return jsonify({"status": "ok"})
+
+    return jsonify({
+        "limite_ms": current_app.config["INSTRUMENTACAO_LIMITE_MS"],
+        "endpoints": instrumentacao.resumo_por_endpoint()
+    })
+
+
 # Buscar dados completos do usuário pelo ID
 @api.route("/api/usuario/<int:user_id>")
 @login_required
@@ -286,7 +476,7 @@ def api_usuario(user_id):
         "matricula": user.matricula,
         "curso": user.curso,
         "campus": user.campus,
-        "foto_url": user.foto_url,
+        "foto_url": _foto_url(user.foto_perfil),
         "suspenso": user.is_suspenso(),
         "suspenso_ate": user.suspenso_ate.isoformat() if user.suspenso_ate else None,
         "motivo": user.motivo_suspensao
@@ -321,37 +511,70 @@ def remover_suspensao_usuario(user_id):
 
 
 
+# ===================================================================
+# MÉTRICAS (PROMETHEUS)
+# ===================================================================
+
+@api.route("/metrics", methods=["GET"])
+@limiter.exempt
+def exportar_metricas():
+    """
+    Métricas no formato texto do Prometheus.
+    Com METRICAS_TOKEN definido, aceita `Authorization: Bearer <token>`;
+    sem token, só um admin logado consegue ler.
+    """
+    token = current_app.config.get("METRICAS_TOKEN")
+    autorizado = bool(token) and request.headers.get("Authorization") == f"Bearer {token}"
+    if not autorizado and not (current_user.is_authenticated and current_user.is_admin):
+        return jsonify({"erro": "Acesso negado"}), 403
+
+    if not current_app.config.get("METRICAS_ATIVAS"):
+        return jsonify({"erro": "Métricas desligadas (SIIF_METRICAS=0)"}), 404
+
+    return Response(metricas.exportar(), mimetype="text/plain; version=0.0.4")
+
+
 # ===================================================================
 # API DE COMENTÁRIOS (COM SEGURANÇA XSS E RATE LIMIT)
 # ===================================================================
 
 @api.route("/api/materiais/<int:material_id>/comentarios", methods=["GET"])
+@politica_cache(PUBLICO)
 def listar_comentarios(material_id: int):
-    """Lista todos os comentários de um material (ordenados do mais recente)."""
-    try:
-        material = Material.query.get_or_404(material_id)
-        comentarios = (Comentario.query
-                      .filter_by(material_id=material_id)
-                      .order_by(Comentario.data_criacao.desc())
-                      .all())
-        
-        resultado = []
-        for c in comentarios:
-            resultado.append({
-                "id": c.id,
-                "texto": c.texto,
-                "data_criacao": c.data_criacao.isoformat(),
-                "autor": {
-                    "id": c.autor.id,
-                    "name": c.autor.name or "Usuário",
-                    "foto_url": c.autor.foto_url or "/static/img/default-avatar.png"
-                }
-            })
-        
-        return jsonify(resultado), 200
-    
-    except Exception as e:
-        return jsonify({"erro": f"Erro ao carregar comentários: {str(e)}"}), 500
+    """
+    Lista todos os comentários de um material (ordenados do mais recente),
+    em streaming. A ETag junta o resumo dos comentários (só entram e saem) com
+    nome e foto de quem comentou, que podem mudar no perfil.
+    """
+    Material.query.get_or_404(material_id)
+    resumo = db.session.execute(
+        select(func.count(), func.max(Comentario.id), func.max(Comentario.data_criacao))
+        .where(Comentario.material_id == material_id)
+    ).one()
+    autores = db.session.execute(
+        select(User.id, User.name, User.foto_perfil)
+        .where(User.id.in_(select(Comentario.autor_id).where(Comentario.material_id == material_id)))
+        .order_by(User.id)
+    ).all()
+
+    linhas = percorrer(
+        select(Comentario.id, Comentario.texto, Comentario.data_criacao,
+               User.id.label("autor_id"), User.name, User.foto_perfil)
+        .join(User, Comentario.autor_id == User.id)
+        .where(Comentario.material_id == material_id)
+        .order_by(Comentario.data_criacao.desc())
+    )
+
+    return lista_json(({
+        "id": c.id,
+        "texto": c.texto,
+        "data_criacao": c.data_criacao.isoformat(),
+        "autor": {
+            "id": c.autor_id,
+            "name": c.name or "Usuário",
+            "foto_url": _foto_url(c.foto_perfil)
+        }
+    } for c in linhas), etag=validador(tuple(resumo), [tuple(a) for a in autores]))
 
 
 @api.route("/api/materiais/<int:material_id>/comentarios", methods=["POST"])
@@ -414,7 +637,7 @@ def criar_comentario(material_id: int):
             "autor": {
                 "id": current_user.id,
                 "name": current_user.name or "Usuário",
-                "foto_url": current_user.foto_url or "/static/img/default-avatar.png"
+                "foto_url": _foto_url(current_user.foto_perfil)
             }
         }), 201
     
@@ -423,5 +646,121 @@ def criar_comentario(material_id: int):
         return jsonify({"erro": f"Erro ao criar comentário: {str(e)}"}), 500
 
 
+# ===================================================================
+# API DE NOTIFICAÇÕES (PAGINADA POR CURSOR)
+# ===================================================================
+
+@api.route("/api/notificacoes", methods=["GET"])
+@login_required
+def listar_notificacoes():
+    """
+    Lista as notificações do usuário logado.
+    Parâmetros: ?antes_de=<id>&limite=<n>&nao_lidas=1
+    """
+    antes_de = request.args.get("antes_de", type=int)
+    limite = min(max(request.args.get("limite", 20, type=int), 1), 50)
+    apenas_nao_lidas = request.args.get("nao_lidas") in ("1", "true")
+
+    itens, proximo = notificacoes_service.listar_notificacoes(
+        current_user.id,
+        antes_de=antes_de,
+        limite=limite,
+        apenas_nao_lidas=apenas_nao_lidas
+    )
+
+    return jsonify({
+        "notificacoes": [n.to_dict() for n in itens],
+        "nao_lidas": current_user.notificacoes_nao_lidas,
+        "proximo": proximo
+    })
+
+
+@api.route("/api/notificacoes/<int:notificacao_id>/lida", methods=["POST"])
+@login_required
+def marcar_notificacao_lida(notificacao_id):
+    notificacoes_service.marcar_lida(notificacao_id, current_user.id)
+    db.session.commit()
+    return jsonify({"nao_lidas": current_user.notificacoes_nao_lidas})
+
+
+@api.route("/api/notificacoes/lidas", methods=["POST"])
+@login_required
+def marcar_notificacoes_lidas():
+    notificacoes_service.marcar_todas_lidas(current_user.id)
+    db.session.commit()
+    return jsonify({"nao_lidas": 0})
 
 
+# ===================================================================
+# API DE ENQUETES
+# ===================================================================
+
+@api.route("/api/enquete/<int:topico_id>/resultados", methods=["GET"])
+@login_required
+def resultados_enquete(topico_id):
+    """Votos por opção (dos contadores, sem carregar os votos) e o voto do usuário logado."""
+    topico = Topico.query.get_or_404(topico_id)
+    if topico.tipo_post != 'enquete':
+        return jsonify({"erro": "Este post não é uma enquete"}), 404
+
+    if topico.comunidade and topico.comunidade.tipo_acesso == 'Restrito' and not eh_membro(topico.comunidade):
+        return jsonify({"erro": "Sem acesso a esta comunidade"}), 403
+
+    return jsonify(enquetes.resultados(topico, current_user.id))
+
+
+# ===================================================================
+# TEMPO REAL (SERVER-SENT EVENTS)
+# ===================================================================
+
+@api.route("/api/tempo-real", methods=["GET"])
+@limiter.exempt  # O EventSource reconecta sozinho; o limite é SSE_MAX_CONEXOES
+@login_required
+def stream_tempo_real():
+    """
+    Stream SSE com os deltas da página aberta.
+    Sempre assina 'usuario:<id>' (notificações); ?forum=1 assina o feed geral
+    e ?comunidade=<id> assina uma comunidade (se o usuário tiver acesso).
+    """
+    if not current_app.config['TEMPO_REAL_ATIVO']:
+        # 204 faz o EventSource parar de reconectar
+        return Response(status=204)
+
+    canais = [f"usuario:{current_user.id}"]
+
+    if request.args.get("forum") == "1":
+        canais.append("forum")
+
+    comunidade_id = request.args.get("comunidade", type=int)
+    if comunidade_id:
+        comunidade = Comunidade.query.get_or_404(comunidade_id)
+        if comunidade.tipo_acesso == 'Restrito' and not eh_membro(comunidade):
+            return jsonify({"erro": "Sem acesso a esta comunidade"}), 403
+        canais.append(f"comunidade:{comunidade.id}")
+
+    if barramento.total_conexoes >= current_app.config['SSE_MAX_CONEXOES']:
+        # O EventSource tenta de novo sozinho depois do 'retry'
+        return Response("retry: 30000\n\n", status=503, mimetype="text/event-stream")
+
+    heartbeat = current_app.config['SSE_HEARTBEAT']
+    duracao_maxima = current_app.config['SSE_DURACAO_MAXIMA']
+    garantir_ouvinte()
+    assinatura = barramento.assinar(canais)
+
+    # O gerador roda fora do contexto da requisição: não toca no banco nem em current_user
+    def gerar():
+        fim = time.monotonic() + duracao_maxima
+        try:
+            yield "retry: 5000\n\n"
+            while time.monotonic() < fim:
+                evento = assinatura.proximo(timeout=heartbeat)
+                if evento is None:
+                    yield ": ping\n\n"
+                else:
+                    yield formatar_sse(*evento)
+        finally:
+            barramento.cancelar(assinatura)
+
+    resposta = Response(gerar(), mimetype="text/event-stream")
+    resposta.headers["X-Accel-Buffering"] = "no"  # Evita buffer em proxies (nginx/Render)
+    return resposta
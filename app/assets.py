@@ -0,0 +1,166 @@
+# app/assets.py
+"""
+Arquivos estáticos com hash no nome e pré-comprimidos.
+
+`flask siif assets` (rodar no build do deploy, depois do pip install):
+
+- copia cada arquivo de PASTAS para static/dist/, com o hash do conteúdo no
+  nome: css/style.css -> dist/css/style.3f9a1c02be.css;
+- gera ao lado as versões .gz (e .br, se o pacote `brotli` estiver instalado)
+  dos tipos de texto, quando comprimir compensa;
+- escreve static/dist/manifest.json com o mapa original -> cópia.
+
+Com o manifest presente, `url_for('static', filename='css/style.css')` já sai
+com o nome da cópia (nenhum template muda) e a cópia é servida com
+`immutable` por um ano: um conteúdo novo tem outro hash, então outro endereço.
+A versão pré-comprimida vai para quem aceita br/gzip, sem comprimir a cada
+requisição. Sem manifest (ambiente de desenvolvimento) tudo segue como antes.
+
+uploads/ e fotos_perfil/ ficam de fora: mudam sem deploy.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import current_app, request, send_from_directory
+
+from app.cache_http import UM_ANO
+from app.compressao import brotli, brotli_disponivel
+
+# Pastas de static/ que entram no build
+PASTAS = ('css', 'js', 'img', 'logos')
+
+PASTA_DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+# Tipos que valem a pena comprimir (imagens raster e fontes woff já vêm comprimidas)
+EXTENSOES_TEXTO = {'.css', '.js', '.svg', '.json', '.txt', '.htm', '.html', '.ico'}
+
+# Só grava a versão comprimida se ela tiver até esta fração do original
+FRACAO_MAXIMA = 0.9
+
+# Codificações na ordem de preferência: (nome no Accept-Encoding, extensão)
+CODIFICACOES = (('br', '.br'), ('gzip', '.gz'))
+
+LARGURA_HASH = 10
+
+
+# ===================================================================
+# BUILD (flask siif assets)
+# ===================================================================
+
+def _nome_com_hash(caminho_relativo, dados):
+    raiz, extensao = os.path.splitext(caminho_relativo)
+    resumo = hashlib.sha256(dados).hexdigest()[:LARGURA_HASH]
+    return f'{PASTA_DIST}/{raiz}.{resumo}{extensao}'
+
+
+def _comprimir(dados, codificacao):
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=11)
+    # mtime=0: o mesmo arquivo gera sempre o mesmo .gz
+    return gzip.compress(dados, compresslevel=9, mtime=0)
+
+
+def construir(pasta_static):
+    """Gera static/dist e o manifest. Retorna um resumo para o comando."""
+    destino = os.path.join(pasta_static, PASTA_DIST)
+    shutil.rmtree(destino, ignore_errors=True)
+
+    codificacoes = [(nome, ext) for nome, ext in CODIFICACOES if nome != 'br' or brotli_disponivel()]
+    arquivos, comprimidos = {}, {}
+    resumo = {"arquivos": 0, "bytes": 0, "bytes_comprimidos": 0, "codificacoes": [nome for nome, _ in codificacoes]}
+
+    for pasta in PASTAS:
+        for raiz, _, nomes in os.walk(os.path.join(pasta_static, pasta)):
+            for nome in sorted(nomes):
+                caminho = os.path.join(raiz, nome)
+                relativo = os.path.relpath(caminho, pasta_static).replace(os.sep, '/')
+                with open(caminho, 'rb') as arquivo:
+                    dados = arquivo.read()
+
+                copia = _nome_com_hash(relativo, dados)
+                caminho_copia = os.path.join(pasta_static, *copia.split('/'))
+                os.makedirs(os.path.dirname(caminho_copia), exist_ok=True)
+                with open(caminho_copia, 'wb') as arquivo:
+                    arquivo.write(dados)
+                arquivos[relativo] = copia
+                resumo["arquivos"] += 1
+                resumo["bytes"] += len(dados)
+
+                if os.path.splitext(nome)[1].lower() not in EXTENSOES_TEXTO:
+                    continue
+                for codificacao, extensao in codificacoes:
+                    compactado = _comprimir(dados, codificacao)
+                    if len(compactado) > len(dados) * FRACAO_MAXIMA:
+                        continue
+                    with open(caminho_copia + extensao, 'wb') as arquivo:
+                        arquivo.write(compactado)
+                    comprimidos.setdefault(copia, []).append(codificacao)
+                    if codificacao == 'gzip':
+                        resumo["bytes_comprimidos"] += len(dados) - len(compactado)
+
+    os.makedirs(destino, exist_ok=True)
+    with open(os.path.join(destino, MANIFEST), 'w', encoding='utf-8') as arquivo:
+        json.dump({"arquivos": arquivos, "comprimidos": comprimidos}, arquivo, indent=1, sort_keys=True)
+    return resumo
+
+
+# ===================================================================
+# USO NO APP
+# ===================================================================
+
+def _carregar_manifest(pasta_static):
+    try:
+        with open(os.path.join(pasta_static, PASTA_DIST, MANIFEST), encoding='utf-8') as arquivo:
+            manifest = json.load(arquivo)
+    except (OSError, ValueError):
+        return {}, {}
+    return manifest.get("arquivos", {}), manifest.get("comprimidos", {})
+
+
+def _trocar_nome(endpoint, valores):
+    """url_defaults: aponta url_for('static', ...) para a cópia com hash."""
+    if endpoint != 'static' or 'filename' not in valores:
+        return
+    copia = current_app.extensions['siif_assets']["arquivos"].get(valores['filename'])
+    if copia:
+        valores['filename'] = copia
+
+
+def servir_estatico(filename):
+    """View de /static: cópias com hash saem imutáveis e, se possível, pré-comprimidas."""
+    assets = current_app.extensions['siif_assets']
+    if filename not in assets["copias"]:
+        return current_app.send_static_file(filename)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    disponiveis = assets["comprimidos"].get(filename, ())
+    for codificacao, extensao in CODIFICACOES:
+        if codificacao in disponiveis and request.accept_encodings[codificacao]:
+            resposta = send_from_directory(current_app.static_folder, filename + extensao,
+                                           mimetype=mimetype, max_age=UM_ANO)
+            resposta.headers['Content-Encoding'] = codificacao
+            break
+    else:
+        resposta = send_from_directory(current_app.static_folder, filename, mimetype=mimetype, max_age=UM_ANO)
+
+    if disponiveis:
+        resposta.vary.add('Accept-Encoding')
+    resposta.headers['Cache-Control'] = f'public, max-age={UM_ANO}, immutable'
+    return resposta
+
+
+def init_app(app):
+    arquivos, comprimidos = _carregar_manifest(app.static_folder)
+    app.extensions['siif_assets'] = {
+        "arquivos": arquivos,
+        "copias": set(arquivos.values()),
+        "comprimidos": comprimidos,
+    }
+    if arquivos:
+        app.url_defaults(_trocar_nome)
+        app.view_functions['static'] = servir_estatico
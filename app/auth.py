@@ -1,30 +1,17 @@
 import os
 from flask import Blueprint, render_template, redirect, url_for, flash, request, session, current_app
 from flask_login import login_user, logout_user, login_required
-from requests_oauthlib import OAuth2Session
+from app.importacao import funcao_tardia
 from app.models import User, db
 from app.forms import LoginForm, RegisterForm
 
 auth_bp = Blueprint('auth', __name__)
 
-@auth_bp.after_request
-def add_header(response):
-    """
-    Adiciona cabeçalhos para proibir o cache do navegador e de proxies.
-    Isso evita que um aluno receba o cookie de sessão de outro.
-    """
-    response.headers["Cache-Control"] = "no-cache, private, no-store, must-revalidate, max-age=0"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
-    response.headers["Vary"] = "Cookie"
-    
-    # Remove ETag and Last-Modified to prevent conditional requests (HTTP 304)
-    if 'ETag' in response.headers:
-        del response.headers['ETag']
-    if 'Last-Modified' in response.headers:
-        del response.headers['Last-Modified']
-        
-    return response
+# requests_oauthlib (e o requests junto) só é importado quando alguém usa o login do SUAP
+OAuth2Session = funcao_tardia('requests_oauthlib', 'OAuth2Session')
+
+# Sem cache em nenhuma rota de login/cadastro: é o padrão de app/cache_http.py
+# (no-store), que evita que um aluno receba o cookie de sessão de outro.
 
 # --- CONFIGURAÇÕES DO SUAP ---
 # Em produção, coloque isso em variáveis de ambiente (os.environ)
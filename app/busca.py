@@ -0,0 +1,347 @@
+# app/busca.py
+"""
+Busca textual no fórum (tópicos e respostas).
+
+Em vez de `ilike('%q%')` em título e conteúdo (varredura de todos os posts,
+sensível a acento), os textos vão para um índice de busca mantido junto com
+as próprias linhas:
+
+- SQLite (local): tabela virtual FTS5 `busca_forum`, tokenizer unicode61
+  sem acentos, ranking BM25 e `snippet()` para o trecho destacado;
+- PostgreSQL (produção): tabela `busca_forum` com coluna tsvector e índice
+  GIN, configuração `siif_portugues` (portuguese + unaccent, com stemming),
+  ranking `ts_rank_cd` e `ts_headline` para o trecho.
+
+Cada documento tem id fixo: tópico N -> 2N, resposta N -> 2N + 1. Assim
+atualizar/remover um documento é por chave, sem procurar por tipo/id.
+
+Os eventos do ORM (criar, editar, excluir tópico ou resposta) mantêm o índice
+na mesma transação. Inserções diretas no banco (ex: `flask siif seed`) não
+passam pelo ORM: depois delas, rode `flask siif reindexar-forum`.
+"""
+from markupsafe import Markup, escape
+from sqlalchemy import event, text
+
+from app.extensions import db
+from app.importacao import funcao_tardia
+from app.models import Topico, Resposta
+
+unidecode = funcao_tardia('unidecode', 'unidecode')
+
+# Tópicos por página nos resultados
+POR_PAGINA = 15
+
+# Palavras consideradas por busca (o resto é ignorado)
+MAX_TERMOS = 8
+
+# Marcadores do trecho destacado: o texto é escapado antes de virarem <mark>
+_INICIO_DESTAQUE, _FIM_DESTAQUE = '\x02', '\x03'
+
+# Regra do feed global: sem posts de comunidades restritas e sem enquetes
+_VISIVEL_NO_FORUM = """
+    (t.comunidade_id IS NULL OR c.tipo_acesso != 'Restrito') AND t.tipo_post != 'enquete'
+"""
+
+# Regra do "Meu feed": só as comunidades que o usuário segue, sem enquetes
+_NO_FEED_DO_USUARIO = """
+    t.comunidade_id IN (SELECT comunidade_id FROM membros_comunidade WHERE user_id = :comunidades_de)
+    AND t.tipo_post != 'enquete'
+"""
+
+
+def _id_topico(topico_id):
+    return topico_id * 2
+
+
+def _id_resposta(resposta_id):
+    return resposta_id * 2 + 1
+
+
+def _palavras(termo):
+    """'Programação  em C++' -> ['programacao', 'em', 'c']"""
+    normalizado = ''.join(ch if ch.isalnum() else ' ' for ch in unidecode(termo or '').lower())
+    return normalizado.split()[:MAX_TERMOS]
+
+
+# ===================================================================
+# BACKENDS
+# ===================================================================
+
+class BuscaSQLite:
+    """FTS5. Sem stemming em português: cada palavra é buscada como prefixo."""
+
+    criar = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS busca_forum USING fts5("
+        "titulo, conteudo, topico_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')"
+    ]
+
+    gravar = (
+        "INSERT INTO busca_forum (rowid, titulo, conteudo, topico_id) "
+        "VALUES (:id, :titulo, :conteudo, :topico_id)"
+    )
+
+    remover = "DELETE FROM busca_forum WHERE rowid = :id"
+
+    reindexar = [
+        "DELETE FROM busca_forum",
+        "INSERT INTO busca_forum (rowid, titulo, conteudo, topico_id) "
+        "SELECT id * 2, titulo, conteudo, id FROM topico",
+        "INSERT INTO busca_forum (rowid, titulo, conteudo, topico_id) "
+        "SELECT id * 2 + 1, NULL, conteudo, topico_id FROM resposta",
+        "INSERT INTO busca_forum (busca_forum) VALUES ('optimize')",
+    ]
+
+    # bm25() é negativo: quanto menor, mais relevante. Título pesa mais que o conteúdo.
+    documentos = """
+        SELECT rowid AS id, topico_id, bm25(busca_forum, 5.0, 1.0) AS pontuacao
+        FROM busca_forum WHERE busca_forum MATCH :consulta
+    """
+    melhor = "MIN(d.pontuacao)"
+    ordem_relevancia = "ASC"
+
+    trechos = """
+        SELECT topico_id, snippet(busca_forum, -1, :inicio, :fim, '…', 16) AS trecho
+        FROM busca_forum
+        WHERE busca_forum MATCH :consulta AND topico_id IN ({ids})
+        ORDER BY bm25(busca_forum, 5.0, 1.0)
+    """
+
+    @staticmethod
+    def consulta(palavras):
+        return ' '.join(f'"{p}"*' for p in palavras)
+
+
+class BuscaPostgres:
+    """tsvector + GIN, com stemming em português e sem acentos (unaccent)."""
+
+    criar = [
+        "CREATE EXTENSION IF NOT EXISTS unaccent",
+        """
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'siif_portugues') THEN
+                CREATE TEXT SEARCH CONFIGURATION siif_portugues (COPY = portuguese);
+                ALTER TEXT SEARCH CONFIGURATION siif_portugues
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+            END IF;
+        END $$
+        """,
+        "CREATE TABLE IF NOT EXISTS busca_forum ("
+        "id BIGINT PRIMARY KEY, topico_id INTEGER NOT NULL, titulo TEXT, conteudo TEXT, documento TSVECTOR)",
+        "CREATE INDEX IF NOT EXISTS ix_busca_forum_documento ON busca_forum USING GIN (documento)",
+        "CREATE INDEX IF NOT EXISTS ix_busca_forum_topico_id ON busca_forum (topico_id)",
+    ]
+
+    _documento = (
+        "setweight(to_tsvector('siif_portugues', coalesce({titulo}, '')), 'A') || "
+        "setweight(to_tsvector('siif_portugues', coalesce({conteudo}, '')), 'B')"
+    )
+
+    gravar = (
+        "INSERT INTO busca_forum (id, topico_id, titulo, conteudo, documento) "
+        "VALUES (:id, :topico_id, :titulo, :conteudo, " + _documento.format(titulo=':titulo', conteudo=':conteudo') + ") "
+        "ON CONFLICT (id) DO UPDATE SET titulo = EXCLUDED.titulo, conteudo = EXCLUDED.conteudo, "
+        "documento = EXCLUDED.documento"
+    )
+
+    remover = "DELETE FROM busca_forum WHERE id = :id"
+
+    reindexar = [
+        "TRUNCATE busca_forum",
+        "INSERT INTO busca_forum (id, topico_id, titulo, conteudo, documento) "
+        "SELECT id * 2, id, titulo, conteudo, " + _documento.format(titulo='titulo', conteudo='conteudo') +
+        " FROM topico",
+        "INSERT INTO busca_forum (id, topico_id, titulo, conteudo, documento) "
+        "SELECT id * 2 + 1, topico_id, NULL, conteudo, " + _documento.format(titulo='NULL', conteudo='conteudo') +
+        " FROM resposta",
+    ]
+
+    documentos = """
+        SELECT f.id, f.topico_id, ts_rank_cd(f.documento, q) AS pontuacao
+        FROM busca_forum f, to_tsquery('siif_portugues', :consulta) q
+        WHERE f.documento @@ q
+    """
+    melhor = "MAX(d.pontuacao)"
+    ordem_relevancia = "DESC"
+
+    trechos = """
+        SELECT f.topico_id,
+               ts_headline('siif_portugues', concat_ws(' — ', f.titulo, f.conteudo), q,
+                           'MaxWords=30, MinWords=12, StartSel=' || :inicio || ', StopSel=' || :fim) AS trecho
+        FROM busca_forum f, to_tsquery('siif_portugues', :consulta) q
+        WHERE f.documento @@ q AND f.topico_id IN ({ids})
+        ORDER BY ts_rank_cd(f.documento, q) DESC
+    """
+
+    @staticmethod
+    def consulta(palavras):
+        return ' & '.join(f'{p}:*' for p in palavras)
+
+
+_BACKENDS = {
+    'sqlite': BuscaSQLite,
+    'postgresql': BuscaPostgres,
+}
+
+
+def backend(conexao=None):
+    """Backend do banco em uso, ou None se o dialeto não tiver busca textual aqui."""
+    if conexao is None:
+        conexao = db.session.get_bind()
+    return _BACKENDS.get(conexao.dialect.name)
+
+
+# ===================================================================
+# MANUTENÇÃO DO ÍNDICE
+# ===================================================================
+
+def criar_indice():
+    """Cria o índice (idempotente). Chamado pelo `flask siif init`."""
+    busca = backend()
+    if busca is None:
+        return
+    for sql in busca.criar:
+        db.session.execute(text(sql))
+    db.session.commit()
+
+
+def reindexar():
+    """Refaz o índice inteiro a partir de topico e resposta."""
+    busca = backend()
+    if busca is None:
+        return
+    for sql in busca.reindexar:
+        db.session.execute(text(sql))
+    db.session.commit()
+
+
+def _gravar(conexao, documento_id, topico_id, titulo, conteudo):
+    busca = backend(conexao)
+    if busca is None:
+        return
+    # FTS5 não tem upsert: remove e insere (no Postgres o remover é redundante, mas barato)
+    conexao.execute(text(busca.remover), {"id": documento_id})
+    conexao.execute(text(busca.gravar), {"id": documento_id, "topico_id": topico_id,
+                                         "titulo": titulo, "conteudo": conteudo})
+
+
+def _remover(conexao, documento_id):
+    busca = backend(conexao)
+    if busca is not None:
+        conexao.execute(text(busca.remover), {"id": documento_id})
+
+
+def _texto_mudou(objeto, *campos):
+    estado = db.inspect(objeto)
+    return any(estado.attrs[campo].history.has_changes() for campo in campos)
+
+
+@event.listens_for(Topico, 'after_insert')
+def _indexar_topico(mapper, conexao, topico):
+    _gravar(conexao, _id_topico(topico.id), topico.id, topico.titulo, topico.conteudo)
+
+
+@event.listens_for(Topico, 'after_update')
+def _reindexar_topico(mapper, conexao, topico):
+    if _texto_mudou(topico, 'titulo', 'conteudo'):
+        _gravar(conexao, _id_topico(topico.id), topico.id, topico.titulo, topico.conteudo)
+
+
+@event.listens_for(Topico, 'after_delete')
+def _desindexar_topico(mapper, conexao, topico):
+    # As respostas saem pelo cascade do ORM, cada uma pelo próprio evento
+    _remover(conexao, _id_topico(topico.id))
+
+
+@event.listens_for(Resposta, 'after_insert')
+def _indexar_resposta(mapper, conexao, resposta):
+    _gravar(conexao, _id_resposta(resposta.id), resposta.topico_id, None, resposta.conteudo)
+
+
+@event.listens_for(Resposta, 'after_update')
+def _reindexar_resposta(mapper, conexao, resposta):
+    if _texto_mudou(resposta, 'conteudo'):
+        _gravar(conexao, _id_resposta(resposta.id), resposta.topico_id, None, resposta.conteudo)
+
+
+@event.listens_for(Resposta, 'after_delete')
+def _desindexar_resposta(mapper, conexao, resposta):
+    _remover(conexao, _id_resposta(resposta.id))
+
+
+# ===================================================================
+# CONSULTA
+# ===================================================================
+
+def _destacar(trecho):
+    """Escapa o trecho (é texto do usuário) e só então troca os marcadores por <mark>."""
+    seguro = str(escape(trecho or ''))
+    return Markup(seguro.replace(_INICIO_DESTAQUE, '<mark>').replace(_FIM_DESTAQUE, '</mark>'))
+
+
+def buscar_topicos(termo, pagina=1, ordem='relevancia', salvos_de=None, comunidades_de=None,
+                   por_pagina=POR_PAGINA):
+    """
+    Tópicos do feed global que casam com `termo` (no título, no conteúdo ou
+    em alguma resposta), do mais relevante para o menos relevante (ou do mais
+    recente, com ordem='recente'). `salvos_de` restringe aos salvos do usuário
+e `comunidades_de` às comunidades que ele segue (a regra do "Meu feed").
+
+    Retorna (ids, trechos, tem_proxima), com `trechos` = {topico_id: Markup};
+    ou None se o banco não tiver backend de busca (quem chama usa o LIKE).
+    """
+    busca = backend()
+    if busca is None:
+        return None
+
+    palavras = _palavras(termo)
+    if not palavras:
+        return [], {}, False
+
+    parametros = {
+        "consulta": busca.consulta(palavras),
+        "limite": por_pagina + 1,
+        "deslocamento": (max(pagina, 1) - 1) * por_pagina,
+    }
+    if comunidades_de:
+        # Mesma regra do "Meu feed": membro vê também as comunidades restritas
+        filtros = _NO_FEED_DO_USUARIO
+        parametros["comunidades_de"] = comunidades_de
+    else:
+        filtros = _VISIVEL_NO_FORUM
+    if salvos_de:
+        filtros += " AND t.id IN (SELECT topico_id FROM post_salvo WHERE user_id = :salvos_de)"
+        parametros["salvos_de"] = salvos_de
+
+    if ordem == 'recente':
+        ordenacao = "t.criado_em DESC, t.id DESC"
+    else:
+        ordenacao = f"pontuacao {busca.ordem_relevancia}, t.id DESC"
+
+    # Melhor documento de cada tópico (o próprio tópico ou uma das respostas).
+    # MATERIALIZED: o SQLite não deixa usar bm25() se a subconsulta for achatada no GROUP BY
+    sql = f"""
+        WITH d AS MATERIALIZED ({busca.documentos})
+        SELECT d.topico_id, {busca.melhor} AS pontuacao
+        FROM d
+        JOIN topico t ON t.id = d.topico_id
+        LEFT JOIN comunidade c ON c.id = t.comunidade_id
+        WHERE {filtros}
+        GROUP BY d.topico_id, t.criado_em, t.id
+        ORDER BY {ordenacao}
+        LIMIT :limite OFFSET :deslocamento
+    """
+    ids = [linha.topico_id for linha in db.session.execute(text(sql), parametros)]
+    tem_proxima = len(ids) > por_pagina
+    ids = ids[:por_pagina]
+    if not ids:
+        return [], {}, False
+
+    # Trechos só dos tópicos desta página (o mais relevante de cada um)
+    trechos = {}
+    sql_trechos = busca.trechos.format(ids=', '.join(str(int(i)) for i in ids))
+    for linha in db.session.execute(text(sql_trechos), {"consulta": parametros["consulta"],
+                                                        "inicio": _INICIO_DESTAQUE, "fim": _FIM_DESTAQUE}):
+        if linha.topico_id not in trechos:
+            trechos[linha.topico_id] = _destacar(linha.trecho)
+
+    return ids, trechos, tem_proxima
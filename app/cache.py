@@ -0,0 +1,280 @@
+# app/cache.py
+"""
+Cache local do app (sem serviço externo).
+
+Dois backends, escolhidos por CACHE_BACKEND:
+
+- 'memoria' (padrão): LRU com validade por item, dentro do processo. Mais
+  rápido, mas cada worker tem o seu e uma invalidação só vale no processo
+  que a fez (a validade curta cobre os outros);
+- 'sqlite': um arquivo SQLite (CACHE_ARQUIVO) compartilhado pelos workers do
+  mesmo servidor e pelos scripts (ex: agregador). Invalidações valem para todos.
+
+Cada item pode ter tags (ex: 'comunidades', 'noticias', 'feed:usuario:7');
+`cache.invalidar('noticias')` apaga de uma vez tudo que foi guardado com a tag.
+
+Funções de consulta viram cacheadas com o decorator:
+
+    @cache.memorizar('facetas_comunidades', ttl='ESTATISTICAS_TTL', tags=('comunidades',))
+    def facetas_categorias(): ...
+
+Acertos e falhas vão para o /metrics (siif_cache_requisicoes_total) e para
+`cache.estatisticas()`.
+"""
+import contextlib
+import functools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+
+from app.metricas import contar_cache
+
+# Validade padrão (segundos) quando nem a chamada nem a configuração dizem outra
+TTL_PADRAO = 60
+
+
+# ===================================================================
+# BACKENDS
+# ===================================================================
+
+class MemoriaLRU:
+    """LRU em memória: ao passar de `max_itens`, sai o menos usado."""
+
+    def __init__(self, max_itens):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()  # chave -> (expira, valor, tags)
+        self._por_tag = {}           # tag -> {chaves}
+        self._lock = threading.Lock()
+
+    def _remover(self, chave):
+        _, _, tags = self._itens.pop(chave)
+        for tag in tags:
+            chaves = self._por_tag.get(tag)
+            if chaves is not None:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._por_tag[tag]
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return False, None
+            if time.monotonic() >= item[0]:
+                self._remover(chave)
+                return False, None
+            self._itens.move_to_end(chave)
+            return True, item[1]
+
+    def guardar(self, chave, valor, ttl, tags):
+        with self._lock:
+            if chave in self._itens:
+                self._remover(chave)
+            self._itens[chave] = (time.monotonic() + ttl, valor, tuple(tags))
+            for tag in tags:
+                self._por_tag.setdefault(tag, set()).add(chave)
+            while len(self._itens) > self.max_itens:
+                self._remover(next(iter(self._itens)))
+
+    def apagar(self, chave):
+        with self._lock:
+            if chave in self._itens:
+                self._remover(chave)
+
+    def invalidar(self, tags):
+        with self._lock:
+            for tag in tags:
+                for chave in list(self._por_tag.get(tag, ())):
+                    self._remover(chave)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._por_tag.clear()
+
+    def tamanho(self):
+        return len(self._itens)
+
+
+class ArquivoSQLite:
+    """
+    Cache num arquivo SQLite (WAL), visível para todos os processos do servidor.
+    Os valores são serializados com pickle: o arquivo fica na pasta instance do
+    app e não deve ser gravável por outros usuários.
+    """
+
+    # A cada quantas gravações (por processo) os vencidos e o excesso são apagados
+    LIMPEZA_A_CADA = 200
+
+    def __init__(self, caminho, max_itens):
+        self.caminho = caminho
+        self.max_itens = max_itens
+        self._gravacoes = 0
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('CREATE TABLE IF NOT EXISTS cache_itens '
+                            '(chave TEXT PRIMARY KEY, valor BLOB NOT NULL, expira REAL NOT NULL)')
+            conexao.execute('CREATE INDEX IF NOT EXISTS ix_cache_itens_expira ON cache_itens (expira)')
+            conexao.execute('CREATE TABLE IF NOT EXISTS cache_tags '
+                            '(tag TEXT NOT NULL, chave TEXT NOT NULL, PRIMARY KEY (tag, chave))')
+
+    @contextlib.contextmanager
+    def _conectar(self):
+        # Uma conexão por operação: barato no SQLite e seguro entre threads e forks.
+        # O `with` do sqlite3 só faz commit/rollback; quem fecha é o finally
+        conexao = sqlite3.connect(self.caminho, timeout=5)
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def obter(self, chave):
+        with self._conectar() as conexao:
+            linha = conexao.execute('SELECT valor, expira FROM cache_itens WHERE chave = ?', (chave,)).fetchone()
+        if linha is None or time.time() >= linha[1]:
+            return False, None
+        return True, pickle.loads(linha[0])
+
+    def guardar(self, chave, valor, ttl, tags):
+        with self._conectar() as conexao:
+            conexao.execute('INSERT OR REPLACE INTO cache_itens (chave, valor, expira) VALUES (?, ?, ?)',
+                            (chave, pickle.dumps(valor), time.time() + ttl))
+            conexao.executemany('INSERT OR IGNORE INTO cache_tags (tag, chave) VALUES (?, ?)',
+                                [(tag, chave) for tag in tags])
+        self._gravacoes += 1
+        if self._gravacoes % self.LIMPEZA_A_CADA == 0:
+            self._limpar_excesso()
+
+    def _limpar_excesso(self):
+        with self._conectar() as conexao:
+            conexao.execute('DELETE FROM cache_itens WHERE expira < ?', (time.time(),))
+            conexao.execute('DELETE FROM cache_itens WHERE chave IN (SELECT chave FROM cache_itens '
+                            'ORDER BY expira DESC LIMIT -1 OFFSET ?)', (self.max_itens,))
+            conexao.execute('DELETE FROM cache_tags WHERE chave NOT IN (SELECT chave FROM cache_itens)')
+
+    def apagar(self, chave):
+        with self._conectar() as conexao:
+            conexao.execute('DELETE FROM cache_itens WHERE chave = ?', (chave,))
+            conexao.execute('DELETE FROM cache_tags WHERE chave = ?', (chave,))
+
+    def invalidar(self, tags):
+        marcadores = ', '.join('?' * len(tags))
+        with self._conectar() as conexao:
+            conexao.execute(f'DELETE FROM cache_itens WHERE chave IN '
+                            f'(SELECT chave FROM cache_tags WHERE tag IN ({marcadores}))', tags)
+            conexao.execute(f'DELETE FROM cache_tags WHERE tag IN ({marcadores})', tags)
+
+    def limpar(self):
+        with self._conectar() as conexao:
+            conexao.execute('DELETE FROM cache_itens')
+            conexao.execute('DELETE FROM cache_tags')
+
+    def tamanho(self):
+        with self._conectar() as conexao:
+            return conexao.execute('SELECT COUNT(*) FROM cache_itens WHERE expira >= ?', (time.time(),)).fetchone()[0]
+
+
+# ===================================================================
+# FACHADA
+# ===================================================================
+
+class Cache:
+    """Ponto único de acesso ao cache do app (`from app.cache import cache`)."""
+
+    def __init__(self):
+        self.backend = None
+        self._estatisticas = {}  # nome -> [acertos, falhas]
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        max_itens = app.config['CACHE_MAX_ITENS']
+        if app.config['CACHE_BACKEND'] == 'sqlite':
+            self.backend = ArquivoSQLite(app.config['CACHE_ARQUIVO'], max_itens)
+        else:
+            self.backend = MemoriaLRU(max_itens)
+
+    def _backend(self):
+        # Fora do create_app (ex: import isolado em script) cai num LRU local
+        if self.backend is None:
+            self.backend = MemoriaLRU(10000)
+        return self.backend
+
+    def _ttl(self, ttl):
+        """`ttl` pode ser um número ou o nome de uma configuração (ex: 'ESTATISTICAS_TTL')."""
+        if isinstance(ttl, str):
+            return float(current_app.config.get(ttl, TTL_PADRAO)) if has_app_context() else TTL_PADRAO
+        if ttl is None:
+            return float(current_app.config.get('CACHE_TTL', TTL_PADRAO)) if has_app_context() else TTL_PADRAO
+        return ttl
+
+    def _contar(self, nome, acerto):
+        with self._lock:
+            contagem = self._estatisticas.setdefault(nome, [0, 0])
+            contagem[0 if acerto else 1] += 1
+        contar_cache(nome, acerto)
+
+    def obter(self, chave, nome=None):
+        """(achou, valor). `nome` agrupa as estatísticas (padrão: o prefixo da chave)."""
+        achou, valor = self._backend().obter(chave)
+        self._contar(nome or chave.split(':', 1)[0], achou)
+        return achou, valor
+
+    def guardar(self, chave, valor, ttl=None, tags=()):
+        self._backend().guardar(chave, valor, self._ttl(ttl), tuple(tags))
+
+    def apagar(self, chave):
+        self._backend().apagar(chave)
+
+    def invalidar(self, *tags):
+        """Apaga tudo que foi guardado com qualquer uma das tags."""
+        if tags:
+            self._backend().invalidar(tags)
+
+    def limpar(self):
+        self._backend().limpar()
+
+    def estatisticas(self):
+        """Acertos/falhas por cache e quantos itens válidos estão guardados."""
+        with self._lock:
+            por_nome = {
+                nome: {"acertos": acertos, "falhas": falhas,
+                       "taxa_acerto": round(acertos / (acertos + falhas), 3) if acertos + falhas else None}
+                for nome, (acertos, falhas) in sorted(self._estatisticas.items())
+            }
+        return {"backend": type(self._backend()).__name__, "itens": self._backend().tamanho(), "caches": por_nome}
+
+    def memorizar(self, nome, ttl=None, tags=()):
+        """
+        Decorator: guarda o retorno da função por argumentos. `tags` pode ser
+        uma tupla fixa ou uma função que recebe os mesmos argumentos e devolve
+        as tags. A função decorada ganha `.esquecer(*args, **kwargs)`.
+        """
+        def decorar(funcao):
+            def chave_de(args, kwargs):
+                return f'{nome}:{args!r}:{sorted(kwargs.items())!r}'
+
+            @functools.wraps(funcao)
+            def memorizada(*args, **kwargs):
+                chave = chave_de(args, kwargs)
+                achou, valor = self.obter(chave, nome)
+                if achou:
+                    return valor
+                valor = funcao(*args, **kwargs)
+                self.guardar(chave, valor, ttl, tags(*args, **kwargs) if callable(tags) else tags)
+                return valor
+
+            memorizada.esquecer = lambda *args, **kwargs: self.apagar(chave_de(args, kwargs))
+            return memorizada
+        return decorar
+
+
+cache = Cache()
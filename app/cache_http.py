@@ -0,0 +1,118 @@
+# app/cache_http.py
+"""
+Política de cache HTTP (Cache-Control / ETag) por rota.
+
+Antes todas as respostas de main e auth saíam com no-store e sem ETag, até a
+notícia pública: o navegador e o proxy do Render nunca reaproveitavam nada.
+Agora cada view declara o que pode ser guardado:
+
+    @main_bp.route('/noticia/<int:id>')
+    @politica_cache(PUBLICO, max_age=300)
+    def ver_noticia(id): ...
+
+- PRIVADO (padrão de toda rota sem decorator): no-store, sem ETag. Evita que
+  um proxy entregue a página (ou o cookie de sessão) de um aluno para outro;
+- PUBLICO: `public, max-age` + ETag para visitantes anônimos. Logado, a mesma
+  rota vira `private, no-cache` (o cabeçalho mostra nome e foto), mas ainda
+  com ETag: o navegador revalida e recebe 304 se nada mudou;
+- IMUTAVEL: um ano + immutable, para arquivos cujo nome muda junto com o
+  conteúdo (assets com hash).
+
+Respostas em streaming não são lidas para calcular o hash: a view passa uma
+ETag feita de um resumo barato do que vai enviar (`validador(contagem,
+maior_id, ...)`) e o 304 sai antes de o corpo ser gerado.
+
+Arquivos de /static não passam por aqui: as cópias com hash (app/assets.py)
+saem imutáveis e o resto segue o padrão do Flask (ETag + Last-Modified).
+"""
+import hashlib
+
+from flask import current_app, request, session
+from flask_login import current_user
+
+PRIVADO = 'privado'
+PUBLICO = 'publico'
+IMUTAVEL = 'imutavel'
+
+# max-age padrão (segundos) das rotas públicas
+MAX_AGE_PADRAO = 60
+
+UM_ANO = 365 * 24 * 3600
+
+
+def politica_cache(tipo, max_age=MAX_AGE_PADRAO):
+    """Decorator: marca a view com a política usada em `aplicar_politica`."""
+    def decorar(view):
+        view.politica_cache = (tipo, max_age)
+        return view
+    return decorar
+
+
+def validador(*partes):
+    """ETag de uma resposta em streaming a partir de um resumo (contagem, maior id, data mais recente...)."""
+    return hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()
+
+
+def _politica_da_requisicao():
+    view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+    if view is None:
+        return None
+    return getattr(view, 'politica_cache', None)
+
+
+def _privado(response):
+    response.headers["Cache-Control"] = "no-cache, private, no-store, must-revalidate, max-age=0"
+    response.headers["Pragma"] = "no-cache"
+    response.headers["Expires"] = "0"
+    response.vary.add('Cookie')
+
+    # Sem ETag/Last-Modified não há requisição condicional (304) de conteúdo privado
+    if 'ETag' in response.headers:
+        del response.headers['ETag']
+    if 'Last-Modified' in response.headers:
+        del response.headers['Last-Modified']
+    return response
+
+
+def _com_etag(response):
+    if not response.is_streamed:
+        response.add_etag()
+        response.make_conditional(request)
+        return response
+
+    # Streaming: só vale a ETag que a view já pôs (ver `validador`). Sem o
+    # make_conditional, que leria o corpo inteiro para o Content-Length
+    etag = response.get_etag()[0]
+    if etag and request.if_none_match.contains_weak(etag):
+        response.status_code = 304
+    return response
+
+
+def aplicar_politica(response):
+    """after_request do app: aplica a política declarada pela view (ou PRIVADO)."""
+    politica = _politica_da_requisicao()
+    if politica is None:
+        if request.endpoint == 'static':
+            return response
+        return _privado(response)
+
+    tipo, max_age = politica
+    cacheavel = request.method in ('GET', 'HEAD') and response.status_code == 200
+    if tipo == PRIVADO or not cacheavel:
+        return _privado(response)
+
+    if tipo == IMUTAVEL:
+        response.headers["Cache-Control"] = f"public, max-age={UM_ANO}, immutable"
+        return _com_etag(response)
+
+    # PUBLICO: só é compartilhável se a resposta não depende de quem pediu
+    response.vary.add('Cookie')
+    if current_user.is_authenticated or session.modified:
+        response.headers["Cache-Control"] = "private, no-cache"
+    else:
+        response.headers["Cache-Control"] = f"public, max-age={max_age}"
+    return _com_etag(response)
+
+
+def init_app(app):
+    app.after_request(aplicar_politica)
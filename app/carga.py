@@ -0,0 +1,355 @@
+# app/carga.py
+"""
+Dados sintéticos e benchmark das rotas principais.
+
+`flask siif seed` enche o banco com um volume realista (tamanho das
+comunidades em lei de potência, poucos tópicos "quentes" concentrando
+respostas e likes, usuários muito mais ativos que outros) e
+`flask siif benchmark` mede as rotas mais acessadas com o test client,
+contando as consultas de cada uma. Use sempre um banco separado:
+
+    DATABASE_URL=sqlite:////tmp/siif_carga.db flask siif init
+    DATABASE_URL=sqlite:////tmp/siif_carga.db flask siif seed --usuarios 5000
+    DATABASE_URL=sqlite:////tmp/siif_carga.db flask siif benchmark --saida base.json
+
+Com a mesma semente os dados gerados são sempre os mesmos.
+"""
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timezone, timedelta
+
+from sqlalchemy import event, insert, select, func
+from werkzeug.security import generate_password_hash
+
+from app.extensions import db, limiter
+from app.models import (
+    User, Comunidade, membros_comunidade, Topico, Resposta, PostLike, EnqueteOpcao, EnqueteVoto,
+    Material, Notificacao, Noticia, NoticiaAgregada
+)
+
+PREFIXO = 'seed'  # matrícula dos usuários e nome das comunidades geradas
+
+CATEGORIAS = ["Informática", "Matemática", "Física", "Química", "Biologia", "História",
+              "Edificações", "Eletrotécnica", "Mecânica", "Administração", "Geral"]
+CAMPI = ["Natal-Central", "Natal-Zona Norte", "Mossoró", "Parnamirim", "Caicó", "Pau dos Ferros"]
+PALAVRAS = ("prova trabalho aula projeto estágio laboratório monitoria horário biblioteca "
+            "seminário edital bolsa grupo dúvida exercício lista apostila resumo calendário").split()
+
+
+def _texto(rng, palavras):
+    return ' '.join(rng.choice(PALAVRAS) for _ in range(palavras)).capitalize()
+
+
+def _pesos_potencia(n, expoente):
+    """Pesos 1/(i+1)^expoente: poucos itens muito grandes, cauda longa de pequenos."""
+    return [1 / (i + 1) ** expoente for i in range(n)]
+
+
+def _inserir(modelo, linhas, lote=2000):
+    for i in range(0, len(linhas), lote):
+        db.session.execute(insert(modelo), linhas[i:i + lote])
+
+
+def _ids_novos(coluna_id, id_antes):
+    return db.session.execute(select(coluna_id).where(coluna_id > id_antes).order_by(coluna_id)).scalars().all()
+
+
+def _max_id(coluna_id):
+    return db.session.execute(select(func.max(coluna_id))).scalar() or 0
+
+
+# ===================================================================
+# GERAÇÃO
+# ===================================================================
+
+def gerar_dados(usuarios=1000, comunidades=50, topicos=5000, materiais=500, noticias=100,
+                semente=42, eco=print):
+    """Gera os dados e faz commit. Retorna um dict com o que foi criado."""
+    rng = random.Random(semente)
+    agora = datetime.now(timezone.utc)
+
+    def data_recente(dias=90):
+        # Mais conteúdo recente do que antigo
+        return agora - timedelta(seconds=int(rng.betavariate(1, 3) * dias * 86400))
+
+    # --- Usuários (uma senha só para todos: 'seed') ---
+    inicio_usuarios = _max_id(User.id)
+    senha = generate_password_hash('seed')
+    _inserir(User, [{
+        "matricula": f"{PREFIXO}{semente}_{i:06d}",
+        "email": f"{PREFIXO}{semente}_{i}@escolar.ifrn.edu.br",
+        "name": f"Aluno {_texto(rng, 1)} {i}",
+        "password_hash": senha,
+        "curso": rng.choice(CATEGORIAS),
+        "campus": rng.choice(CAMPI),
+        "tipo_usuario": "Aluno",
+        "notificacoes_nao_lidas": 0
+    } for i in range(usuarios)])
+    ids_usuarios = _ids_novos(User.id, inicio_usuarios)
+    atividade = _pesos_potencia(len(ids_usuarios), 0.8)  # quem posta/curte mais
+    eco(f'{len(ids_usuarios)} usuários')
+
+    # --- Comunidades: tamanhos em lei de potência (a maior com ~60% dos usuários) ---
+    inicio_comunidades = _max_id(Comunidade.id)
+    _inserir(Comunidade, [{
+        "nome": f"{PREFIXO.capitalize()} {semente} {_texto(rng, 2)} {i}",
+        "descricao": _texto(rng, 12),
+        "categoria": rng.choice(CATEGORIAS),
+        "tipo_acesso": 'Restrito' if rng.random() < 0.15 else 'Público',
+        "criado_em": data_recente(365),
+        "criador_id": rng.choice(ids_usuarios)
+    } for i in range(comunidades)])
+    ids_comunidades = _ids_novos(Comunidade.id, inicio_comunidades)
+
+    membros_por_comunidade = {}
+    linhas_membros = []
+    for posicao, comunidade_id in enumerate(ids_comunidades):
+        tamanho = min(len(ids_usuarios), max(3, int(len(ids_usuarios) * 0.6 / (posicao + 1) ** 1.1)))
+        membros = rng.sample(ids_usuarios, tamanho)
+        membros_por_comunidade[comunidade_id] = membros
+        linhas_membros += [{"user_id": u, "comunidade_id": comunidade_id} for u in membros]
+    _inserir(membros_comunidade, linhas_membros)
+    eco(f'{len(ids_comunidades)} comunidades, {len(linhas_membros)} participações')
+
+    # --- Tópicos: comunidades maiores recebem mais posts; ~20% no fórum geral ---
+    pesos_comunidades = [len(membros_por_comunidade[c]) for c in ids_comunidades]
+    inicio_topicos = _max_id(Topico.id)
+    linhas_topicos = []
+    for _ in range(topicos):
+        comunidade_id = None if rng.random() < 0.2 else rng.choices(ids_comunidades, pesos_comunidades)[0]
+        autores = membros_por_comunidade[comunidade_id] if comunidade_id else ids_usuarios
+        linhas_topicos.append({
+            "titulo": _texto(rng, rng.randint(3, 8)),
+            "conteudo": _texto(rng, rng.randint(10, 60)),
+            "tipo_post": 'enquete' if rng.random() < 0.08 else 'geral',
+            "criado_em": data_recente(),
+            "autor_id": rng.choice(autores) if comunidade_id else rng.choices(ids_usuarios, atividade)[0],
+            "comunidade_id": comunidade_id,
+            "fixado": rng.random() < 0.01
+        })
+    _inserir(Topico, linhas_topicos)
+    topicos_criados = db.session.execute(
+        select(Topico.id, Topico.comunidade_id, Topico.tipo_post).where(Topico.id > inicio_topicos)
+    ).all()
+    eco(f'{len(topicos_criados)} tópicos')
+
+    # --- Respostas e likes: Pareto (a maioria sem nada, alguns tópicos "quentes") ---
+    inicio_respostas = _max_id(Resposta.id)
+    linhas_respostas, linhas_likes, opcoes = [], [], []
+    for topico_id, comunidade_id, tipo in topicos_criados:
+        publico = membros_por_comunidade[comunidade_id] if comunidade_id else ids_usuarios
+
+        qtd_respostas = min(int(rng.paretovariate(1.2)) - 1, 300)
+        for _ in range(qtd_respostas):
+            linhas_respostas.append({
+                "conteudo": _texto(rng, rng.randint(3, 30)),
+                "topico_id": topico_id,
+                "autor_id": rng.choice(publico),
+                "criado_em": data_recente(30)
+            })
+
+        qtd_likes = min(int(rng.paretovariate(1.0)) - 1, len(publico))
+        linhas_likes += [{"user_id": u, "topico_id": topico_id} for u in rng.sample(publico, qtd_likes)]
+
+        if tipo == 'enquete':
+            opcoes += [{"texto": _texto(rng, 2), "topico_id": topico_id} for _ in range(rng.randint(2, 4))]
+
+    _inserir(Resposta, linhas_respostas)
+    _inserir(PostLike, linhas_likes)
+
+    # ~30% das respostas ganham uma resposta aninhada
+    respostas = db.session.execute(
+        select(Resposta.id, Resposta.topico_id).where(Resposta.id > inicio_respostas)
+    ).all()
+    aninhadas = [{
+        "conteudo": _texto(rng, rng.randint(3, 20)),
+        "topico_id": topico_id,
+        "autor_id": rng.choices(ids_usuarios, atividade)[0],
+        "parent_id": resposta_id,
+        "criado_em": data_recente(15)
+    } for resposta_id, topico_id in respostas if rng.random() < 0.3]
+    _inserir(Resposta, aninhadas)
+    eco(f'{len(linhas_respostas) + len(aninhadas)} respostas, {len(linhas_likes)} likes')
+
+    # --- Enquetes: cada votante escolhe uma opção ---
+    inicio_opcoes = _max_id(EnqueteOpcao.id)
+    _inserir(EnqueteOpcao, opcoes)
+    opcoes_por_topico = {}
+    for opcao_id, topico_id in db.session.execute(
+        select(EnqueteOpcao.id, EnqueteOpcao.topico_id).where(EnqueteOpcao.id > inicio_opcoes)
+    ):
+        opcoes_por_topico.setdefault(topico_id, []).append(opcao_id)
+
+    linhas_votos = []
+    for topico_id, ids_opcoes in opcoes_por_topico.items():
+        votantes = rng.sample(ids_usuarios, min(len(ids_usuarios), int(rng.paretovariate(1.0) * 5)))
+        linhas_votos += [{"user_id": u, "opcao_id": rng.choice(ids_opcoes), "topico_id": topico_id} for u in votantes]
+    _inserir(EnqueteVoto, linhas_votos)
+    eco(f'{len(opcoes_por_topico)} enquetes, {len(linhas_votos)} votos')
+
+    # --- Materiais, notícias e notificações ---
+    _inserir(Material, [{
+        "titulo": _texto(rng, rng.randint(2, 6)),
+        "descricao": _texto(rng, 20),
+        "link_externo": f"https://example.org/material/{i}",
+        "categoria": rng.choice(CATEGORIAS),
+        "download_count": int(rng.paretovariate(1.1)) - 1,
+        "data_upload": data_recente(365),
+        "autor_id": rng.choices(ids_usuarios, atividade)[0]
+    } for i in range(materiais)])
+
+    _inserir(Noticia, [{
+        "titulo": _texto(rng, 5)[:100],
+        "conteudo": _texto(rng, 80),
+        "campus": rng.choice(CAMPI),
+        "categoria": "Geral",
+        "data_publicacao": data_recente(180).replace(tzinfo=None),
+        "user_id": ids_usuarios[0]
+    } for _ in range(noticias)])
+    _inserir(NoticiaAgregada, [{
+        "titulo": _texto(rng, 6),
+        "conteudo": _texto(rng, 30),
+        "link_externo": f"https://portal.ifrn.edu.br/{PREFIXO}/{semente}/{i}",
+        "data_publicacao": data_recente(180),
+        "campus": "Reitoria",
+        "categoria": "Notícia Portal"
+    } for i in range(noticias)])
+
+    linhas_notificacoes = []
+    for usuario_id in rng.choices(ids_usuarios, atividade, k=len(ids_usuarios) * 5):
+        linhas_notificacoes.append({
+            "usuario_id": usuario_id,
+            "mensagem": f"{_texto(rng, 2)} comentou no seu post.",
+            "lida": rng.random() < 0.7,
+            "data_criacao": data_recente(60)
+        })
+    _inserir(Notificacao, linhas_notificacoes)
+    eco(f'{materiais} materiais, {noticias * 2} notícias, {len(linhas_notificacoes)} notificações')
+
+    db.session.commit()
+
+    from app import comunidades as servico_comunidades, notificacoes
+    from app.respostas import recalcular_caminhos
+    from app.enquetes import recalcular_contadores as recalcular_enquetes
+    from app.busca import reindexar as reindexar_forum
+    from app import relevancia
+    notificacoes.recalcular_contadores()
+    servico_comunidades.recalcular_contadores()
+    servico_comunidades.reindexar_busca()
+    recalcular_caminhos()
+    recalcular_enquetes()
+    reindexar_forum()
+    relevancia.recalcular()
+
+    maior = max(membros_por_comunidade, key=lambda c: len(membros_por_comunidade[c]), default=None)
+    return {
+        "usuarios": len(ids_usuarios),
+        "comunidades": len(ids_comunidades),
+        "maior_comunidade": {"id": maior, "membros": len(membros_por_comunidade[maior])} if maior else None,
+        "topicos": len(topicos_criados)
+    }
+
+
+# ===================================================================
+# BENCHMARK
+# ===================================================================
+
+def rotas_padrao():
+    """(nome, url) das rotas medidas. A comunidade é a maior do banco."""
+    maior = db.session.execute(
+        select(membros_comunidade.c.comunidade_id)
+        .group_by(membros_comunidade.c.comunidade_id)
+        .order_by(func.count().desc())
+        .limit(1)
+    ).scalar()
+
+    rotas = [
+        ('tela_inicial', '/home'),
+        ('tela_foruns', '/forum'),
+        ('tela_materiais', '/materiais'),
+        ('api_noticias', '/api/noticias'),
+    ]
+    if maior:
+        rotas.insert(2, ('ver_comunidade', f'/c/{maior}'))
+    return rotas
+
+
+def _usuario_do_benchmark():
+    """Um usuário gerado que participa de muitas comunidades (o caso mais pesado)."""
+    return db.session.execute(
+        select(membros_comunidade.c.user_id)
+        .join(User, User.id == membros_comunidade.c.user_id)
+        .where(User.matricula.like(f'{PREFIXO}%'))
+        .group_by(membros_comunidade.c.user_id)
+        .order_by(func.count().desc())
+        .limit(1)
+    ).scalar()
+
+
+def medir_rotas(app, repeticoes=5, rotas=None, usuario_id=None):
+    """
+    Mede cada rota com o test client (1 aquecimento + `repeticoes` medições).
+    Retorna uma lista de dicts com status, tempos (ms) e consultas por requisição.
+    """
+    rotas = rotas or rotas_padrao()
+    usuario_id = usuario_id or _usuario_do_benchmark()
+
+    consultas = [0]
+
+    def contar(*args):
+        consultas[0] += 1
+
+    engine = db.engine
+    event.listen(engine, 'after_cursor_execute', contar)
+
+    limiter_ativo = limiter.enabled
+    limiter.enabled = False
+
+    cliente = app.test_client()
+    if usuario_id:
+        with cliente.session_transaction() as sessao:
+            sessao['_user_id'] = str(usuario_id)
+            sessao['_fresh'] = True
+
+    resultados = []
+    try:
+        for nome, url in rotas:
+            cliente.get(url)  # aquecimento (caches, templates compilados)
+
+            tempos = []
+            for _ in range(repeticoes):
+                consultas[0] = 0
+                inicio = time.perf_counter()
+                resposta = cliente.get(url)
+                _ = resposta.data  # consome respostas em streaming
+                tempos.append((time.perf_counter() - inicio) * 1000)
+
+            tempos.sort()
+            resultados.append({
+                "rota": nome,
+                "url": url,
+                "status": resposta.status_code,
+                "min_ms": round(tempos[0], 2),
+                "mediana_ms": round(statistics.median(tempos), 2),
+                "p95_ms": round(tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))], 2),
+                "consultas": consultas[0],
+                "bytes": len(resposta.data)
+            })
+    finally:
+        event.remove(engine, 'after_cursor_execute', contar)
+        limiter.enabled = limiter_ativo
+
+    return resultados
+
+
+def salvar_resultados(caminho, resultados):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump({"gerado_em": datetime.now(timezone.utc).isoformat(), "rotas": resultados},
+                  arquivo, ensure_ascii=False, indent=2)
+
+
+def carregar_resultados(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return {r["rota"]: r for r in json.load(arquivo)["rotas"]}
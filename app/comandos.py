@@ -0,0 +1,262 @@
+# app/comandos.py
+"""
+Comandos de linha de comando do SIIF (`flask siif ...`).
+
+Rotinas de manutenção que não devem rodar dentro de uma requisição
+(ex: limpeza periódica de notificações, agendada no cron do servidor).
+"""
+import time
+
+import click
+from flask.cli import AppGroup
+
+siif_cli = AppGroup('siif', help='Comandos de manutenção do SIIF.')
+
+# Último schema antes das migrações novas: o que o create_all antigo deixava
+# nos bancos que nunca rodaram `flask db` (sem a tabela alembic_version)
+REVISAO_LEGADA = '4617117b9b96'
+
+
+def atualizar_schema():
+    """
+    Leva o banco ao schema atual. O create_all sozinho não serve: ele só cria
+    tabelas que faltam, nunca adiciona colunas (ex: topico.relevancia).
+
+    - banco com alembic_version: aplica as migrações pendentes;
+    - banco vazio: create_all e marca como na última migração;
+    - tabelas sem alembic_version: para com erro (ver REVISAO_LEGADA e README).
+    """
+    from flask_migrate import stamp, upgrade
+    from sqlalchemy import inspect
+    from app.extensions import db
+
+    tabelas = set(inspect(db.engine).get_table_names())
+    if 'alembic_version' in tabelas:
+        upgrade()
+    elif not tabelas & set(db.metadata.tables):
+        db.create_all()
+        stamp()
+    else:
+        raise click.ClickException(
+            'O banco tem tabelas mas nunca passou pelo Alembic. Se ele foi criado pela '
+            f'versão antiga (create_all), rode uma vez `flask db stamp {REVISAO_LEGADA}` '
+            'e depois `flask siif init` de novo.'
+        )
+
+
+def inicializar_banco():
+    """Atualiza o schema (migrações) e cria o usuário administrador padrão (se ainda não existir)."""
+    from app.extensions import db
+    from app.models import User
+
+    atualizar_schema()
+
+    # Índice de busca do fórum (tabela virtual/tsvector, fora do create_all)
+    from app.busca import criar_indice
+    criar_indice()
+
+    # Verifica se admin existe, se não, cria
+    if not User.query.filter_by(matricula="1234").first():
+        print("--- CRIANDO USUÁRIO ADMINISTRADOR PADRÃO ---")
+        admin_user = User(
+            matricula="1234",
+            is_admin=True,
+            email="admin@siif.com",
+            name="Administrador",
+            tipo_usuario="Servidor"  # Ajuste conforme seu model
+        )
+        # Define a senha corretamente usando o hash
+        admin_user.set_password("admin")
+
+        db.session.add(admin_user)
+        db.session.commit()
+        print("--- ADMIN CRIADO COM SUCESSO ---")
+
+
+@siif_cli.command('init')
+def init():
+    """Prepara o banco: aplica as migrações e cria o admin padrão. Rodar a cada deploy."""
+    inicializar_banco()
+    click.echo('--- Banco inicializado. ---')
+
+
+@siif_cli.command('limpar-notificacoes')
+@click.option('--dias', default=None, type=click.IntRange(min=0),
+              help='Remove notificações lidas mais antigas que N dias.')
+@click.option('--limite', default=None, type=click.IntRange(min=1),
+              help='Máximo de notificações lidas mantidas por usuário (mínimo 1).')
+def limpar_notificacoes(dias, limite):
+    """Descarta notificações lidas antigas e recalcula os contadores de não lidas."""
+    from app import notificacoes
+
+    removidas = notificacoes.limpar_notificacoes_antigas(
+        dias=dias if dias is not None else notificacoes.DIAS_RETENCAO_LIDAS,
+        limite_por_usuario=limite if limite is not None else notificacoes.LIMITE_LIDAS_POR_USUARIO
+    )
+    notificacoes.recalcular_contadores()
+    click.echo(f'--- {removidas} notificações removidas, contadores recalculados. ---')
+
+
+@siif_cli.command('recalcular-estatisticas')
+def recalcular_estatisticas():
+    """Reconstrói o histórico de posts/dia e uploads/dia do painel admin."""
+    from app.estatisticas import recalcular_serie
+
+    recalcular_serie()
+    click.echo('--- Estatísticas diárias recalculadas. ---')
+
+
+@siif_cli.command('recalcular-comunidades')
+def recalcular_comunidades():
+    """Reconcilia os contadores (membros, tópicos, última atividade) e o índice de busca das comunidades."""
+    from app.comunidades import recalcular_contadores, reindexar_busca
+
+    recalcular_contadores()
+    reindexar_busca()
+    click.echo('--- Contadores e índice de busca das comunidades recalculados. ---')
+
+
+@siif_cli.command('recalcular-respostas')
+def recalcular_respostas():
+    """Refaz o caminho materializado da árvore de respostas a partir de parent_id."""
+    from app.respostas import recalcular_caminhos
+
+    recalcular_caminhos()
+    click.echo('--- Caminhos das respostas recalculados. ---')
+
+
+@siif_cli.command('recalcular-enquetes')
+def recalcular_enquetes():
+    """Recalcula o contador de votos de cada opção de enquete."""
+    from app.enquetes import recalcular_contadores
+
+    recalcular_contadores()
+    click.echo('--- Votos das enquetes recalculados. ---')
+
+
+@siif_cli.command('reindexar-forum')
+def reindexar_forum():
+    """Recria o índice de busca do fórum (tópicos e respostas)."""
+    from app.busca import criar_indice, reindexar
+
+    criar_indice()
+    reindexar()
+    click.echo('--- Índice de busca do fórum refeito. ---')
+
+
+@siif_cli.command('recalcular-relevancia')
+def recalcular_relevancia():
+    """Recalcula interações e relevância dos tópicos (agendar no cron, ex: a cada hora)."""
+    from app.relevancia import recalcular
+
+    recalcular()
+    click.echo('--- Relevância dos tópicos recalculada. ---')
+
+
+@siif_cli.command('assets')
+def gerar_assets():
+    """Gera static/dist: cópias com hash no nome, versões .gz/.br e o manifest (rodar no build)."""
+    from flask import current_app
+    from app.assets import construir
+
+    resumo = construir(current_app.static_folder)
+    click.echo(f'--- {resumo["arquivos"]} arquivos em static/dist '
+               f'({resumo["bytes"] / 1024:.0f} KB; gzip economiza {resumo["bytes_comprimidos"] / 1024:.0f} KB; '
+               f'codificações: {", ".join(resumo["codificacoes"])}). Reinicie o app para usar o manifest. ---')
+
+
+@siif_cli.command('limpar-cache')
+@click.option('--tag', 'tags', multiple=True, help='Apaga só os itens com esta tag (pode repetir).')
+def limpar_cache(tags):
+    """Esvazia o cache do app (só tem efeito nos outros processos com CACHE_BACKEND=sqlite)."""
+    from app.cache import cache
+
+    if tags:
+        cache.invalidar(*tags)
+    else:
+        cache.limpar()
+    click.echo('--- Cache limpo. ---')
+
+
+@siif_cli.command('perfil-importacao')
+@click.option('--top', default=5, type=int, help='Quantos imports mais pesados mostrar por módulo.')
+def perfil_importacao(top):
+    """Mostra o custo de importação de cada blueprint (python -X importtime) e do create_app."""
+    from flask import current_app
+    from app.importacao import perfil_importacao as medir
+
+    linhas, tempo_create_app, tardios = medir()
+
+    total = 0.0
+    for modulo, ms, filhos in linhas:
+        total += ms
+        click.echo(f'{modulo:<14} {ms:8.1f} ms')
+        for filho_ms, nome in filhos[:top]:
+            click.echo(f'    {nome:<40} {filho_ms:8.1f} ms')
+
+    click.echo(f'{"create_app()":<14} {tempo_create_app:8.1f} ms')
+    total += tempo_create_app
+    orcamento = current_app.config['ORCAMENTO_INICIALIZACAO_MS']
+    click.echo(f'--- Total: {total:.1f} ms (orçamento do create_app: {orcamento:.0f} ms) ---')
+
+    if tardios:
+        click.echo(f'!!! Módulos tardios carregados durante o boot: {", ".join(tardios)}')
+
+
+# ===================================================================
+# CARGA SINTÉTICA E BENCHMARK (usar com um banco separado!)
+# ===================================================================
+
+@siif_cli.command('seed')
+@click.option('--usuarios', default=1000, type=click.IntRange(min=1))
+@click.option('--comunidades', default=50, type=click.IntRange(min=1))
+@click.option('--topicos', default=5000, type=click.IntRange(min=0))
+@click.option('--materiais', default=500, type=click.IntRange(min=0))
+@click.option('--noticias', default=100, type=click.IntRange(min=0))
+@click.option('--semente', default=42, type=int, help='Mesma semente = mesmos dados.')
+@click.option('--sim', is_flag=True, help='Não pede confirmação.')
+def seed(usuarios, comunidades, topicos, materiais, noticias, semente, sim):
+    """Gera dados sintéticos realistas para testes de carga."""
+    from flask import current_app
+    from app.carga import gerar_dados
+
+    banco = current_app.config['SQLALCHEMY_DATABASE_URI']
+    if not sim:
+        click.confirm(f'Gerar dados sintéticos em {banco}?', abort=True)
+
+    inicio = time.perf_counter()
+    resumo = gerar_dados(usuarios, comunidades, topicos, materiais, noticias, semente,
+                         eco=lambda texto: click.echo(f'  {texto}'))
+    maior = resumo["maior_comunidade"]
+    descricao_maior = f'#{maior["id"]}, {maior["membros"]} membros' if maior else 'nenhuma'
+    click.echo(f'--- Dados gerados em {time.perf_counter() - inicio:.1f} s '
+               f'(maior comunidade: {descricao_maior}; senha dos usuários: seed) ---')
+
+
+@siif_cli.command('benchmark')
+@click.option('--repeticoes', default=5, type=click.IntRange(min=1),
+              help='Medições por rota (depois de 1 aquecimento; mínimo 1).')
+@click.option('--saida', default=None, type=click.Path(dir_okay=False), help='Salva os resultados em JSON.')
+@click.option('--comparar', default=None, type=click.Path(exists=True, dir_okay=False),
+              help='JSON de uma execução anterior para comparar.')
+def benchmark(repeticoes, saida, comparar):
+    """Mede as rotas principais (tempo e número de consultas) com o test client."""
+    from flask import current_app
+    from app.carga import medir_rotas, salvar_resultados, carregar_resultados
+
+    resultados = medir_rotas(current_app._get_current_object(), repeticoes)
+    anteriores = carregar_resultados(comparar) if comparar else {}
+
+    click.echo(f'{"rota":<16}{"status":>7}{"mediana":>11}{"p95":>11}{"consultas":>11}{"KB":>9}')
+    for r in resultados:
+        linha = (f'{r["rota"]:<16}{r["status"]:>7}{r["mediana_ms"]:>9.1f}ms{r["p95_ms"]:>9.1f}ms'
+                 f'{r["consultas"]:>11}{r["bytes"] / 1024:>9.1f}')
+        antes = anteriores.get(r["rota"])
+        if antes:
+            variacao = (r["mediana_ms"] / antes["mediana_ms"] - 1) * 100 if antes["mediana_ms"] else 0
+            linha += f'   ({variacao:+.0f}% tempo, {r["consultas"] - antes["consultas"]:+d} consultas)'
+        click.echo(linha)
+
+    if saida:
+        salvar_resultados(saida, resultados)
+        click.echo(f'--- Resultados salvos em {saida} ---')
@@ -0,0 +1,225 @@
+# app/compressao.py
+"""
+Compressão das respostas (gzip, ou brotli se o pacote estiver instalado).
+
+Middleware WSGI instalado no create_app junto do ProxyFix. Páginas como o
+fórum e a divulgação e o JSON de /api/noticias saíam sem compressão; HTML
+e JSON costumam cair para 1/5 do tamanho.
+
+Só comprime quando:
+
+- o navegador aceita br ou gzip (Accept-Encoding) e não é HEAD;
+- o status é 200-299 (exceto 204/206);
+- o tipo é texto (TIPOS_COMPRIMIVEIS). PDF, JPEG, PNG, MP4, zip... já vêm
+  comprimidos e passam direto, assim como text/event-stream (o tempo real
+  precisa de cada evento na hora);
+- a resposta ainda não tem Content-Encoding (ex: assets pré-comprimidos) nem
+  `Cache-Control: no-transform`;
+- o tamanho, quando conhecido, é de pelo menos `minimo` bytes.
+
+Respostas com Content-Length (até MAXIMO_EM_MEMORIA) são comprimidas de uma
+vez; as em streaming (e as muito grandes) pedaço a pedaço, com flush a cada
+pedaço para não segurar o que já poderia ter sido enviado.
+"""
+import importlib.util
+import zlib
+
+from werkzeug.http import parse_accept_header
+
+from app.importacao import modulo_tardio
+
+brotli = modulo_tardio('brotli')
+
+TIPOS_COMPRIMIVEIS = (
+    'text/', 'application/json', 'application/x-ndjson', 'application/javascript',
+    'application/xml', 'application/rss+xml', 'image/svg+xml',
+)
+TIPOS_IGNORADOS = ('text/event-stream',)
+
+# Acima disso (ex: um .txt grande enviado com send_file) comprime em streaming
+MAXIMO_EM_MEMORIA = 4 * 1024 * 1024
+
+# Níveis para conteúdo dinâmico (os máximos ficam para o build de assets)
+NIVEL_GZIP = 6
+QUALIDADE_BROTLI = 5
+
+
+def brotli_disponivel():
+    return importlib.util.find_spec('brotli') is not None
+
+
+# ===================================================================
+# COMPRESSORES
+# ===================================================================
+
+class _Gzip:
+    def __init__(self, nivel):
+        # wbits=31: formato gzip (cabeçalho + crc), não zlib puro
+        self._objeto = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+
+    def comprimir(self, dados):
+        return self._objeto.compress(dados) + self._objeto.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self):
+        return self._objeto.flush()
+
+
+class _Brotli:
+    def __init__(self, qualidade):
+        self._objeto = brotli.Compressor(quality=qualidade)
+
+    def comprimir(self, dados):
+        return self._objeto.process(dados) + self._objeto.flush()
+
+    def finalizar(self):
+        return self._objeto.finish()
+
+
+# ===================================================================
+# MIDDLEWARE
+# ===================================================================
+
+class _ComEscritos:
+    """
+    Corpo da resposta com o que o app mandou por write() na frente.
+
+    O write() devolvido pelo start_response (PEP 3333) fica guardado até a
+    decisão de comprimir ou não; depois sai antes do iterável, na ordem.
+    """
+
+    def __init__(self, escritos, corpo):
+        self.escritos = escritos
+        self.corpo = corpo
+
+    def __iter__(self):
+        yield from self.escritos
+        yield from self.corpo
+
+    def close(self):
+        if hasattr(self.corpo, 'close'):
+            self.corpo.close()
+
+
+class _Comprimido:
+    """
+    Corpo comprimido pedaço a pedaço.
+
+    É uma classe, e não um gerador, para que o close() do servidor sempre
+    chegue ao corpo original: o finally de um gerador que nunca começou a
+    ser iterado não roda.
+    """
+
+    def __init__(self, corpo, compressor):
+        self.corpo = corpo
+        self.compressor = compressor
+
+    def __iter__(self):
+        for pedaco in self.corpo:
+            if pedaco:
+                saida = self.compressor.comprimir(pedaco)
+                if saida:
+                    yield saida
+        yield self.compressor.finalizar()
+
+    def close(self):
+        if hasattr(self.corpo, 'close'):
+            self.corpo.close()
+
+
+class Compressao:
+    """Envolve `app.wsgi_app`: `app.wsgi_app = Compressao(app.wsgi_app)`."""
+
+    def __init__(self, app, minimo=1024, nivel_gzip=NIVEL_GZIP, qualidade_brotli=QUALIDADE_BROTLI):
+        self.app = app
+        self.minimo = minimo
+        self.nivel_gzip = nivel_gzip
+        self.qualidade_brotli = qualidade_brotli
+        self.com_brotli = brotli_disponivel()
+
+    def _codificacao(self, environ):
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            return None
+        aceitos = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if self.com_brotli and aceitos['br']:
+            return 'br'
+        if aceitos['gzip']:
+            return 'gzip'
+        return None
+
+    def _compressor(self, codificacao):
+        if codificacao == 'br':
+            return _Brotli(self.qualidade_brotli)
+        return _Gzip(self.nivel_gzip)
+
+    def _deve_comprimir(self, status, cabecalhos):
+        codigo = int(status.split(' ', 1)[0])
+        if not 200 <= codigo < 300 or codigo in (204, 206):
+            return False
+
+        valores = {nome.lower(): valor for nome, valor in cabecalhos}
+        if 'content-encoding' in valores or 'no-transform' in valores.get('cache-control', ''):
+            return False
+        tipo = valores.get('content-type', '').split(';', 1)[0].strip().lower()
+        if not tipo.startswith(TIPOS_COMPRIMIVEIS) or tipo.startswith(TIPOS_IGNORADOS):
+            return False
+        tamanho = valores.get('content-length')
+        return tamanho is None or int(tamanho) >= self.minimo
+
+    def __call__(self, environ, start_response):
+        codificacao = self._codificacao(environ)
+        if codificacao is None:
+            return self.app(environ, start_response)
+
+        capturado = {}
+        escritos = []
+
+        def guardar_inicio(status, cabecalhos, exc_info=None):
+            capturado.update(status=status, cabecalhos=cabecalhos, exc_info=exc_info)
+            return escritos.append
+
+        corpo = self.app(environ, guardar_inicio)
+        if escritos:
+            corpo = _ComEscritos(escritos, corpo)
+        status, cabecalhos = capturado['status'], capturado['cabecalhos']
+
+        if not self._deve_comprimir(status, cabecalhos):
+            start_response(status, cabecalhos, capturado['exc_info'])
+            return corpo
+
+        tamanho = next((int(valor) for nome, valor in cabecalhos if nome.lower() == 'content-length'), None)
+        cabecalhos = self._ajustar_cabecalhos(cabecalhos, codificacao)
+        compressor = self._compressor(codificacao)
+
+        if tamanho is not None and tamanho <= MAXIMO_EM_MEMORIA:
+            try:
+                dados = b''.join(corpo)
+            finally:
+                if hasattr(corpo, 'close'):
+                    corpo.close()
+            comprimido = compressor.comprimir(dados) + compressor.finalizar()
+            cabecalhos.append(('Content-Length', str(len(comprimido))))
+            start_response(status, cabecalhos, capturado['exc_info'])
+            return [comprimido]
+
+        start_response(status, cabecalhos, capturado['exc_info'])
+        return _Comprimido(corpo, compressor)
+
+    @staticmethod
+    def _ajustar_cabecalhos(cabecalhos, codificacao):
+        novos, vary = [], []
+        for nome, valor in cabecalhos:
+            chave = nome.lower()
+            if chave == 'content-length':
+                continue
+            if chave == 'vary':
+                vary.append(valor)
+                continue
+            if chave == 'etag' and not valor.startswith('W/'):
+                # O corpo comprimido não é byte a byte o original: a ETag vira fraca
+                valor = 'W/' + valor
+            novos.append((nome, valor))
+        if not any('accept-encoding' in v.lower() or v.strip() == '*' for v in vary):
+            vary.append('Accept-Encoding')
+        novos.append(('Vary', ', '.join(vary)))
+        novos.append(('Content-Encoding', codificacao))
+        return novos
@@ -0,0 +1,416 @@
+# app/comunidades.py
+"""
+Contadores desnormalizados, diretório (busca/listagem) e feed das comunidades.
+
+`Comunidade.membros_count`, `topicos_count` e `ultima_atividade_em` são
+atualizados na MESMA transação que cria/remove a participação ou o tópico
+(um UPDATE relativo, `coluna = coluna + n`, sem corrida entre requisições).
+Assim cabeçalhos, sugestões e estatísticas só leem colunas, sem COUNT em
+`membros_comunidade` ou `topico`.
+
+O diretório (`tela_comunidades`) é paginado e a busca não usa `ilike('%q%')`:
+o nome vai normalizado (minúsculo, sem acento) para `nome_normalizado` e
+quebrado em trigramas na tabela `comunidade_trigramas`. Uma busca só olha as
+comunidades que têm TODOS os trigramas do termo, e só nelas confere o LIKE.
+
+O feed de uma comunidade tem duas partes: os fixados (consulta pequena e
+separada, só na primeira página) e os demais tópicos em páginas por keyset
+em (comunidade_id, criado_em, id), com o filtro de tipo na mesma consulta.
+
+"Meu feed" junta os tópicos das comunidades que o usuário segue: uma leitura
+por keyset em cada comunidade (no máximo MAX_COMUNIDADES_NO_FEED, as mais
+ativas) e um merge em memória das listas já ordenadas. Os ids da página ficam
+alguns segundos (FEED_TTL) no cache, com a tag 'feed:usuario:<id>'.
+
+O feed global do fórum (`tela_foruns` sem busca) também é por keyset: em
+(relevancia, id) na ordem "em alta" e em (criado_em, id) na padrão.
+
+Se algo sair de sincronia (ex: inserção direta no banco), rode
+`flask siif recalcular-comunidades`.
+"""
+import heapq
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import update, select, insert, delete, func, case, event, or_, tuple_
+from sqlalchemy.orm import selectinload
+
+from app.cache import cache
+from app.extensions import db
+from app.importacao import funcao_tardia
+from app.models import Comunidade, Topico, Resposta, PostSalvo, membros_comunidade, comunidade_trigramas
+
+unidecode = funcao_tardia('unidecode', 'unidecode')
+
+# Comunidades por página no diretório
+POR_PAGINA = 20
+
+# Tópicos por página no feed de uma comunidade
+TOPICOS_POR_PAGINA = 15
+
+# Comunidades (as de atividade mais recente) lidas para montar o "Meu feed"
+MAX_COMUNIDADES_NO_FEED = 50
+
+ORDENACOES = {
+    'nome': (Comunidade.nome.asc(),),
+    'membros': (Comunidade.membros_count.desc(), Comunidade.id.desc()),
+    'atividade': (Comunidade.ultima_atividade_em.desc(), Comunidade.id.desc()),
+}
+
+
+def ajustar_contadores(comunidade_id, membros=0, topicos=0, atividade=False):
+    """
+    Soma `membros`/`topicos` (podem ser negativos) aos contadores da comunidade
+    e, com `atividade=True`, marca agora como a última atividade.
+    Não faz commit: entra na transação de quem chamou.
+    """
+    if not comunidade_id:
+        return
+
+    valores = {}
+    if membros:
+        valores['membros_count'] = Comunidade.membros_count + membros
+    if topicos:
+        valores['topicos_count'] = Comunidade.topicos_count + topicos
+    if atividade:
+        valores['ultima_atividade_em'] = datetime.now(timezone.utc)
+    if not valores:
+        return
+
+    db.session.execute(
+        update(Comunidade)
+        .where(Comunidade.id == comunidade_id)
+        .values(**valores)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def recalcular_contadores():
+    """Recalcula os contadores de todas as comunidades a partir das tabelas."""
+    membros = (
+        select(func.count())
+        .select_from(membros_comunidade)
+        .where(membros_comunidade.c.comunidade_id == Comunidade.id)
+        .correlate(Comunidade)
+        .scalar_subquery()
+    )
+    topicos = (
+        select(func.count(Topico.id))
+        .where(Topico.comunidade_id == Comunidade.id)
+        .correlate(Comunidade)
+        .scalar_subquery()
+    )
+    ultimo_topico = (
+        select(func.max(Topico.criado_em))
+        .where(Topico.comunidade_id == Comunidade.id)
+        .correlate(Comunidade)
+        .scalar_subquery()
+    )
+    ultima_resposta = (
+        select(func.max(Resposta.criado_em))
+        .join(Topico, Topico.id == Resposta.topico_id)
+        .where(Topico.comunidade_id == Comunidade.id)
+        .correlate(Comunidade)
+        .scalar_subquery()
+    )
+
+    db.session.execute(
+        update(Comunidade)
+        .values(
+            membros_count=membros,
+            topicos_count=topicos,
+            # A mais recente entre o último tópico e a última resposta (qualquer uma pode ser nula)
+            ultima_atividade_em=func.coalesce(
+                case((ultima_resposta > ultimo_topico, ultima_resposta),
+                     else_=func.coalesce(ultimo_topico, ultima_resposta)),
+                Comunidade.criado_em
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+# ===================================================================
+# BUSCA POR TRIGRAMAS
+# ===================================================================
+
+def normalizar_nome(texto):
+    """'Robótica  IFRN!' -> 'robotica ifrn'"""
+    texto = unidecode(texto or '').lower()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', texto).split())
+
+
+def trigramas(texto_normalizado):
+    return {texto_normalizado[i:i + 3] for i in range(len(texto_normalizado) - 2)}
+
+
+def _indexar(conexao, comunidade_id, nome_normalizado):
+    conexao.execute(delete(comunidade_trigramas).where(comunidade_trigramas.c.comunidade_id == comunidade_id))
+    linhas = [{"trigrama": t, "comunidade_id": comunidade_id} for t in trigramas(nome_normalizado or '')]
+    if linhas:
+        conexao.execute(insert(comunidade_trigramas), linhas)
+
+
+@event.listens_for(Comunidade, 'before_insert')
+@event.listens_for(Comunidade, 'before_update')
+def _normalizar_antes_de_salvar(mapper, conexao, comunidade):
+    comunidade.nome_normalizado = normalizar_nome(comunidade.nome)
+
+
+@event.listens_for(Comunidade, 'after_insert')
+def _indexar_nova(mapper, conexao, comunidade):
+    _indexar(conexao, comunidade.id, comunidade.nome_normalizado)
+
+
+@event.listens_for(Comunidade, 'after_update')
+def _reindexar_se_renomeada(mapper, conexao, comunidade):
+    if db.inspect(comunidade).attrs.nome.history.has_changes():
+        _indexar(conexao, comunidade.id, comunidade.nome_normalizado)
+
+
+def reindexar_busca():
+    """Refaz `nome_normalizado` e os trigramas de todas as comunidades."""
+    conexao = db.session.connection()
+    for comunidade_id, nome in db.session.execute(select(Comunidade.id, Comunidade.nome)).all():
+        normalizado = normalizar_nome(nome)
+        conexao.execute(
+            update(Comunidade.__table__)
+            .where(Comunidade.__table__.c.id == comunidade_id)
+            .values(nome_normalizado=normalizado)
+        )
+        _indexar(conexao, comunidade_id, normalizado)
+    db.session.commit()
+
+
+def _filtrar_por_nome(consulta, busca):
+    termo = normalizar_nome(busca)
+    if not termo:
+        return consulta
+
+    tris = trigramas(termo)
+    if not tris:
+        # Termo com 1-2 letras: só prefixo, que o índice de nome_normalizado atende
+        return consulta.where(Comunidade.nome_normalizado.startswith(termo, autoescape=True))
+
+    candidatas = (
+        select(comunidade_trigramas.c.comunidade_id)
+        .where(comunidade_trigramas.c.trigrama.in_(tris))
+        .group_by(comunidade_trigramas.c.comunidade_id)
+        .having(func.count() == len(tris))
+    )
+    return consulta.where(
+        Comunidade.id.in_(candidatas),
+        Comunidade.nome_normalizado.contains(termo, autoescape=True)
+    )
+
+
+# ===================================================================
+# DIRETÓRIO
+# ===================================================================
+
+def listar_comunidades(busca=None, categoria=None, ordem='nome', pagina=1, por_pagina=POR_PAGINA):
+    """
+    Uma página do diretório. Retorna (comunidades, tem_proxima); a página
+    seguinte é descoberta buscando um item a mais, sem COUNT.
+    """
+    consulta = select(Comunidade)
+    consulta = _filtrar_por_nome(consulta, busca)
+    if categoria and categoria != 'Todas':
+        consulta = consulta.where(Comunidade.categoria == categoria)
+
+    consulta = (
+        consulta.order_by(*ORDENACOES.get(ordem, ORDENACOES['nome']))
+        .offset((max(pagina, 1) - 1) * por_pagina)
+        .limit(por_pagina + 1)
+    )
+    comunidades = db.session.execute(consulta).scalars().all()
+    return comunidades[:por_pagina], len(comunidades) > por_pagina
+
+
+@cache.memorizar('facetas_comunidades', ttl='ESTATISTICAS_TTL', tags=('comunidades',))
+def facetas_categorias():
+    """[(categoria, quantidade)] de todas as comunidades (cache de ESTATISTICAS_TTL segundos)."""
+    return [
+        (categoria, total) for categoria, total in db.session.execute(
+            select(Comunidade.categoria, func.count(Comunidade.id))
+            .where(Comunidade.categoria.is_not(None), Comunidade.categoria != '')
+            .group_by(Comunidade.categoria)
+            .order_by(Comunidade.categoria)
+        )
+    ]
+
+
+def invalidar_facetas():
+    """Chamado ao criar uma comunidade, para a contagem aparecer na hora."""
+    cache.invalidar('comunidades')
+
+
+# ===================================================================
+# FEED DA COMUNIDADE
+# ===================================================================
+
+def _filtro_tipo(consulta, tipo):
+    if tipo == 'enquete':
+        return consulta.where(Topico.tipo_post == 'enquete')
+    if tipo == 'material':
+        # Tipo 'material' OU posts que tenham anexo de material
+        return consulta.where(or_(Topico.tipo_post == 'material', Topico.material_id.is_not(None)))
+    if tipo == 'midia':
+        return consulta.where(Topico.imagem_post.is_not(None))
+    return consulta
+
+
+def _com_relacionamentos(consulta):
+    """Carrega o que o card do tópico usa, em poucas consultas (sem N+1)."""
+    return consulta.options(
+        selectinload(Topico.autor),
+        selectinload(Topico.tag),
+        selectinload(Topico.enquete_opcoes),
+        selectinload(Topico.noticia_ref),
+        selectinload(Topico.material_ref),
+        selectinload(Topico.likes),
+    )
+
+
+def feed_da_comunidade(comunidade_id, tipo=None, antes=None, limite=TOPICOS_POR_PAGINA):
+    """
+    Uma página do feed. `antes` é o id do último tópico da página anterior.
+    Retorna (fixados, topicos, proximo), onde `proximo` é o cursor da página
+    seguinte (None na última). Os fixados só vêm na primeira página.
+    """
+    base = _filtro_tipo(select(Topico).where(Topico.comunidade_id == comunidade_id), tipo)
+
+    fixados = []
+    if antes is None:
+        fixados = db.session.execute(
+            _com_relacionamentos(base.where(Topico.fixado == True))
+            .order_by(Topico.criado_em.desc(), Topico.id.desc())
+        ).scalars().all()
+
+    consulta = base.where(or_(Topico.fixado == False, Topico.fixado.is_(None)))
+    if antes is not None:
+        referencia = db.session.execute(
+            select(Topico.criado_em, Topico.id).where(Topico.id == antes, Topico.comunidade_id == comunidade_id)
+        ).first()
+        if referencia is None:
+            return [], [], None
+        consulta = consulta.where(tuple_(Topico.criado_em, Topico.id) < tuple_(*referencia))
+
+    topicos = db.session.execute(
+        _com_relacionamentos(consulta)
+        .order_by(Topico.criado_em.desc(), Topico.id.desc())
+        .limit(limite + 1)
+    ).scalars().all()
+
+    proximo = topicos[limite - 1].id if len(topicos) > limite else None
+    return fixados, topicos[:limite], proximo
+
+
+# ===================================================================
+# FEED GLOBAL DO FÓRUM
+# ===================================================================
+
+def visiveis_no_forum(consulta):
+    """Posts globais ou de comunidades públicas, sem enquetes (regra do feed global)."""
+    return consulta.outerjoin(Comunidade, Topico.comunidade_id == Comunidade.id).where(
+        or_(Topico.comunidade_id.is_(None), Comunidade.tipo_acesso != 'Restrito'),
+        Topico.tipo_post != 'enquete'
+    )
+
+
+def feed_do_forum(ordem=None, antes=None, salvos_de=None, limite=TOPICOS_POR_PAGINA):
+    """
+    Uma página do feed global. `ordem='relevancia'` pagina em (relevancia, id),
+    a leitura do índice ix_topico_relevancia_id; as demais em (criado_em, id).
+    `antes` é o id do último tópico da página anterior e `salvos_de` restringe
+    aos posts salvos do usuário. Retorna (topicos, proximo).
+    """
+    if ordem == 'relevancia':
+        colunas = (Topico.relevancia, Topico.id)
+    else:
+        colunas = (Topico.criado_em, Topico.id)
+
+    consulta = visiveis_no_forum(select(Topico))
+    if salvos_de is not None:
+        consulta = consulta.join(PostSalvo, PostSalvo.topico_id == Topico.id).where(PostSalvo.user_id == salvos_de)
+    if antes is not None:
+        referencia = db.session.execute(select(*colunas).where(Topico.id == antes)).first()
+        if referencia is None:
+            return [], None
+        consulta = consulta.where(tuple_(*colunas) < tuple_(*referencia))
+
+    topicos = db.session.execute(
+        _com_relacionamentos(consulta)
+        .order_by(*(coluna.desc() for coluna in colunas))
+        .limit(limite + 1)
+    ).scalars().all()
+
+    proximo = topicos[limite - 1].id if len(topicos) > limite else None
+    return topicos[:limite], proximo
+
+
+# ===================================================================
+# MEU FEED (COMUNIDADES SEGUIDAS)
+# ===================================================================
+
+def _ids_do_feed(usuario_id, antes, limite):
+    """Ids da página: uma leitura (criado_em, id) por comunidade e merge das listas."""
+    ids_comunidades = db.session.execute(
+        select(Comunidade.id)
+        .join(membros_comunidade, membros_comunidade.c.comunidade_id == Comunidade.id)
+        .where(membros_comunidade.c.user_id == usuario_id)
+        .order_by(Comunidade.ultima_atividade_em.desc())
+        .limit(MAX_COMUNIDADES_NO_FEED)
+    ).scalars().all()
+    if not ids_comunidades:
+        return [], None
+
+    referencia = None
+    if antes is not None:
+        referencia = db.session.execute(select(Topico.criado_em, Topico.id).where(Topico.id == antes)).first()
+        if referencia is None:
+            return [], None
+
+    listas = []
+    for comunidade_id in ids_comunidades:
+        consulta = select(Topico.criado_em, Topico.id).where(
+            Topico.comunidade_id == comunidade_id,
+            Topico.tipo_post != 'enquete'
+        )
+        if referencia is not None:
+            consulta = consulta.where(tuple_(Topico.criado_em, Topico.id) < tuple_(*referencia))
+        listas.append(db.session.execute(
+            consulta.order_by(Topico.criado_em.desc(), Topico.id.desc()).limit(limite + 1)
+        ).all())
+
+    # Cada lista já vem do mais novo para o mais antigo
+    mesclados = [linha.id for _, linha in zip(range(limite + 1), heapq.merge(*listas, reverse=True))]
+    proximo = mesclados[limite - 1] if len(mesclados) > limite else None
+    return mesclados[:limite], proximo
+
+
+def feed_do_usuario(usuario_id, antes=None, limite=TOPICOS_POR_PAGINA):
+    """
+    Uma página do "Meu feed" (tópicos das comunidades seguidas, mais recentes
+    primeiro). `antes` é o id do último tópico da página anterior.
+    Retorna (topicos, proximo).
+    """
+    chave = f'feed_usuario:{usuario_id}:{antes}:{limite}'
+    achou, pagina = cache.obter(chave)
+    if not achou:
+        pagina = _ids_do_feed(usuario_id, antes, limite)
+        cache.guardar(chave, pagina, ttl='FEED_TTL', tags=(f'feed:usuario:{usuario_id}',))
+    ids, proximo = pagina
+
+    if not ids:
+        return [], None
+    topicos = db.session.execute(_com_relacionamentos(select(Topico).where(Topico.id.in_(ids)))).scalars().all()
+    posicao = {topico_id: i for i, topico_id in enumerate(ids)}
+    topicos.sort(key=lambda t: posicao[t.id])
+    return topicos, proximo
+
+
+def invalidar_feed(usuario_id):
+    """Descarta as páginas em cache do usuário (ex: entrou ou saiu de uma comunidade)."""
+    cache.invalidar(f'feed:usuario:{usuario_id}')
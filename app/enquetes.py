@@ -0,0 +1,78 @@
+# app/enquetes.py
+"""
+Votos e resultados de enquetes.
+
+Cada opção guarda `votos_count`, então mostrar o resultado é ler as opções
+(nada de carregar todos os EnqueteVoto). O voto duplicado é barrado pela
+restrição única (user_id, topico_id): votar é um INSERT só, e o
+IntegrityError significa "já votou".
+"""
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import EnqueteOpcao, EnqueteVoto
+
+
+def votar(opcao, usuario_id):
+    """Registra o voto e soma no contador da opção. Retorna False se o usuário já votou."""
+    try:
+        with db.session.begin_nested():
+            db.session.add(EnqueteVoto(user_id=usuario_id, opcao_id=opcao.id, topico_id=opcao.topico_id))
+    except IntegrityError:
+        return False
+
+    db.session.execute(
+        update(EnqueteOpcao)
+        .where(EnqueteOpcao.id == opcao.id)
+        .values(votos_count=EnqueteOpcao.votos_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return True
+
+
+def votos_do_usuario(usuario_id, ids_topicos):
+    """Ids das opções escolhidas pelo usuário nas enquetes dadas."""
+    if not ids_topicos:
+        return []
+    return db.session.execute(
+        select(EnqueteVoto.opcao_id)
+        .where(EnqueteVoto.user_id == usuario_id, EnqueteVoto.topico_id.in_(ids_topicos))
+    ).scalars().all()
+
+
+def resultados(topico, usuario_id=None):
+    """Resultado da enquete pronto para o JSON: opções, votos, percentuais e o voto do usuário."""
+    opcoes = db.session.execute(
+        select(EnqueteOpcao).where(EnqueteOpcao.topico_id == topico.id).order_by(EnqueteOpcao.id)
+    ).scalars().all()
+    total = sum(opcao.votos_count for opcao in opcoes)
+    meu_voto = None
+    if usuario_id:
+        votos = votos_do_usuario(usuario_id, [topico.id])
+        meu_voto = votos[0] if votos else None
+
+    return {
+        "topico_id": topico.id,
+        "total": total,
+        "meu_voto": meu_voto,
+        "opcoes": [{
+            "id": opcao.id,
+            "texto": opcao.texto,
+            "votos": opcao.votos_count,
+            "percentual": round(opcao.votos_count / total * 100, 1) if total else 0.0
+        } for opcao in opcoes]
+    }
+
+
+def recalcular_contadores():
+    """Recalcula `votos_count` de todas as opções a partir de enquete_voto."""
+    votos = (
+        select(func.count(EnqueteVoto.id))
+        .where(EnqueteVoto.opcao_id == EnqueteOpcao.id)
+        .correlate(EnqueteOpcao)
+        .scalar_subquery()
+    )
+    db.session.execute(update(EnqueteOpcao).values(votos_count=votos).execution_options(synchronize_session=False))
+    db.session.commit()
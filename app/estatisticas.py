@@ -0,0 +1,163 @@
+# app/estatisticas.py
+"""
+Estatísticas do painel admin.
+
+- Os contadores do topo (usuários e denúncias) saem de UMA consulta com
+  agregações condicionais e ficam em cache (app/cache.py) por alguns segundos.
+- Posts/dia, uploads/dia e usuários ativos/dia são incrementados na hora em
+  que o evento acontece (tabela `estatistica_diaria`), então o gráfico do
+  painel nunca precisa varrer `topico` ou `material`.
+"""
+from datetime import datetime, timezone, timedelta
+
+from flask import request, session
+from flask_login import current_user
+from sqlalchemy import event, select, update, insert, func, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.cache import cache
+from app.extensions import db
+from app.models import User, Denuncia, Topico, Material, EstatisticaDiaria, UsuarioAtivoDia
+
+
+def hoje():
+    return datetime.now(timezone.utc).date()
+
+
+# ===================================================================
+# CONTADORES DO PAINEL (UMA CONSULTA + CACHE CURTO)
+# ===================================================================
+
+@cache.memorizar('contadores_painel', ttl='ESTATISTICAS_TTL', tags=('painel',))
+def contadores_painel():
+    """Contadores do topo do painel admin (cache de ESTATISTICAS_TTL segundos)."""
+    usuarios = select(func.count(User.id)).scalar_subquery()
+
+    linha = db.session.execute(
+        select(
+            usuarios.label("usuarios"),
+            func.count(Denuncia.id).label("denuncias"),
+            func.coalesce(func.sum(case((Denuncia.status == 'Recebida', 1), else_=0)), 0).label("abertas"),
+            func.coalesce(func.sum(case((Denuncia.status == 'Resolvida', 1), else_=0)), 0).label("resolvidas")
+        )
+    ).one()
+
+    return {
+        "usuarios": linha.usuarios,
+        "denuncias": linha.denuncias,
+        "denuncias_abertas": linha.abertas,
+        "denuncias_resolvidas": linha.resolvidas
+    }
+
+
+def invalidar_contadores():
+    """Força a próxima leitura a ir ao banco (ex: depois de resolver uma denúncia)."""
+    cache.invalidar('painel')
+
+
+def serie_diaria(dias=30):
+    """Posts, uploads e usuários ativos dos últimos `dias` dias (dias sem registro vêm zerados)."""
+    inicio = hoje() - timedelta(days=dias - 1)
+    registros = {
+        e.dia: e for e in db.session.execute(
+            select(EstatisticaDiaria).where(EstatisticaDiaria.dia >= inicio)
+        ).scalars()
+    }
+
+    serie = []
+    for i in range(dias):
+        dia = inicio + timedelta(days=i)
+        registro = registros.get(dia)
+        serie.append(registro.to_dict() if registro else
+                     {"dia": dia.isoformat(), "posts": 0, "uploads": 0, "usuarios_ativos": 0})
+    return serie
+
+
+# ===================================================================
+# INCREMENTO DOS CONTADORES DIÁRIOS
+# ===================================================================
+
+def _incrementar(conexao, dia, **incrementos):
+    """Soma `incrementos` na linha do dia (criando a linha se ainda não existir)."""
+    tabela = EstatisticaDiaria.__table__
+    valores = {campo: tabela.c[campo] + qtd for campo, qtd in incrementos.items()}
+
+    dialeto = conexao.dialect.name
+    if dialeto in ('sqlite', 'postgresql'):
+        if dialeto == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as insert_dialeto
+        else:
+            from sqlalchemy.dialects.postgresql import insert as insert_dialeto
+
+        conexao.execute(
+            insert_dialeto(tabela)
+            .values(dia=dia, **incrementos)
+            .on_conflict_do_update(index_elements=['dia'], set_=valores)
+        )
+        return
+
+    # Outros bancos: UPDATE e, se o dia ainda não existe, INSERT
+    if not conexao.execute(update(tabela).where(tabela.c.dia == dia).values(**valores)).rowcount:
+        conexao.execute(insert(tabela).values(dia=dia, **incrementos))
+
+
+@event.listens_for(Session, 'after_flush')
+def _contar_posts_e_uploads(session, flush_context):
+    posts = sum(1 for obj in session.new if isinstance(obj, Topico))
+    uploads = sum(1 for obj in session.new if isinstance(obj, Material))
+    if not posts and not uploads:
+        return
+
+    # Mesma conexão/transação do flush: se o post sofrer rollback, o contador também
+    _incrementar(session.connection(), hoje(), posts=posts, uploads=uploads)
+
+
+def registrar_usuario_ativo():
+    """
+    before_request: conta o usuário logado como ativo hoje.
+    Só vai ao banco uma vez por dia por sessão (a data fica no cookie de sessão).
+    """
+    if request.endpoint == 'static' or not current_user.is_authenticated:
+        return
+
+    dia = hoje()
+    marca = f'{current_user.id}:{dia.isoformat()}'  # inclui o id: troca de conta no mesmo navegador
+    if session.get('ativo_em') == marca:
+        return
+
+    try:
+        # Conexão própria: não mistura com a transação da requisição
+        with db.engine.begin() as conexao:
+            conexao.execute(insert(UsuarioAtivoDia.__table__).values(dia=dia, user_id=current_user.id))
+            _incrementar(conexao, dia, usuarios_ativos=1)
+    except IntegrityError:
+        pass  # já contado hoje (outra sessão/dispositivo)
+
+    session['ativo_em'] = marca
+
+
+# ===================================================================
+# MANUTENÇÃO (flask siif recalcular-estatisticas)
+# ===================================================================
+
+def recalcular_serie():
+    """
+    Reconstrói posts/dia e uploads/dia a partir das tabelas (varredura completa,
+    só para preencher o histórico na primeira vez). Usuários ativos não têm
+    histórico e são mantidos como estão.
+    """
+    tabela = EstatisticaDiaria.__table__
+    db.session.execute(update(tabela).values(posts=0, uploads=0))
+
+    for coluna_data, campo in ((Topico.criado_em, 'posts'), (Material.data_upload, 'uploads')):
+        dia = func.date(coluna_data)
+        for valor_dia, total in db.session.execute(
+            select(dia, func.count()).where(coluna_data.isnot(None)).group_by(dia)
+        ):
+            if isinstance(valor_dia, str):
+                valor_dia = datetime.strptime(valor_dia, '%Y-%m-%d').date()
+            _incrementar(db.session.connection(), valor_dia, **{campo: total})
+
+    db.session.commit()
+    invalidar_contadores()
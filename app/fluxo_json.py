@@ -0,0 +1,110 @@
+# app/fluxo_json.py
+"""
+Respostas JSON geradas aos poucos, para listas que crescem sem limite.
+
+`jsonify(lista)` monta todos os dicionários e o texto inteiro na memória
+antes de enviar o primeiro byte. Aqui a consulta é lida do banco em lotes
+(`yield_per`: cursor do lado do servidor no PostgreSQL) e cada lote é
+serializado e enviado, com memória constante:
+
+    eventos = percorrer(select(Evento).order_by(Evento.data_hora_inicio.desc()), escalares=True)
+    return lista_json((_evento_dict(e) for e in eventos), etag=validador(*resumo))
+
+O corpo não é lido para calcular a ETag: listas públicas passam `etag`, um
+resumo barato da tabela (contagem, maior id, data mais recente) calculado
+antes do envio, e o cache_http responde 304 sem gerar o corpo.
+
+Por padrão a saída é um array JSON, como o jsonify devolvia; com ndjson=True
+(exportações, ex: /api/usuarios) é um objeto JSON por linha.
+
+Se o pacote `orjson` estiver instalado ele é usado na serialização; senão,
+o json da biblioteca padrão.
+"""
+import importlib.util
+import json
+
+from flask import Response, stream_with_context
+
+from app.extensions import db
+from app.importacao import modulo_tardio
+
+orjson = modulo_tardio('orjson')
+
+# Linhas buscadas do banco por vez
+LOTE_BANCO = 1000
+
+# Itens serializados por pedaço enviado (pedaços muito pequenos pesam na compressão)
+ITENS_POR_PEDACO = 200
+
+TIPO_NDJSON = 'application/x-ndjson'
+
+
+def _padrao(valor):
+    # datetime/date (o orjson já faz isso sozinho)
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    raise TypeError(f'{type(valor).__name__} não é serializável em JSON')
+
+
+if importlib.util.find_spec('orjson') is not None:
+    def serializar(valor):
+        return orjson.dumps(valor, default=_padrao)
+else:
+    def serializar(valor):
+        return json.dumps(valor, ensure_ascii=False, separators=(',', ':'), default=_padrao).encode('utf-8')
+
+
+def percorrer(consulta, lote=LOTE_BANCO, escalares=False):
+    """
+    Gerador com as linhas da consulta, buscadas lote a lote.
+
+    A consulta só roda quando a resposta começa a ser enviada: a sessão da
+    view é fechada no fim da requisição e o stream_with_context abre outra
+    (como no CSV de usuários). Um erro no meio do envio corta a resposta, já
+    com status 200, e fica no log.
+    """
+    resultado = db.session.execute(consulta.execution_options(yield_per=lote))
+    if escalares:
+        resultado = resultado.scalars()
+    for parte in resultado.partitions():
+        yield from parte
+
+
+def _pedacos_array(itens):
+    yield b'['
+    separador = b''
+    pedaco = []
+    for item in itens:
+        pedaco.append(serializar(item))
+        if len(pedaco) >= ITENS_POR_PEDACO:
+            yield separador + b','.join(pedaco)
+            separador = b','
+            pedaco = []
+    if pedaco:
+        yield separador + b','.join(pedaco)
+    yield b']\n'
+
+
+def _pedacos_ndjson(itens):
+    pedaco = []
+    for item in itens:
+        pedaco.append(serializar(item))
+        if len(pedaco) >= ITENS_POR_PEDACO:
+            yield b'\n'.join(pedaco) + b'\n'
+            pedaco = []
+    if pedaco:
+        yield b'\n'.join(pedaco) + b'\n'
+
+
+def lista_json(itens, ndjson=False, status=200, etag=None):
+    """
+    Response em streaming com os itens (dicionários) como array JSON ou NDJSON.
+    `etag` (ver cache_http.validador) permite responder 304 sem gerar o corpo.
+    """
+    if ndjson:
+        resposta = Response(stream_with_context(_pedacos_ndjson(itens)), status=status, mimetype=TIPO_NDJSON)
+    else:
+        resposta = Response(stream_with_context(_pedacos_array(itens)), status=status, mimetype='application/json')
+    if etag:
+        resposta.set_etag(etag)
+    return resposta
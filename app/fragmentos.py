@@ -0,0 +1,53 @@
+# app/fragmentos.py
+"""
+Cache de fragmentos HTML dos cards de tópico.
+
+O corpo do card (título, texto, link, notícia/material anexado) é igual para
+qualquer pessoa que veja o feed. Ele é renderizado uma vez e guardado no
+cache do app (app/cache.py) por (variante, topico_id, versao); `Topico.versao`
+sobe quando algum campo mostrado no corpo muda, então o cache nunca serve um
+corpo desatualizado (a versão antiga só espera a vez de sair do LRU).
+
+O que depende de quem está vendo (curtiu/salvou, votos da enquete, menu de
+moderação) e os contadores (likes, respostas) continuam no template da
+página, fora do fragmento: curtir ou responder não invalida nada aqui.
+
+A notícia/material anexado pode mudar sem mexer no tópico; por isso cada
+fragmento também expira depois de FRAGMENTOS_TTL segundos.
+
+Os fragmentos levam a tag 'topico:<id>' e saem do cache quando o tópico é
+apagado: o SQLite reaproveita o id (sem AUTOINCREMENT) e um tópico novo com
+o mesmo id e `versao` acharia o corpo do antigo.
+"""
+from flask import render_template
+from markupsafe import Markup
+from sqlalchemy import event
+
+from app.cache import cache
+from app.extensions import db
+from app.models import Topico
+
+# Campos que aparecem no corpo do card
+CAMPOS_DO_CORPO = ('titulo', 'conteudo', 'tipo_post', 'imagem_post', 'link_url', 'noticia_id', 'material_id')
+
+
+@event.listens_for(Topico, 'before_update')
+def _nova_versao(mapper, conexao, topico):
+    estado = db.inspect(topico)
+    if any(estado.attrs[campo].history.has_changes() for campo in CAMPOS_DO_CORPO):
+        topico.versao = (topico.versao or 0) + 1
+
+
+@event.listens_for(Topico, 'after_delete')
+def _descartar_fragmentos(mapper, conexao, topico):
+    cache.invalidar(f'topico:{topico.id}')
+
+
+def corpo_do_topico(topico, variante):
+    """HTML do corpo do card (`partials/topico_corpo_<variante>.html`), do cache quando possível."""
+    chave = f'fragmentos_topico:{variante}:{topico.id}:{topico.versao}'
+    achou, html = cache.obter(chave)
+    if not achou:
+        html = Markup(render_template(f'partials/topico_corpo_{variante}.html', topico=topico))
+        cache.guardar(chave, html, ttl='FRAGMENTOS_TTL', tags=(f'topico:{topico.id}',))
+    return html
@@ -0,0 +1,148 @@
+# app/importacao.py
+"""
+Importação tardia de bibliotecas pesadas.
+
+PIL, thefuzz, unidecode, requests_oauthlib... custam dezenas de milissegundos
+cada só para importar, e quase nenhuma requisição usa. Declarando-as aqui, o
+módulo só é carregado no primeiro uso e o boot do worker fica mais rápido:
+
+    Image = modulo_tardio('PIL.Image')                 # Image.open(...)
+    unidecode = funcao_tardia('unidecode', 'unidecode')  # unidecode(texto)
+
+`flask siif perfil-importacao` mostra quanto cada blueprint custa para importar
+e confere se algum módulo tardio acabou sendo carregado no boot.
+"""
+import importlib
+import os
+import subprocess
+import sys
+
+# Nomes de todos os módulos declarados como tardios (para o perfil de importação)
+MODULOS_TARDIOS = set()
+
+
+class ModuloTardio:
+    """Representa um módulo que só é importado no primeiro acesso a um atributo."""
+
+    def __init__(self, nome):
+        self._nome = nome
+        self._modulo = None
+        MODULOS_TARDIOS.add(nome)
+
+    def carregar(self):
+        if self._modulo is None:
+            self._modulo = importlib.import_module(self._nome)
+        return self._modulo
+
+    @property
+    def carregado(self):
+        return self._modulo is not None
+
+    def __getattr__(self, atributo):
+        return getattr(self.carregar(), atributo)
+
+    def __repr__(self):
+        estado = 'carregado' if self.carregado else 'não carregado'
+        return f'<ModuloTardio {self._nome} ({estado})>'
+
+
+def modulo_tardio(nome):
+    return ModuloTardio(nome)
+
+
+def funcao_tardia(nome_modulo, nome_funcao):
+    """Função (ou classe) de um módulo pesado, importada na primeira chamada."""
+    modulo = ModuloTardio(nome_modulo)
+
+    def chamar(*args, **kwargs):
+        return getattr(modulo, nome_funcao)(*args, **kwargs)
+
+    chamar.__name__ = nome_funcao
+    chamar.__qualname__ = nome_funcao
+    return chamar
+
+
+# ===================================================================
+# PERFIL DE IMPORTAÇÃO (flask siif perfil-importacao)
+# ===================================================================
+
+# Ordem de importação medida: a base (app + extensões), os modelos e cada
+# blueprint. Cada um só é cobrado pelo que importou de novo.
+MODULOS_PERFIL = ('app', 'app.models', 'app.routes', 'app.auth', 'app.api')
+
+_SCRIPT_PERFIL = """
+import sys, time
+{importacoes}
+inicio = time.perf_counter()
+from app import create_app
+create_app()
+print('CREATE_APP', (time.perf_counter() - inicio) * 1000)
+from app.importacao import MODULOS_TARDIOS
+print('TARDIOS_CARREGADOS', ','.join(sorted(m for m in MODULOS_TARDIOS if m in sys.modules)))
+"""
+
+
+def _ler_importtime(saida):
+    """
+    Lê a saída do `python -X importtime` e retorna {modulo: (cumulativo_us, filhos)},
+    onde `filhos` são os imports diretos do módulo como [(cumulativo_us, nome)].
+    """
+    modulos = {}
+    pendentes = []  # (profundidade, nome, cumulativo) ainda sem pai
+
+    for linha in saida.splitlines():
+        if not linha.startswith('import time:'):
+            continue
+        partes = linha.split('|', 2)
+        if len(partes) < 3 or not partes[1].strip().isdigit():
+            continue  # cabeçalho
+
+        cumulativo = int(partes[1])
+        campo_nome = partes[2][1:]
+        nome = campo_nome.strip()
+        profundidade = (len(campo_nome) - len(campo_nome.lstrip())) // 2
+
+        # O importtime lista os filhos antes do pai
+        filhos = []
+        while pendentes and pendentes[-1][0] > profundidade:
+            filho = pendentes.pop()
+            if filho[0] == profundidade + 1:
+                filhos.append((filho[2], filho[1]))
+
+        pendentes.append((profundidade, nome, cumulativo))
+        modulos.setdefault(nome, (cumulativo, sorted(filhos, reverse=True)))
+
+    return modulos
+
+
+def perfil_importacao(modulos=MODULOS_PERFIL):
+    """
+    Importa `modulos` num processo novo com `-X importtime` e mede o create_app().
+    Retorna (linhas, tempo_create_app_ms, tardios_carregados), onde cada linha é
+    (modulo, total_ms, [(ms, import_mais_pesado), ...]).
+    """
+    script = _SCRIPT_PERFIL.format(importacoes='\n'.join(f'import {m}' for m in modulos))
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        cwd=raiz, capture_output=True, text=True, env=os.environ.copy()
+    )
+    if processo.returncode != 0:
+        raise RuntimeError(processo.stderr.strip().splitlines()[-1] if processo.stderr else 'falha ao importar')
+
+    medidos = _ler_importtime(processo.stderr)
+    linhas = []
+    for modulo in modulos:
+        cumulativo, filhos = medidos.get(modulo, (0, []))
+        linhas.append((modulo, cumulativo / 1000, [(us / 1000, nome) for us, nome in filhos]))
+
+    tempo_create_app = 0.0
+    tardios = []
+    for linha in processo.stdout.splitlines():
+        if linha.startswith('CREATE_APP '):
+            tempo_create_app = float(linha.split()[1])
+        elif linha.startswith('TARDIOS_CARREGADOS'):
+            tardios = [m for m in linha.split(' ', 1)[-1].split(',') if m and m != 'TARDIOS_CARREGADOS']
+
+    return linhas, tempo_create_app, tardios
@@ -0,0 +1,205 @@
+# app/instrumentacao.py
+"""
+Instrumentação de SQL por requisição (opcional: SIIF_INSTRUMENTACAO=1).
+
+Para cada requisição conta as consultas, soma o tempo gasto no banco e guarda
+as mais lentas. Com isso:
+- a resposta ganha o header `Server-Timing` (aparece na aba Network do navegador);
+- requisições acima de INSTRUMENTACAO_LIMITE_MS vão para o log com as consultas mais lentas;
+- cada endpoint acumula histogramas de latência e de número de consultas,
+  consultados pelo admin em /api/admin/instrumentacao.
+
+Desligada, nenhum listener é registrado e o custo é zero.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+from flask import current_app, g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# ===================================================================
+# HISTOGRAMA
+# ===================================================================
+
+class Histograma:
+    """Histograma de faixas fixas (acumulativo, no formato usado pelo Prometheus)."""
+
+    def __init__(self, limites):
+        self.limites = tuple(limites)
+        self.contagens = [0] * (len(self.limites) + 1)  # última posição: acima do maior limite
+        self.total = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.total += 1
+        self.soma += valor
+        self.maximo = max(self.maximo, valor)
+
+    def percentil(self, p):
+        """Estimativa do percentil `p` (0-100): limite superior da faixa onde ele cai."""
+        if not self.total:
+            return 0.0
+        alvo = self.total * p / 100
+        acumulado = 0
+        for i, contagem in enumerate(self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return self.limites[i] if i < len(self.limites) else self.maximo
+        return self.maximo
+
+    def to_dict(self):
+        return {
+            "total": self.total,
+            "media": round(self.soma / self.total, 2) if self.total else 0.0,
+            "p50": self.percentil(50),
+            "p95": self.percentil(95),
+            "maximo": round(self.maximo, 2),
+            "faixas": {
+                (str(limite) if i < len(self.limites) else "+Inf"): contagem
+                for i, (limite, contagem) in enumerate(zip(self.limites + (None,), self.contagens))
+            }
+        }
+
+
+LIMITES_LATENCIA_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+LIMITES_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+# ===================================================================
+# AGREGADO POR ENDPOINT
+# ===================================================================
+
+_lock = threading.Lock()
+_por_endpoint = {}  # endpoint -> {"latencia": Histograma, "consultas": Histograma, "db_ms": float}
+
+
+def _registrar_endpoint(endpoint, duracao_ms, consultas, db_ms):
+    with _lock:
+        dados = _por_endpoint.get(endpoint)
+        if dados is None:
+            dados = _por_endpoint[endpoint] = {
+                "latencia": Histograma(LIMITES_LATENCIA_MS),
+                "consultas": Histograma(LIMITES_CONSULTAS),
+                "db_ms": 0.0
+            }
+        dados["latencia"].observar(duracao_ms)
+        dados["consultas"].observar(consultas)
+        dados["db_ms"] += db_ms
+
+
+def resumo_por_endpoint():
+    """Histogramas de cada endpoint, do mais lento (p95) para o mais rápido."""
+    with _lock:
+        resumo = [
+            {
+                "endpoint": endpoint,
+                "latencia_ms": dados["latencia"].to_dict(),
+                "consultas": dados["consultas"].to_dict(),
+                "db_ms_medio": round(dados["db_ms"] / dados["latencia"].total, 2) if dados["latencia"].total else 0.0
+            }
+            for endpoint, dados in _por_endpoint.items()
+        ]
+    return sorted(resumo, key=lambda item: item["latencia_ms"]["p95"], reverse=True)
+
+
+def zerar():
+    with _lock:
+        _por_endpoint.clear()
+
+
+# ===================================================================
+# LISTENERS DO SQLALCHEMY
+# ===================================================================
+
+def _estado():
+    """Estatísticas da requisição atual (None fora de requisição ou se desligado)."""
+    if not has_request_context():
+        return None
+    return g.get('_instrumentacao')
+
+
+def _antes_da_consulta(conn, cursor, statement, parameters, context, executemany):
+    if _estado() is not None:
+        conn.info.setdefault('_inicio_consulta', []).append(time.perf_counter())
+
+
+def _depois_da_consulta(conn, cursor, statement, parameters, context, executemany):
+    estado = _estado()
+    inicios = conn.info.get('_inicio_consulta')
+    if estado is None or not inicios:
+        return
+
+    duracao_ms = (time.perf_counter() - inicios.pop()) * 1000
+    estado["consultas"] += 1
+    estado["db_ms"] += duracao_ms
+
+    # Guarda só as N mais lentas (heap de mínimo)
+    item = (duracao_ms, estado["consultas"], statement[:500])
+    if len(estado["lentas"]) < estado["top"]:
+        heapq.heappush(estado["lentas"], item)
+    else:
+        heapq.heappushpop(estado["lentas"], item)
+
+
+# ===================================================================
+# HOOKS DA REQUISIÇÃO
+# ===================================================================
+
+def _iniciar_requisicao():
+    g._instrumentacao = {
+        "inicio": time.perf_counter(),
+        "consultas": 0,
+        "db_ms": 0.0,
+        "lentas": [],
+        "top": current_app.config["INSTRUMENTACAO_TOP_CONSULTAS"]
+    }
+
+
+def _finalizar_requisicao(response):
+    estado = _estado()
+    if estado is None:
+        return response
+
+    duracao_ms = (time.perf_counter() - estado["inicio"]) * 1000
+    endpoint = request.endpoint or 'desconhecido'
+
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={estado["db_ms"]:.1f};desc="{estado["consultas"]} consultas", app;dur={duracao_ms:.1f}'
+    )
+
+    _registrar_endpoint(endpoint, duracao_ms, estado["consultas"], estado["db_ms"])
+
+    if duracao_ms > current_app.config["INSTRUMENTACAO_LIMITE_MS"]:
+        lentas = sorted(estado["lentas"], reverse=True)
+        current_app.logger.warning(
+            'Requisição lenta: %s %s (%s) %.0f ms, %d consultas, %.0f ms no banco%s',
+            request.method, request.path, endpoint, duracao_ms, estado["consultas"], estado["db_ms"],
+            ''.join(f'\n    {ms:.1f} ms: {sql}' for ms, _, sql in lentas)
+        )
+    return response
+
+
+_listeners_registrados = False
+
+
+def init_app(app):
+    """Liga a instrumentação se INSTRUMENTACAO_SQL estiver ativo."""
+    global _listeners_registrados
+
+    if not app.config.get('INSTRUMENTACAO_SQL'):
+        return
+
+    if not _listeners_registrados:
+        event.listen(Engine, 'before_cursor_execute', _antes_da_consulta)
+        event.listen(Engine, 'after_cursor_execute', _depois_da_consulta)
+        _listeners_registrados = True
+
+    app.before_request(_iniciar_requisicao)
+    app.after_request(_finalizar_requisicao)
@@ -0,0 +1,411 @@
+# app/metricas.py
+"""
+Métricas no formato texto do Prometheus, servidas em /metrics.
+
+A coleta fica em memória no processo (sem serviço externo): latência por
+blueprint/endpoint, consultas ao banco, bytes enviados em uploads, rejeições
+do rate limit, acertos/falhas de cache e as execuções do agregador de notícias.
+
+Com vários workers do gunicorn cada scrape cai num worker qualquer; se cada um
+mostrasse só os seus números os contadores pulariam de um valor para outro (e
+o Prometheus leria cada queda como um reset). Por isso cada processo grava o
+seu registro em METRICAS_DIRETORIO (ver ArquivosPorProcesso) e o /metrics
+soma os de todos.
+
+O agregador roda como script separado (cron), então as execuções dele são
+gravadas num arquivo JSON pequeno (METRICAS_ARQUIVO_AGREGADOR) e lidas aqui.
+"""
+import glob
+import json
+import os
+import threading
+import time
+
+from flask import current_app, g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.instrumentacao import Histograma
+
+
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LIMITES_AGREGADOR = (1, 2.5, 5, 10, 15, 30, 60, 120)
+
+
+# ===================================================================
+# REGISTRO
+# ===================================================================
+
+def _formatar_labels(labels, extra=None):
+    pares = list(labels) + (list(extra) if extra else [])
+    if not pares:
+        return ''
+    valores = ','.join(
+        '{}="{}"'.format(nome, str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for nome, valor in pares
+    )
+    return '{' + valores + '}'
+
+
+def _formatar_numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Registro:
+    """Guarda contadores, gauges e histogramas, cada série identificada pelos labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metricas = {}  # nome -> {"tipo", "ajuda", "limites", "series": {labels: valor}}
+
+    def declarar(self, nome, tipo, ajuda, limites=None):
+        self._metricas[nome] = {"tipo": tipo, "ajuda": ajuda, "limites": limites, "series": {}}
+
+    def incrementar(self, nome, valor=1, **labels):
+        chave = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._metricas[nome]["series"]
+            series[chave] = series.get(chave, 0) + valor
+
+    def definir(self, nome, valor, **labels):
+        with self._lock:
+            self._metricas[nome]["series"][tuple(sorted(labels.items()))] = valor
+
+    def observar(self, nome, valor, **labels):
+        chave = tuple(sorted(labels.items()))
+        with self._lock:
+            metrica = self._metricas[nome]
+            histograma = metrica["series"].get(chave)
+            if histograma is None:
+                histograma = metrica["series"][chave] = Histograma(metrica["limites"])
+            histograma.observar(valor)
+
+    def zerar(self):
+        with self._lock:
+            for metrica in self._metricas.values():
+                metrica["series"].clear()
+
+    def tipo(self, nome):
+        metrica = self._metricas.get(nome)
+        return metrica["tipo"] if metrica else None
+
+    def instantaneo(self):
+        """Cópia das séries que vai para o JSON: {nome: [[labels, valor], ...]}."""
+        with self._lock:
+            return {
+                nome: [
+                    [[list(par) for par in labels],
+                     [valor.contagens, valor.soma, valor.total] if isinstance(valor, Histograma) else valor]
+                    for labels, valor in metrica["series"].items()
+                ]
+                for nome, metrica in self._metricas.items() if metrica["series"]
+            }
+
+    def exportar(self, series=None):
+        """
+        Texto do Prometheus. `series` ({nome: {labels: valor}}, histograma como
+        [contagens, soma, total]) troca as séries deste processo (ex: a soma dos workers).
+        """
+        linhas = []
+        with self._lock:
+            for nome, metrica in self._metricas.items():
+                linhas.append(f'# HELP {nome} {metrica["ajuda"]}')
+                linhas.append(f'# TYPE {nome} {metrica["tipo"]}')
+
+                proprias = metrica["series"] if series is None else series.get(nome, {})
+                for labels, valor in sorted(proprias.items()):
+                    if metrica["tipo"] != 'histogram':
+                        linhas.append(f'{nome}{_formatar_labels(labels)} {_formatar_numero(valor)}')
+                        continue
+                    if isinstance(valor, Histograma):
+                        valor = [valor.contagens, valor.soma, valor.total]
+                    linhas.extend(_linhas_histograma(nome, labels, metrica["limites"], *valor))
+        return '\n'.join(linhas) + '\n'
+
+
+def _linhas_histograma(nome, labels, limites, contagens, soma, total):
+    linhas = []
+    acumulado = 0
+    for limite, contagem in zip(list(limites) + ['+Inf'], contagens):
+        acumulado += contagem
+        linhas.append(f'{nome}_bucket{_formatar_labels(labels, [("le", limite)])} {acumulado}')
+    linhas.append(f'{nome}_sum{_formatar_labels(labels)} {_formatar_numero(float(soma))}')
+    linhas.append(f'{nome}_count{_formatar_labels(labels)} {total}')
+    return linhas
+
+
+registro = Registro()
+
+registro.declarar('siif_http_requisicoes_total', 'counter', 'Requisições atendidas por endpoint e status.')
+registro.declarar('siif_http_requisicao_segundos', 'histogram', 'Latência das requisições por endpoint.',
+                  LIMITES_SEGUNDOS)
+registro.declarar('siif_db_consultas_total', 'counter', 'Consultas SQL executadas por endpoint.')
+registro.declarar('siif_db_consultas_segundos_total', 'counter', 'Tempo gasto em consultas SQL por endpoint.')
+registro.declarar('siif_upload_bytes_total', 'counter', 'Bytes recebidos em envios multipart por endpoint.')
+registro.declarar('siif_rate_limit_rejeicoes_total', 'counter', 'Requisições recusadas pelo rate limit (429).')
+registro.declarar('siif_cache_requisicoes_total', 'counter', 'Leituras de cache por cache e resultado (acerto/falha).')
+registro.declarar('siif_sse_conexoes', 'gauge', 'Conexões de tempo real (SSE) abertas (soma dos workers vivos).')
+
+
+# ===================================================================
+# VÁRIOS WORKERS (UM ARQUIVO POR PROCESSO)
+# ===================================================================
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # existe, mas é de outro usuário
+    return True
+
+
+def _somar(destino, valor):
+    if destino is None:
+        return [list(valor[0]), valor[1], valor[2]] if isinstance(valor, list) else valor
+    if isinstance(valor, list):
+        destino[0] = [a + b for a, b in zip(destino[0], valor[0])]
+        destino[1] += valor[1]
+        destino[2] += valor[2]
+        return destino
+    return destino + valor
+
+
+class ArquivosPorProcesso:
+    """
+    Cada processo grava o seu registro em <diretorio>/<pid>-<inicio>.json a
+    cada `intervalo` segundos (uma thread que sobe na primeira requisição, já
+    depois do fork) e antes de responder o /metrics, que soma os arquivos de
+    todos. Os números dos outros workers chegam com até `intervalo` de atraso.
+
+    Contadores e histogramas de workers que já terminaram continuam na soma
+    (senão o total cairia); gauges só contam processos vivos. O gunicorn.conf.py
+    esvazia o diretório quando o servidor sobe (o Prometheus vê um reset normal).
+    """
+
+    def __init__(self, diretorio, intervalo):
+        self.diretorio = diretorio
+        self.intervalo = intervalo
+        self._pid = None
+        self._arquivo = None
+        self._ultima_gravacao = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _gravar_periodicamente(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.gravar(forcar=True)
+            except OSError:
+                pass  # tenta de novo no próximo ciclo
+
+    def _arquivo_do_processo(self):
+        # Depois de um fork (gunicorn --preload) o filho ganha o próprio arquivo
+        # e a própria thread; o início no nome evita herdar o arquivo de um pid
+        # antigo reaproveitado
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._arquivo = os.path.join(self.diretorio, f'{self._pid}-{time.time_ns()}.json')
+            threading.Thread(target=self._gravar_periodicamente, name='siif-metricas', daemon=True).start()
+        return self._arquivo
+
+    def gravar(self, forcar=False):
+        agora = time.monotonic()
+        if not forcar and agora - self._ultima_gravacao < self.intervalo:
+            return
+        with self._lock:
+            self._ultima_gravacao = agora
+            _atualizar_gauges()
+            arquivo = self._arquivo_do_processo()
+            temporario = arquivo + '.tmp'
+            with open(temporario, 'w', encoding='utf-8') as saida:
+                json.dump(registro.instantaneo(), saida)
+            os.replace(temporario, arquivo)
+
+    def somar(self):
+        """{nome: {labels: valor}} com a soma dos arquivos de todos os processos."""
+        self.gravar(forcar=True)
+        total = {}
+        for caminho in glob.glob(os.path.join(self.diretorio, '*.json')):
+            try:
+                with open(caminho, encoding='utf-8') as entrada:
+                    dados = json.load(entrada)
+            except (OSError, ValueError):
+                continue
+            vivo = _processo_vivo(int(os.path.basename(caminho).split('-', 1)[0]))
+
+            for nome, series in dados.items():
+                tipo = registro.tipo(nome)
+                if tipo is None or (tipo == 'gauge' and not vivo):
+                    continue
+                destino = total.setdefault(nome, {})
+                for labels, valor in series:
+                    chave = tuple(tuple(par) for par in labels)
+                    destino[chave] = _somar(destino.get(chave), valor)
+        return total
+
+
+compartilhamento = None
+
+
+# ===================================================================
+# FUNÇÕES USADAS PELO RESTO DO APP
+# ===================================================================
+
+def _endpoint_atual():
+    if has_request_context():
+        return request.endpoint or 'desconhecido'
+    return 'fora_de_requisicao'
+
+
+def contar_cache(cache, acerto):
+    registro.incrementar('siif_cache_requisicoes_total', cache=cache, resultado='acerto' if acerto else 'falha')
+
+
+def contar_rate_limit():
+    registro.incrementar('siif_rate_limit_rejeicoes_total', endpoint=_endpoint_atual())
+
+
+# ===================================================================
+# AGREGADOR DE NOTÍCIAS (PROCESSO SEPARADO -> ARQUIVO JSON)
+# ===================================================================
+
+def _ler_arquivo_agregador(caminho):
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def registrar_execucao_agregador(duracao, novas):
+    """
+    Chamado pelo agregator.py ao terminar. `novas` é None quando a execução falhou.
+    Acumula o histograma de duração no arquivo para o /metrics dos workers ler.
+    """
+    caminho = current_app.config['METRICAS_ARQUIVO_AGREGADOR']
+    dados = _ler_arquivo_agregador(caminho) or {
+        "contagens": [0] * (len(LIMITES_AGREGADOR) + 1), "soma": 0.0, "total": 0,
+        "novas": 0, "falhas": 0, "ultima": 0
+    }
+
+    histograma = Histograma(LIMITES_AGREGADOR)
+    histograma.contagens = dados["contagens"]
+    histograma.soma, histograma.total = dados["soma"], dados["total"]
+    histograma.observar(duracao)
+
+    dados.update(contagens=histograma.contagens, soma=histograma.soma, total=histograma.total,
+                 ultima=time.time())
+    if novas is None:
+        dados["falhas"] += 1
+    else:
+        dados["novas"] += novas
+
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo)
+    os.replace(temporario, caminho)
+
+
+def _exportar_agregador():
+    dados = _ler_arquivo_agregador(current_app.config['METRICAS_ARQUIVO_AGREGADOR'])
+    if not dados:
+        return ''
+
+    nome = 'siif_agregador_execucao_segundos'
+    linhas = [f'# HELP {nome} Duração das execuções do agregador de notícias.', f'# TYPE {nome} histogram']
+    linhas += _linhas_histograma(nome, (), LIMITES_AGREGADOR, dados["contagens"], dados["soma"], dados["total"])
+    linhas += [
+        '# HELP siif_agregador_noticias_novas_total Notícias novas salvas pelo agregador.',
+        '# TYPE siif_agregador_noticias_novas_total counter',
+        f'siif_agregador_noticias_novas_total {dados["novas"]}',
+        '# HELP siif_agregador_falhas_total Execuções do agregador que falharam.',
+        '# TYPE siif_agregador_falhas_total counter',
+        f'siif_agregador_falhas_total {dados["falhas"]}',
+        '# HELP siif_agregador_ultima_execucao_timestamp Fim da última execução (unix).',
+        '# TYPE siif_agregador_ultima_execucao_timestamp gauge',
+        f'siif_agregador_ultima_execucao_timestamp {_formatar_numero(float(dados["ultima"]))}',
+    ]
+    return '\n'.join(linhas) + '\n'
+
+
+def _atualizar_gauges():
+    from app.tempo_real import barramento
+
+    registro.definir('siif_sse_conexoes', barramento.total_conexoes)
+
+
+def exportar():
+    """Texto completo do /metrics (somando os workers, se houver METRICAS_DIRETORIO)."""
+    if compartilhamento is None:
+        _atualizar_gauges()
+        return registro.exportar() + _exportar_agregador()
+    return registro.exportar(compartilhamento.somar()) + _exportar_agregador()
+
+
+# ===================================================================
+# HOOKS (REQUISIÇÃO E BANCO)
+# ===================================================================
+
+def _antes_da_consulta(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_metricas_inicio', []).append(time.perf_counter())
+
+
+def _depois_da_consulta(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get('_metricas_inicio')
+    if not inicios:
+        return
+    duracao = time.perf_counter() - inicios.pop()
+    endpoint = _endpoint_atual()
+    registro.incrementar('siif_db_consultas_total', endpoint=endpoint)
+    registro.incrementar('siif_db_consultas_segundos_total', duracao, endpoint=endpoint)
+
+
+def _iniciar_requisicao():
+    g._metricas_inicio = time.perf_counter()
+
+
+def _finalizar_requisicao(response):
+    inicio = g.pop('_metricas_inicio', None)
+    if inicio is None:
+        return response
+
+    endpoint = request.endpoint or 'desconhecido'
+    blueprint = request.blueprint or 'app'
+
+    registro.observar('siif_http_requisicao_segundos', time.perf_counter() - inicio,
+                      blueprint=blueprint, endpoint=endpoint)
+    registro.incrementar('siif_http_requisicoes_total', blueprint=blueprint, endpoint=endpoint,
+                         metodo=request.method, status=response.status_code)
+
+    if request.mimetype == 'multipart/form-data' and request.content_length:
+        registro.incrementar('siif_upload_bytes_total', request.content_length, endpoint=endpoint)
+
+    if compartilhamento is not None:
+        compartilhamento.gravar()
+    return response
+
+
+_listeners_registrados = False
+
+
+def init_app(app):
+    """Liga a coleta se METRICAS_ATIVAS estiver ativo (padrão)."""
+    global _listeners_registrados, compartilhamento
+
+    if not app.config.get('METRICAS_ATIVAS'):
+        return
+
+    diretorio = app.config.get('METRICAS_DIRETORIO')
+    compartilhamento = ArquivosPorProcesso(diretorio, app.config['METRICAS_INTERVALO']) if diretorio else None
+
+    if not _listeners_registrados:
+        event.listen(Engine, 'before_cursor_execute', _antes_da_consulta)
+        event.listen(Engine, 'after_cursor_execute', _depois_da_consulta)
+        _listeners_registrados = True
+
+    app.before_request(_iniciar_requisicao)
+    app.after_request(_finalizar_requisicao)
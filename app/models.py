@@ -22,13 +22,23 @@ def load_user(user_id):
 # Tabela para saber quem segue qual comunidade
 membros_comunidade = db.Table('membros_comunidade',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('comunidade_id', db.Integer, db.ForeignKey('comunidade.id'), primary_key=True)
+    db.Column('comunidade_id', db.Integer, db.ForeignKey('comunidade.id'), primary_key=True),
+    # A PK começa por user_id; este índice atende "todos os membros da comunidade X"
+    db.Index('ix_membros_comunidade_comunidade_id', 'comunidade_id')
 )
 
 # Tabela para saber quem são os moderadores
 moderadores_comunidade = db.Table('moderadores_comunidade',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('comunidade_id', db.Integer, db.ForeignKey('comunidade.id'), primary_key=True)
+    db.Column('comunidade_id', db.Integer, db.ForeignKey('comunidade.id'), primary_key=True),
+    # Lista de moderadores de uma comunidade (selos nos posts); a PK atende "X é moderador de Y?"
+    db.Index('ix_moderadores_comunidade_comunidade_id', 'comunidade_id')
+)
+
+# Índice de trigramas do nome das comunidades (busca sem acento e sem varrer a tabela)
+comunidade_trigramas = db.Table('comunidade_trigramas',
+    db.Column('trigrama', db.String(3), primary_key=True),
+    db.Column('comunidade_id', db.Integer, db.ForeignKey('comunidade.id', ondelete='CASCADE'), primary_key=True)
 )
 
 # Tabela associativa para Tags de Materiais
@@ -94,6 +104,10 @@ class User(db.Model,UserMixin):
     # O motivo
     motivo_suspensao = db.Column(db.String(255), nullable=True)
 
+    # Contador de notificações não lidas (mantido por app/notificacoes.py)
+    # Evita um COUNT na tabela de notificações só para mostrar o badge
+    notificacoes_nao_lidas = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
 
     ## Coisas da Suspensão
     def is_suspenso(self):
@@ -135,6 +149,15 @@ class User(db.Model,UserMixin):
         return f'<User {self.matricula}>'
 
 
+# Busca por prefixo do painel admin (api._consulta_usuarios_admin). No PostgreSQL
+# o LIKE 'termo%' só usa índice com text_pattern_ops (o de matrícula é só dele);
+# no SQLite a busca é por faixa e usa lower(name) e o índice único da matrícula.
+db.Index('ix_user_nome_minusculo', db.func.lower(User.name).label('nome_minusculo'),
+         postgresql_ops={'nome_minusculo': 'text_pattern_ops'})
+db.Index('ix_user_matricula_padrao', User.matricula,
+         postgresql_ops={'matricula': 'text_pattern_ops'}).ddl_if(dialect='postgresql')
+
+
 class Perfil(db.Model):
     __tablename__ = 'perfil'
 
@@ -187,6 +210,29 @@ class Notificacao(db.Model):
     data_criacao = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     usuario_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    # Agrupamento: eventos repetidos com a mesma chave (ex: 'comentario:topico:7')
+    # atualizam a notificação não lida em vez de criar outra ("Fulano comentou (e mais 5...)")
+    chave_agrupamento = db.Column(db.String(120), nullable=True)
+    total_agrupado = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __table_args__ = (
+        # Índices para listar as notificações de um usuário (paginadas por id):
+        # todas, e só as lidas/não lidas (filtro "não lidas" e limpeza das lidas)
+        db.Index('ix_notificacao_usuario_id', 'usuario_id', 'id'),
+        db.Index('ix_notificacao_usuario_lida_id', 'usuario_id', 'lida', 'id'),
+        # Índice para achar a notificação agrupável (mesma chave, ainda não lida)
+        db.Index('ix_notificacao_chave_lida', 'chave_agrupamento', 'lida'),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "mensagem": self.mensagem,
+            "link_url": self.link_url,
+            "lida": bool(self.lida),
+            "data_criacao": self.data_criacao.isoformat() if self.data_criacao else None
+        }
+
     def __repr__(self):
         return f'<Notificação para {self.usuario_id}>'
 
@@ -231,10 +277,11 @@ class Comunidade(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), unique=True, nullable=False)
+    nome_normalizado = db.Column(db.String(100), index=True) # minúsculo e sem acento (busca)
     descricao = db.Column(db.String(300), nullable=False)
     
     # Organização
-    categoria = db.Column(db.String(50), default='Geral') 
+    categoria = db.Column(db.String(50), default='Geral', index=True) 
     tipo_acesso = db.Column(db.String(20), default='Público') 
     regras = db.Column(db.Text, nullable=True)
     mensagem_boas_vindas = db.Column(db.Text, nullable=True)
@@ -251,6 +298,11 @@ class Comunidade(db.Model):
     
     criado_em = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     criador_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    # Contadores desnormalizados (mantidos por app/comunidades.py)
+    membros_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    topicos_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    ultima_atividade_em = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
     
     # Relacionamentos
     topicos = db.relationship('Topico', backref='comunidade', lazy=True)
@@ -282,6 +334,8 @@ class EnqueteOpcao(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     texto = db.Column(db.String(200), nullable=False)
     topico_id = db.Column(db.Integer, db.ForeignKey('topico.id'), nullable=False)
+    # Contador desnormalizado (mantido por app/enquetes.py), para não carregar os votos
+    votos_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relacionamento com os votos
     votos = db.relationship('EnqueteVoto', backref='opcao', lazy=True, cascade="all, delete-orphan")
@@ -291,9 +345,11 @@ class EnqueteVoto(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     opcao_id = db.Column(db.Integer, db.ForeignKey('enquete_opcao.id'), nullable=False)
+    # Cópia do tópico da opção: permite a restrição de 1 voto por enquete
+    topico_id = db.Column(db.Integer, db.ForeignKey('topico.id'), nullable=False)
 
-    # Garante que um usuário só vota uma vez por opção (logica extra no backend garante 1 por enquete)
-    __table_args__ = (db.UniqueConstraint('user_id', 'opcao_id', name='_user_opcao_voto_uc'),)
+    # Um voto por usuário por enquete (o próprio INSERT barra o segundo voto)
+    __table_args__ = (db.UniqueConstraint('user_id', 'topico_id', name='_user_topico_voto_uc'),)
 
 
 class Topico(db.Model):
@@ -319,6 +375,13 @@ class Topico(db.Model):
     criado_em = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     autor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     comunidade_id = db.Column(db.Integer, db.ForeignKey('comunidade.id'), nullable=True)
+
+    # Ranking "em alta" (mantidos por app/relevancia.py)
+    interacoes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    relevancia = db.Column(db.Float, nullable=False, default=0, server_default='0')
+
+    # Sobe quando muda algo do corpo do card (chave do cache em app/fragmentos.py)
+    versao = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relacionamentos
     respostas = db.relationship('Resposta', backref='topico', lazy=True, cascade="all, delete-orphan")
@@ -335,6 +398,15 @@ class Topico(db.Model):
     tag_id = db.Column(db.Integer, db.ForeignKey('comunidade_tag.id'), nullable=True)
     tag = db.relationship('ComunidadeTag', foreign_keys=[tag_id], lazy=True)
 
+    __table_args__ = (
+        # Feed da comunidade: keyset em (criado_em, id) dentro da comunidade
+        db.Index('ix_topico_comunidade_criado_em_id', 'comunidade_id', 'criado_em', 'id'),
+        # Fixados de uma comunidade (consulta separada, sempre pequena)
+        db.Index('ix_topico_comunidade_fixado', 'comunidade_id', 'fixado'),
+        # Feed por relevância: leitura direta do índice
+        db.Index('ix_topico_relevancia_id', 'relevancia', 'id'),
+    )
+
     def __repr__(self):
         return f'<Topico {self.titulo}>'
 
@@ -374,11 +446,18 @@ class Resposta(db.Model):
     
     # Hierarquia (Comentário respondendo comentário)
     parent_id = db.Column(db.Integer, db.ForeignKey('resposta.id'), nullable=True)
+    # Caminho materializado ('0000000012/0000000040/'), mantido por app/respostas.py
+    caminho = db.Column(db.String(400), nullable=True)
     filhos = db.relationship('Resposta', backref=db.backref('pai', remote_side=[id]), lazy=True, cascade="all, delete-orphan")
     
     # Likes
     likes = db.relationship('RespostaLike', backref='resposta', lazy=True, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Árvore inteira (ou um intervalo de threads) de um tópico, já em ordem de leitura
+        db.Index('ix_resposta_topico_caminho', 'topico_id', 'caminho'),
+    )
+
     def __repr__(self):
         return f'<Resposta {self.id}>'
 
@@ -599,3 +678,33 @@ class NoticiaAgregada(db.Model):
     # Campos para compatibilidade com o frontend
     campus = db.Column(db.String(100), default="IFRN Portal")
     categoria = db.Column(db.String(100), default="Notícia Externa")
+
+
+# ===================================================================
+# ESTATÍSTICAS DO PAINEL ADMIN (MANTIDAS POR app/estatisticas.py)
+# ===================================================================
+
+class EstatisticaDiaria(db.Model):
+    """Contadores por dia, incrementados quando o evento acontece (sem varrer tabelas)."""
+    __tablename__ = 'estatistica_diaria'
+
+    dia = db.Column(db.Date, primary_key=True)
+    posts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    uploads = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    usuarios_ativos = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def to_dict(self):
+        return {
+            "dia": self.dia.isoformat(),
+            "posts": self.posts,
+            "uploads": self.uploads,
+            "usuarios_ativos": self.usuarios_ativos
+        }
+
+
+class UsuarioAtivoDia(db.Model):
+    """Quem já foi contado como ativo em cada dia (evita contar o mesmo usuário duas vezes)."""
+    __tablename__ = 'usuario_ativo_dia'
+
+    dia = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
@@ -0,0 +1,293 @@
+# app/notificacoes.py
+"""
+Serviço de notificações.
+
+Centraliza a criação e a leitura de notificações para manter o contador
+`User.notificacoes_nao_lidas` sempre em sincronia com a tabela, de modo que
+o badge do sino seja só a leitura de uma coluna (sem COUNT).
+
+Avisos para muitos usuários (ex: todos os membros de uma comunidade) passam
+por `notificar_usuarios`, que grava tudo em lote e agrupa eventos repetidos.
+"""
+from datetime import datetime, timezone, timedelta
+
+from sqlalchemy import update, delete, insert, select, func
+
+from app.extensions import db
+from app.models import Notificacao, User, membros_comunidade
+from app.tempo_real import publicar_apos_commit
+
+
+# Quantas notificações lidas mantemos por usuário (as mais antigas são descartadas)
+LIMITE_LIDAS_POR_USUARIO = 200
+
+# Depois de quantos dias uma notificação lida pode ser removida
+DIAS_RETENCAO_LIDAS = 30
+
+# Quantos ids vão em cada cláusula IN (o SQLite antigo aceita no máx. 999 parâmetros)
+TAMANHO_LOTE = 500
+
+
+def _lotes(itens, tamanho=TAMANHO_LOTE):
+    for i in range(0, len(itens), tamanho):
+        yield itens[i:i + tamanho]
+
+
+# ===================================================================
+# ESCRITA (NÃO FAZEM COMMIT - QUEM CHAMA DECIDE)
+# ===================================================================
+
+def criar_notificacao(usuario_id, mensagem, link_url=None):
+    """Adiciona uma notificação na sessão e incrementa o contador do usuário."""
+    notificacao = Notificacao(mensagem=mensagem, link_url=link_url, usuario_id=usuario_id)
+    db.session.add(notificacao)
+
+    db.session.execute(
+        update(User)
+        .where(User.id == usuario_id)
+        .values(notificacoes_nao_lidas=User.notificacoes_nao_lidas + 1)
+    )
+
+    # Avisa as páginas abertas do usuário (badge +1) quando o commit acontecer
+    publicar_apos_commit(f'usuario:{usuario_id}', 'notificacao', {
+        'mensagem': mensagem,
+        'link_url': link_url,
+        'incremento': 1
+    })
+    return notificacao
+
+
+def notificar_usuarios(usuario_ids, mensagem, link_url=None, chave=None, mensagem_agrupada=None):
+    """
+    Notifica vários usuários de uma vez.
+
+    Com `chave` (ex: 'comentario:topico:7'), quem ainda tem uma notificação NÃO
+    LIDA com a mesma chave não ganha outra: a antiga é substituída por uma nova
+    (que sobe para o topo da lista) com o texto de `mensagem_agrupada`, onde
+    '{outros}' vira o número de eventos anteriores, não de pessoas (quem comenta
+    3 vezes conta 3): "Fulano comentou (e mais 5 comentários...)".
+    O contador só é incrementado para quem ganhou uma notificação a mais.
+
+    Tudo é feito em lote: um SELECT das agrupáveis, um INSERT com todas as
+    linhas e um UPDATE do contador, independente do número de destinatários.
+    Retorna (novas, agrupadas).
+    """
+    ids = sorted(set(usuario_ids))
+    if not ids:
+        return 0, 0
+
+    agora = datetime.now(timezone.utc)
+    totais = {}  # usuario_id -> total_agrupado da notificação que será criada
+
+    if chave:
+        # Trava os destinatários antes de ler as agrupáveis: com dois eventos ao
+        # mesmo tempo o segundo espera o commit do primeiro e já vê a notificação
+        # dele (senão cada um apagaria a antiga e inseriria a sua: duplicada).
+        # É um UPDATE sem efeito porque trava nos dois bancos; o FOR UPDATE o
+        # SQLite ignora, já o UPDATE pega o lock de escrita dele.
+        for lote in _lotes(ids):
+            db.session.execute(
+                update(User)
+                .where(User.id.in_(lote))
+                .values(notificacoes_nao_lidas=User.notificacoes_nao_lidas)
+                .execution_options(synchronize_session=False)
+            )
+
+        substituidas = []
+        for lote in _lotes(ids):
+            linhas = db.session.execute(
+                select(Notificacao.id, Notificacao.usuario_id, Notificacao.total_agrupado)
+                .where(Notificacao.chave_agrupamento == chave,
+                       Notificacao.lida == False,
+                       Notificacao.usuario_id.in_(lote))
+            ).all()
+            for notificacao_id, usuario_id, total in linhas:
+                substituidas.append(notificacao_id)
+                totais[usuario_id] = max(totais.get(usuario_id, 0), total or 1) + 1
+
+        for lote in _lotes(substituidas):
+            db.session.execute(
+                delete(Notificacao)
+                .where(Notificacao.id.in_(lote))
+                .execution_options(synchronize_session=False)
+            )
+
+    linhas = []
+    for usuario_id in ids:
+        total = totais.get(usuario_id, 1)
+        texto = mensagem
+        if total > 1 and mensagem_agrupada:
+            texto = mensagem_agrupada.replace('{outros}', str(total - 1))
+        linhas.append({
+            'usuario_id': usuario_id,
+            'mensagem': texto[:300],
+            'link_url': link_url,
+            'lida': False,
+            'data_criacao': agora,
+            'chave_agrupamento': chave,
+            'total_agrupado': total
+        })
+    db.session.execute(insert(Notificacao), linhas)
+
+    novos = [usuario_id for usuario_id in ids if usuario_id not in totais]
+    for lote in _lotes(novos):
+        db.session.execute(
+            update(User)
+            .where(User.id.in_(lote))
+            .values(notificacoes_nao_lidas=User.notificacoes_nao_lidas + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    for linha in linhas:
+        publicar_apos_commit(f'usuario:{linha["usuario_id"]}', 'notificacao', {
+            'mensagem': linha['mensagem'],
+            'link_url': link_url,
+            'incremento': 0 if linha['usuario_id'] in totais else 1
+        })
+
+    return len(novos), len(totais)
+
+
+def notificar_membros_comunidade(comunidade_id, mensagem, link_url=None, chave=None,
+                                 mensagem_agrupada=None, excluir_ids=()):
+    """
+    Notifica todos os membros de uma comunidade (a lista sai de uma única
+    consulta em `membros_comunidade`). Feita para rodar em segundo plano:
+        enfileirar(notificar_membros_comunidade, comunidade.id, ...)
+    """
+    membros = db.session.execute(
+        select(membros_comunidade.c.user_id)
+        .where(membros_comunidade.c.comunidade_id == comunidade_id)
+    ).scalars().all()
+
+    excluir = set(excluir_ids)
+    destinatarios = [usuario_id for usuario_id in membros if usuario_id not in excluir]
+    return notificar_usuarios(destinatarios, mensagem, link_url, chave, mensagem_agrupada)
+
+
+def marcar_lida(notificacao_id, usuario_id):
+    """Marca uma notificação como lida. Retorna True se ela ainda não estava lida."""
+    resultado = db.session.execute(
+        update(Notificacao)
+        .where(Notificacao.id == notificacao_id,
+               Notificacao.usuario_id == usuario_id,
+               Notificacao.lida == False)
+        .values(lida=True)
+    )
+    if not resultado.rowcount:
+        return False
+
+    db.session.execute(
+        update(User)
+        .where(User.id == usuario_id, User.notificacoes_nao_lidas > 0)
+        .values(notificacoes_nao_lidas=User.notificacoes_nao_lidas - 1)
+    )
+    return True
+
+
+def marcar_todas_lidas(usuario_id):
+    """Marca todas as notificações do usuário como lidas e zera o contador."""
+    db.session.execute(
+        update(Notificacao)
+        .where(Notificacao.usuario_id == usuario_id, Notificacao.lida == False)
+        .values(lida=True)
+    )
+    db.session.execute(
+        update(User).where(User.id == usuario_id).values(notificacoes_nao_lidas=0)
+    )
+    publicar_apos_commit(f'usuario:{usuario_id}', 'notificacoes_lidas', {'nao_lidas': 0})
+
+
+# ===================================================================
+# LEITURA
+# ===================================================================
+
+def listar_notificacoes(usuario_id, antes_de=None, limite=20, apenas_nao_lidas=False):
+    """
+    Lista as notificações do usuário da mais nova para a mais antiga.
+    A paginação é por cursor (`antes_de` = último id recebido), então cada página
+    é uma leitura direta no índice (usuario_id, lida, id), sem OFFSET.
+    Retorna (notificacoes, proximo_cursor).
+    """
+    query = select(Notificacao).where(Notificacao.usuario_id == usuario_id)
+
+    if apenas_nao_lidas:
+        query = query.where(Notificacao.lida == False)
+    if antes_de:
+        query = query.where(Notificacao.id < antes_de)
+
+    itens = db.session.execute(
+        query.order_by(Notificacao.id.desc()).limit(limite + 1)
+    ).scalars().all()
+
+    proximo = None
+    if len(itens) > limite:
+        itens = itens[:limite]
+        proximo = itens[-1].id
+
+    return itens, proximo
+
+
+# ===================================================================
+# MANUTENÇÃO (RODAR PERIODICAMENTE: flask siif limpar-notificacoes)
+# ===================================================================
+
+def limpar_notificacoes_antigas(dias=DIAS_RETENCAO_LIDAS, limite_por_usuario=LIMITE_LIDAS_POR_USUARIO):
+    """
+    Remove notificações já lidas que passaram do prazo de retenção e corta o
+    histórico de lidas de cada usuário em `limite_por_usuario` (None ou 0: sem corte).
+    Notificações não lidas nunca são apagadas (o contador continua válido).
+    Retorna a quantidade de linhas removidas.
+    """
+    corte = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=dias)
+
+    removidas = db.session.execute(
+        delete(Notificacao)
+        .where(Notificacao.lida == True, Notificacao.data_criacao < corte)
+        .execution_options(synchronize_session=False)
+    ).rowcount or 0
+
+    if not limite_por_usuario or limite_por_usuario < 1:
+        db.session.commit()
+        return removidas
+
+    # Usuários que ainda passam do limite de lidas
+    excedentes = db.session.execute(
+        select(Notificacao.usuario_id)
+        .where(Notificacao.lida == True)
+        .group_by(Notificacao.usuario_id)
+        .having(func.count(Notificacao.id) > limite_por_usuario)
+    ).scalars().all()
+
+    for usuario_id in excedentes:
+        # id da notificação lida mais antiga que ainda deve ser mantida
+        id_corte = db.session.execute(
+            select(Notificacao.id)
+            .where(Notificacao.usuario_id == usuario_id, Notificacao.lida == True)
+            .order_by(Notificacao.id.desc())
+            .offset(limite_por_usuario - 1)
+            .limit(1)
+        ).scalar()
+
+        removidas += db.session.execute(
+            delete(Notificacao)
+            .where(Notificacao.usuario_id == usuario_id,
+                   Notificacao.lida == True,
+                   Notificacao.id < id_corte)
+            .execution_options(synchronize_session=False)
+        ).rowcount or 0
+
+    db.session.commit()
+    return removidas
+
+
+def recalcular_contadores():
+    """Recalcula `notificacoes_nao_lidas` de todos os usuários a partir da tabela."""
+    nao_lidas = (
+        select(func.count(Notificacao.id))
+        .where(Notificacao.usuario_id == User.id, Notificacao.lida == False)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    db.session.execute(update(User).values(notificacoes_nao_lidas=nao_lidas))
+    db.session.commit()
@@ -0,0 +1,109 @@
+# app/papeis.py
+"""
+Papéis do usuário numa comunidade: membro, moderador, dono e banido.
+
+`current_user in comunidade.membros` percorre a relação inteira (em comunidade
+grande são milhares de linhas, e nos templates isso se repete a cada post).
+Aqui cada pergunta vira um EXISTS nas tabelas de associação, atendido direto
+pela PK (user_id, comunidade_id), e os quatro papéis saem numa consulta só.
+O resultado fica guardado em `g` até o fim da requisição:
+
+    papeis = papeis_na_comunidade(comunidade)
+    if papeis.pode_moderar: ...
+
+Quem alterar membros/moderadores e voltar a consultar na mesma requisição
+deve chamar `esquecer_papeis(comunidade_id)` antes.
+"""
+from collections import namedtuple
+
+from flask import g, has_request_context
+from flask_login import current_user
+from sqlalchemy import select, exists
+
+from app.extensions import db
+from app.models import membros_comunidade, moderadores_comunidade, banned_users
+
+
+class Papeis(namedtuple('Papeis', 'membro moderador dono banido')):
+    __slots__ = ()
+
+    @property
+    def pode_moderar(self):
+        """Moderador ou dono (o dono nem sempre está em moderadores_comunidade)."""
+        return self.moderador or self.dono
+
+
+SEM_PAPEL = Papeis(False, False, False, False)
+
+
+def _memoria():
+    """Dicionário da requisição atual (fora de requisição não guarda nada)."""
+    if not has_request_context():
+        return {}
+    if '_papeis' not in g:
+        g._papeis = {}
+    return g._papeis
+
+
+def _existe(tabela, usuario_id, comunidade_id):
+    return exists().where(tabela.c.user_id == usuario_id, tabela.c.comunidade_id == comunidade_id)
+
+
+def papeis_na_comunidade(comunidade, usuario=None):
+    """Papéis de `usuario` (padrão: current_user) em `comunidade`, numa consulta só."""
+    if usuario is None:
+        usuario = current_user
+    if comunidade is None or not getattr(usuario, 'is_authenticated', False):
+        return SEM_PAPEL
+
+    memoria = _memoria()
+    chave = ('papeis', comunidade.id, usuario.id)
+    if chave in memoria:
+        return memoria[chave]
+
+    linha = db.session.execute(
+        select(
+            _existe(membros_comunidade, usuario.id, comunidade.id).label('membro'),
+            _existe(moderadores_comunidade, usuario.id, comunidade.id).label('moderador'),
+            _existe(banned_users, usuario.id, comunidade.id).label('banido')
+        )
+    ).one()
+
+    papeis = Papeis(bool(linha.membro), bool(linha.moderador), comunidade.criador_id == usuario.id, bool(linha.banido))
+    memoria[chave] = papeis
+    return papeis
+
+
+def eh_membro(comunidade, usuario=None):
+    return papeis_na_comunidade(comunidade, usuario).membro
+
+
+def pode_moderar(comunidade, usuario=None):
+    return papeis_na_comunidade(comunidade, usuario).pode_moderar
+
+
+def ids_moderadores(comunidade):
+    """
+    IDs de quem tem selo de moderador na comunidade (moderadores + dono).
+    Usado pelos templates para marcar autores de posts/comentários sem
+    carregar os objetos User.
+    """
+    if comunidade is None:
+        return frozenset()
+
+    memoria = _memoria()
+    chave = ('moderadores', comunidade.id)
+    if chave not in memoria:
+        ids = db.session.execute(
+            select(moderadores_comunidade.c.user_id)
+            .where(moderadores_comunidade.c.comunidade_id == comunidade.id)
+        ).scalars()
+        memoria[chave] = frozenset(ids) | {comunidade.criador_id}
+    return memoria[chave]
+
+
+def esquecer_papeis(comunidade_id):
+    """Descarta o que foi memorizado para a comunidade nesta requisição."""
+    memoria = _memoria()
+    for chave in [c for c in memoria if c[1] == comunidade_id]:
+        del memoria[chave]
@@ -0,0 +1,131 @@
+# app/relevancia.py
+"""
+Relevância ("em alta") dos tópicos do fórum.
+
+Antes o feed por relevância contava os likes com GROUP BY a cada requisição,
+e um post antigo com muitos likes ficava no topo para sempre. Agora cada
+tópico guarda:
+
+- `interacoes`: soma ponderada de likes, respostas e salvos;
+- `relevancia`: log10(1 + interacoes) + horas_desde_EPOCA / HORAS_POR_ORDEM.
+
+Com o tempo dentro da fórmula, um post HORAS_POR_ORDEM horas mais novo empata
+com outro que tenha 10x as interações: o decaimento já está na ordenação, sem
+reescrever todas as notas a cada hora. O feed por relevância é só uma leitura
+do índice (relevancia, id).
+
+Likes, salvos e respostas criados/removidos pelo ORM atualizam o tópico na
+mesma transação (eventos abaixo). `flask siif recalcular-relevancia` recalcula
+tudo a partir das tabelas; agende-o (cron) para corrigir desvios de inserções
+diretas no banco.
+"""
+import math
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update, func, event, bindparam
+
+from app.extensions import db
+from app.models import Topico, Resposta, PostLike, PostSalvo
+
+PESOS = {
+    PostLike: 1,
+    Resposta: 2,
+    PostSalvo: 3,
+}
+
+# Horas de "novidade" que valem 10x mais interações
+HORAS_POR_ORDEM = 12
+
+EPOCA = datetime(2024, 1, 1)
+
+
+def calcular(interacoes, criado_em):
+    """Nota de relevância de um tópico (quanto maior, mais no topo)."""
+    if criado_em is None:
+        criado_em = datetime.now(timezone.utc)
+    if criado_em.tzinfo is not None:
+        criado_em = criado_em.astimezone(timezone.utc).replace(tzinfo=None)
+    horas = (criado_em - EPOCA).total_seconds() / 3600
+    return math.log10(1 + max(interacoes or 0, 0)) + horas / HORAS_POR_ORDEM
+
+
+# ===================================================================
+# ATUALIZAÇÃO INCREMENTAL
+# ===================================================================
+
+@event.listens_for(Topico, 'before_insert')
+def _relevancia_inicial(mapper, conexao, topico):
+    topico.interacoes = topico.interacoes or 0
+    topico.relevancia = calcular(topico.interacoes, topico.criado_em)
+
+
+def _somar(conexao, topico_id, peso):
+    """
+    Lê o tópico com a linha travada (FOR UPDATE; no SQLite a transação já tem
+    a escrita exclusiva) e grava interações e relevância num UPDATE só: outra
+    transação não consegue somar entre a leitura e a nota.
+    """
+    tabela = Topico.__table__
+    linha = conexao.execute(
+        select(tabela.c.interacoes, tabela.c.criado_em)
+        .where(tabela.c.id == topico_id)
+        .with_for_update()
+    ).first()
+    if linha is not None:
+        interacoes = (linha.interacoes or 0) + peso
+        conexao.execute(
+            update(tabela).where(tabela.c.id == topico_id)
+            .values(interacoes=interacoes, relevancia=calcular(interacoes, linha.criado_em))
+        )
+
+
+def _registrar(modelo):
+    peso = PESOS[modelo]
+
+    @event.listens_for(modelo, 'after_insert')
+    def _ao_criar(mapper, conexao, objeto):
+        _somar(conexao, objeto.topico_id, peso)
+
+    @event.listens_for(modelo, 'after_delete')
+    def _ao_remover(mapper, conexao, objeto):
+        _somar(conexao, objeto.topico_id, -peso)
+
+
+for _modelo in PESOS:
+    _registrar(_modelo)
+
+
+# ===================================================================
+# RECÁLCULO COMPLETO
+# ===================================================================
+
+def _contagem(modelo):
+    return (
+        select(func.count(modelo.id))
+        .where(modelo.topico_id == Topico.id)
+        .correlate(Topico)
+        .scalar_subquery()
+    )
+
+
+def recalcular():
+    """Recalcula interações e relevância de todos os tópicos a partir das tabelas."""
+    db.session.execute(
+        update(Topico)
+        .values(interacoes=sum(_contagem(modelo) * peso for modelo, peso in PESOS.items()))
+        .execution_options(synchronize_session=False)
+    )
+
+    tabela = Topico.__table__
+    notas = [
+        {"b_id": topico_id, "b_relevancia": calcular(interacoes, criado_em)}
+        for topico_id, interacoes, criado_em in db.session.execute(
+            select(Topico.id, Topico.interacoes, Topico.criado_em)
+        )
+    ]
+    if notas:
+        db.session.connection().execute(
+            update(tabela).where(tabela.c.id == bindparam('b_id')).values(relevancia=bindparam('b_relevancia')),
+            notas
+        )
+    db.session.commit()
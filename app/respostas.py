@@ -0,0 +1,192 @@
+# app/respostas.py
+"""
+Árvore de respostas (comentários) com caminho materializado.
+
+Cada resposta guarda em `caminho` os ids de todos os ancestrais e o próprio,
+com largura fixa: '0000000012/0000000040/'. Ordenar por `caminho` dá a árvore
+já na ordem de leitura (pai, filhos, netos...), então uma thread inteira (ou
+uma página de threads) sai de UMA consulta, sem ir descendo por `parent_id`
+nível a nível. `parent_id` continua existindo e é a fonte da verdade.
+
+Os feeds não carregam mais os comentários: só a contagem. A árvore vem sob
+demanda quando o usuário abre os comentários (/forum/<id>/respostas).
+"""
+from sqlalchemy import select, update, func, event, bindparam
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.extensions import db
+from app.models import Resposta
+
+
+# Largura de cada id no caminho (ordena como texto = ordena como número)
+LARGURA_ID = 10
+
+# Threads (respostas de primeiro nível) por página
+THREADS_POR_PAGINA = 10
+
+# Níveis carregados junto com a página; os mais fundos vêm ao clicar em "ver respostas"
+PROFUNDIDADE_INICIAL = 3
+
+# Quantos níveis cabem na coluna `caminho` (36 com String(400))
+NIVEIS_MAXIMOS = Resposta.__table__.c.caminho.type.length // (LARGURA_ID + 1)
+
+
+def _segmento(resposta_id):
+    return f'{resposta_id:0{LARGURA_ID}d}/'
+
+
+def profundidade(resposta):
+    """0 para respostas ao tópico, 1 para respostas a uma resposta, etc."""
+    return (len(resposta.caminho or '') // (LARGURA_ID + 1)) - 1
+
+
+# ===================================================================
+# MANUTENÇÃO DO CAMINHO
+# ===================================================================
+
+@event.listens_for(Resposta, 'after_insert')
+def _definir_caminho(mapper, conexao, resposta):
+    caminho_pai = ''
+    if resposta.parent_id:
+        caminho_pai = conexao.execute(
+            select(Resposta.caminho).where(Resposta.id == resposta.parent_id)
+        ).scalar() or _segmento(resposta.parent_id)
+
+    caminho = caminho_pai + _segmento(resposta.id)
+    conexao.execute(update(Resposta.__table__).where(Resposta.__table__.c.id == resposta.id).values(caminho=caminho))
+    set_committed_value(resposta, 'caminho', caminho)
+
+
+def pai_da_resposta(topico_id, parent_id):
+    """
+    Pai efetivo de uma nova resposta a `parent_id` (o id vindo do formulário).
+    ValueError se o id não for um número, não existir ou for de outro tópico
+    (a resposta ganharia o caminho do outro tópico e nunca apareceria).
+    Respondendo a algo já no último nível (NIVEIS_MAXIMOS), a resposta vira
+    irmã dele: continua a conversa sem estourar o tamanho do caminho.
+    """
+    pai = db.session.execute(
+        select(Resposta.id, Resposta.parent_id, Resposta.topico_id, Resposta.caminho)
+        .where(Resposta.id == int(parent_id))
+    ).first()
+    if pai is None or pai.topico_id != topico_id:
+        raise ValueError('Resposta inexistente ou de outro tópico')
+
+    if len(pai.caminho or '') // (LARGURA_ID + 1) >= NIVEIS_MAXIMOS:
+        return pai.parent_id
+    return pai.id
+
+
+def recalcular_caminhos():
+    """Refaz o caminho de todas as respostas a partir de parent_id (pais sempre têm id menor)."""
+    caminhos = {}
+    for resposta_id, parent_id in db.session.execute(select(Resposta.id, Resposta.parent_id).order_by(Resposta.id)):
+        caminhos[resposta_id] = caminhos.get(parent_id, '') + _segmento(resposta_id)
+
+    tabela = Resposta.__table__
+    if caminhos:
+        db.session.connection().execute(
+            update(tabela).where(tabela.c.id == bindparam('b_id')).values(caminho=bindparam('b_caminho')),
+            [{"b_id": resposta_id, "b_caminho": caminho} for resposta_id, caminho in caminhos.items()]
+        )
+    db.session.commit()
+
+
+# ===================================================================
+# LEITURA
+# ===================================================================
+
+def contar_respostas(ids_topicos):
+    """{topico_id: total de respostas} numa consulta (tópicos sem resposta ficam de fora)."""
+    if not ids_topicos:
+        return {}
+    return dict(db.session.execute(
+        select(Resposta.topico_id, func.count(Resposta.id))
+        .where(Resposta.topico_id.in_(ids_topicos))
+        .group_by(Resposta.topico_id)
+    ).all())
+
+
+def _montar_arvore(respostas):
+    """
+    Recebe as respostas ordenadas por caminho e preenche `filhos_carregados`
+    em cada uma. Retorna as raízes (as de menor profundidade da lista).
+    """
+    raizes = []
+    pilha = []
+    for resposta in respostas:
+        resposta.filhos_carregados = []
+        resposta.filhos_ocultos = 0
+        nivel = profundidade(resposta)
+        while pilha and profundidade(pilha[-1]) >= nivel:
+            pilha.pop()
+        if pilha and pilha[-1].id == resposta.parent_id:
+            pilha[-1].filhos_carregados.append(resposta)
+        else:
+            raizes.append(resposta)
+        pilha.append(resposta)
+    return raizes
+
+
+def _consulta_arvore():
+    return select(Resposta).options(selectinload(Resposta.autor), selectinload(Resposta.likes)).order_by(Resposta.caminho)
+
+
+def _marcar_ocultos(respostas, nivel):
+    """Conta os filhos (não carregados) das respostas que estão no último nível carregado."""
+    ultimo_nivel = [r for r in respostas if profundidade(r) == nivel]
+    if not ultimo_nivel:
+        return
+    totais = dict(db.session.execute(
+        select(Resposta.parent_id, func.count(Resposta.id))
+        .where(Resposta.parent_id.in_([r.id for r in ultimo_nivel]))
+        .group_by(Resposta.parent_id)
+    ).all())
+    for resposta in ultimo_nivel:
+        resposta.filhos_ocultos = totais.get(resposta.id, 0)
+
+
+def threads_do_topico(topico_id, apos=None, limite=THREADS_POR_PAGINA, niveis=PROFUNDIDADE_INICIAL):
+    """
+    Uma página de threads do tópico, com até `niveis` níveis de cada árvore.
+    `apos` é o id da última thread da página anterior.
+    Retorna (raizes, todas_as_respostas, proximo).
+    """
+    consulta_raizes = select(Resposta.id).where(Resposta.topico_id == topico_id, Resposta.parent_id.is_(None))
+    if apos:
+        consulta_raizes = consulta_raizes.where(Resposta.id > apos)
+    ids_raizes = db.session.execute(consulta_raizes.order_by(Resposta.id).limit(limite + 1)).scalars().all()
+    if not ids_raizes:
+        return [], [], None
+
+    # As threads da página ocupam um intervalo contínuo de caminhos
+    consulta = _consulta_arvore().where(
+        Resposta.topico_id == topico_id,
+        Resposta.caminho >= _segmento(ids_raizes[0]),
+        func.length(Resposta.caminho) <= niveis * (LARGURA_ID + 1)
+    )
+    proximo = None
+    if len(ids_raizes) > limite:
+        consulta = consulta.where(Resposta.caminho < _segmento(ids_raizes[limite]))
+        proximo = ids_raizes[limite - 1]
+
+    respostas = db.session.execute(consulta).scalars().all()
+    raizes = _montar_arvore(respostas)
+    _marcar_ocultos(respostas, niveis - 1)
+    return raizes, respostas, proximo
+
+
+def subarvore(resposta):
+    """A resposta e todos os descendentes, numa consulta. Retorna (raizes, todas_as_respostas)."""
+    respostas = db.session.execute(
+        _consulta_arvore().where(Resposta.topico_id == resposta.topico_id,
+                                 Resposta.caminho.startswith(resposta.caminho, autoescape=True))
+    ).scalars().all()
+    return _montar_arvore(respostas), respostas
+
+
+def arvore_completa(topico_id):
+    """Todas as respostas do tópico já montadas em árvore (página do post individual)."""
+    respostas = db.session.execute(_consulta_arvore().where(Resposta.topico_id == topico_id)).scalars().all()
+    return _montar_arvore(respostas), respostas
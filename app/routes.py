@@ -1,25 +1,29 @@
-from flask import render_template, request, redirect, url_for, flash, current_app, send_from_directory, Blueprint, session, abort
-import requests
+from flask import render_template, request, redirect, url_for, flash, current_app, send_from_directory, Blueprint, session, abort, jsonify
 from flask_login import login_required, current_user
 from sqlalchemy import or_, desc, func, text
 from werkzeug.utils import secure_filename
 import os
 import datetime
 import secrets
-from PIL import Image
-from thefuzz import fuzz
-import bleach
-from unidecode import unidecode
 import json
+from app.importacao import modulo_tardio, funcao_tardia
+
+# Bibliotecas pesadas e pouco usadas: só carregam no primeiro uso (boot mais rápido).
+# Imagem (foto de perfil), busca fuzzy e automod não entram no caminho do boot.
+Image = modulo_tardio('PIL.Image')
+fuzz = modulo_tardio('thefuzz.fuzz')
+unidecode = funcao_tardia('unidecode', 'unidecode')
+bleach = modulo_tardio('bleach')
 
 # --- IMPORTS DO APP (MODELOS E EXTENSÕES) ---
 from app.models import (
-    User, Noticia, Evento, NoticiaAgregada,
-    Topico, Comunidade, PostLike, RespostaLike, EnqueteVoto,
-    Resposta, SolicitacaoParticipacao, Material, Comentario, Tag,
-    RelatoSuporte, Denuncia, Perfil, RedeSocial, Notificacao
+    User, Perfil, RedeSocial, FAQ, Denuncia, RelatoSuporte, KanbanTask,
+    Noticia, Evento, NoticiaAgregada, Material, Comentario, material_favoritos,
+    Topico, Resposta, PostSalvo, PostLike, RespostaLike, Notificacao,
+    Comunidade, SolicitacaoParticipacao, Tag, ComunidadeTag, AuditLog,
+    EnqueteOpcao, membros_comunidade
 )
-from app.extensions import db
+from app.extensions import db, limiter
 from .lista_proibida import PALAVRAS_GLOBAIS
 
 
@@ -50,48 +54,27 @@ def sanitize_input(text: str) -> str:
     return bleach.clean(text, tags=[], strip=True)
 
 
-
-# Imports completos dos modelos (Incluindo as novas tabelas)
-from app.models import (
-    Material, User, FAQ, Denuncia, Noticia, Evento,
-    Topico, Resposta, PostSalvo, PostLike, Notificacao,
-    Comunidade, SolicitacaoParticipacao, RespostaLike, Tag, ComunidadeTag, AuditLog,
-    EnqueteOpcao, EnqueteVoto, RelatoSuporte, KanbanTask, RedeSocial,
-)
-
-# app/routes.py (Topo)
-from app.models import (
-    # ... outros modelos ...
-    Tag, ComunidadeTag, AuditLog,
-    EnqueteOpcao, EnqueteVoto  # <--- ADICIONE AQUI
-)
-
-from app.extensions import db, limiter
 from app.forms import ProfileForm
 from app.auth import get_suap_session
+from app.notificacoes import notificar_usuarios, notificar_membros_comunidade, marcar_todas_lidas
+from app.tarefas import enfileirar
+from app.estatisticas import contadores_painel, invalidar_contadores
+from app.tempo_real import publicar_apos_commit
+from app.comunidades import (
+    ajustar_contadores, listar_comunidades, facetas_categorias, invalidar_facetas, feed_da_comunidade,
+    feed_do_usuario, feed_do_forum, visiveis_no_forum, invalidar_feed, ORDENACOES
+)
+from app.respostas import contar_respostas, threads_do_topico, subarvore, arvore_completa, pai_da_resposta
+from app.papeis import papeis_na_comunidade, eh_membro, pode_moderar, ids_moderadores
+from app.enquetes import votar, votos_do_usuario
+from app.busca import buscar_topicos
+from app.fragmentos import corpo_do_topico
+from app.cache import cache
+from app.cache_http import politica_cache, PUBLICO
 
 main_bp = Blueprint('main', __name__)
 
 
-@main_bp.after_request
-def add_header(response):
-    """
-    Adiciona cabeçalhos para evitar cache em rotas protegidas.
-    """
-    response.headers["Cache-Control"] = "no-cache, private, no-store, must-revalidate, max-age=0"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
-    response.headers["Vary"] = "Cookie"
-
-    # Remove ETag and Last-Modified to prevent conditional requests (HTTP 304)
-    if 'ETag' in response.headers:
-        del response.headers['ETag']
-    if 'Last-Modified' in response.headers:
-        del response.headers['Last-Modified']
-
-    return response
-
-
 @main_bp.app_errorhandler(413)
 def request_entity_too_large(error):
     flash('O arquivo enviado é muito grande. O limite é 16MB.', 'danger')
@@ -108,6 +91,10 @@ def format_data_br(dt):
     return dt_brasil.strftime('%d/%m às %H:%M')
 
 
+# --- CORPO DOS CARDS DE TÓPICO (cache de fragmentos, ver app/fragmentos.py) ---
+main_bp.add_app_template_global(corpo_do_topico, 'corpo_do_topico')
+
+
 # --- FUNÇÕES AUXILIARES ---
 def registrar_log(comunidade_id, acao, detalhes=None):
     """Salva uma ação no histórico da comunidade."""
@@ -144,6 +131,25 @@ def verificar_automod(texto: str, comunidade=None) -> bool:
                 return True
                 
     return False
+
+
+def canais_do_topico(topico):
+    """Canais de tempo real que devem receber eventos deste tópico."""
+    canais = []
+    if topico.comunidade_id:
+        canais.append(f'comunidade:{topico.comunidade_id}')
+    # O feed geral só mostra posts globais ou de comunidades públicas
+    if not topico.comunidade_id or topico.comunidade.tipo_acesso != 'Restrito':
+        canais.append('forum')
+    return canais
+
+
+def publicar_evento_topico(topico, nome, dados):
+    """Publica (após o commit) um evento de tópico em todos os canais dele."""
+    dados = dict(dados, topico_id=topico.id)
+    for canal in canais_do_topico(topico):
+        publicar_apos_commit(canal, nome, dados)
+
 # ===================================================================
 # TELA INICIAL E REDIRECIONAMENTOS
 # ===================================================================
@@ -161,8 +167,23 @@ def tela_inicial():
     if not current_user.is_authenticated:
         return redirect(url_for('auth.login'))
 
-    # --- 2. LÓGICA DE NOTÍCIAS (MISTURA MANUAIS E EXTERNAS) ---
+    # --- 2. LÓGICA DE NOTÍCIAS (MISTURA MANUAIS E EXTERNAS, EM CACHE) ---
+    noticias_recentes = _noticias_da_home()
+
+    # --- 3. LÓGICA DE EVENTOS CORRIGIDA ---
+    agora = datetime.datetime.now()
+
+    # AQUI ESTAVA O ERRO: Mudamos de Evento.data_evento para Evento.data_hora_inicio
+    eventos_proximos = Evento.query.filter(Evento.data_hora_inicio >= agora).order_by(
+        Evento.data_hora_inicio.asc()).limit(3).all()
+
+    # --- 4. RENDERIZAÇÃO ---
+    return render_template('tela_inicial.html', noticias=noticias_recentes, eventos=eventos_proximos)
+
 
+@cache.memorizar('noticias_home', tags=('noticias',))
+def _noticias_da_home():
+    """As 4 notícias mais recentes (manuais + agregadas do IFRN) já como dicionários."""
     # Pegar notícias manuais
     manuais = Noticia.query.order_by(Noticia.data_publicacao.desc()).limit(10).all()
 
@@ -196,17 +217,7 @@ def tela_inicial():
 
     # Ordenar por data (mais recente primeiro) e pegar só as 4 primeiras
     lista_mista.sort(key=lambda x: x['data'], reverse=True)
-    noticias_recentes = lista_mista[:4]
-
-    # --- 3. LÓGICA DE EVENTOS CORRIGIDA ---
-    agora = datetime.datetime.now()
-
-    # AQUI ESTAVA O ERRO: Mudamos de Evento.data_evento para Evento.data_hora_inicio
-    eventos_proximos = Evento.query.filter(Evento.data_hora_inicio >= agora).order_by(
-        Evento.data_hora_inicio.asc()).limit(3).all()
-
-    # --- 4. RENDERIZAÇÃO ---
-    return render_template('tela_inicial.html', noticias=noticias_recentes, eventos=eventos_proximos)
+    return lista_mista[:4]
 
 # ===================================================================
 # COMUNIDADES (NOVA FUNCIONALIDADE)
@@ -217,26 +228,22 @@ def tela_inicial():
 def tela_comunidades():
     busca = request.args.get('q')
     categoria_filtro = request.args.get('categoria')
-    
-    query = Comunidade.query
-
-    if busca:
-        query = query.filter(Comunidade.nome.ilike(f'%{busca}%'))
-    
-    if categoria_filtro and categoria_filtro != 'Todas':
-        query = query.filter(Comunidade.categoria == categoria_filtro)
+    ordem = request.args.get('ordem', 'nome')
+    if ordem not in ORDENACOES:
+        ordem = 'nome'
+    pagina = request.args.get('pagina', 1, type=int)
 
-    comunidades = query.order_by(Comunidade.nome).all()
-    
-    categorias_db = db.session.query(Comunidade.categoria).distinct().order_by(Comunidade.categoria).all()
-    categorias = [c[0] for c in categorias_db if c[0]]
+    comunidades, tem_proxima = listar_comunidades(busca, categoria_filtro, ordem, pagina)
 
     return render_template(
         'tela_comunidades.html', 
         comunidades=comunidades, 
         busca=busca, 
-        categorias=categorias, 
-        categoria_atual=categoria_filtro
+        categorias=facetas_categorias(), 
+        categoria_atual=categoria_filtro,
+        ordem=ordem,
+        pagina=max(pagina, 1),
+        tem_proxima=tem_proxima
     )
 
 
@@ -276,9 +283,11 @@ def criar_comunidade():
         
         nova_com.membros.append(current_user)
         nova_com.moderadores.append(current_user)
+        nova_com.membros_count = 1
         
         db.session.add(nova_com)
         db.session.commit()
+        invalidar_facetas()
         
         flash('Comunidade criada!', 'success')
         return redirect(url_for('main.ver_comunidade', comunidade_id=nova_com.id))
@@ -294,13 +303,16 @@ def criar_comunidade():
 def participar_comunidade(comunidade_id):
     comunidade = Comunidade.query.get_or_404(comunidade_id)
     
-    if current_user in comunidade.membros:
+    papeis = papeis_na_comunidade(comunidade)
+    if papeis.membro:
         comunidade.membros.remove(current_user)
-        if current_user in comunidade.moderadores and comunidade.criador_id != current_user.id:
+        if papeis.moderador and not papeis.dono:
             comunidade.moderadores.remove(current_user)
+        ajustar_contadores(comunidade.id, membros=-1)
         
         flash(f'Saiu de {comunidade.nome}.', 'info')
         db.session.commit()
+        invalidar_feed(current_user.id)
         return redirect(request.referrer)
 
     if comunidade.tipo_acesso == 'Restrito':
@@ -313,7 +325,9 @@ def participar_comunidade(comunidade_id):
             flash('Solicitação enviada.', 'success')
     else:
         comunidade.membros.append(current_user)
+        ajustar_contadores(comunidade.id, membros=1)
         db.session.commit()
+        invalidar_feed(current_user.id)
         flash(f'Entrou em {comunidade.nome}!', 'success')
         
     return redirect(request.referrer)
@@ -327,37 +341,28 @@ def ver_comunidade(comunidade_id):
     # Filtro vindo da URL (ex: ?tipo=material)
     filtro_tipo = request.args.get('tipo')
     
+    papeis = papeis_na_comunidade(comunidade)
+
+    antes = request.args.get('antes', type=int)
+
     tem_acesso = True
-    if comunidade.tipo_acesso == 'Restrito' and current_user not in comunidade.membros:
+    proximo = None
+    if comunidade.tipo_acesso == 'Restrito' and not papeis.membro:
         tem_acesso = False
         topicos = []
     else:
-        # Query Base
-        query = Topico.query.filter_by(comunidade_id=comunidade.id)
-        
-        # Aplica Filtros
-        if filtro_tipo == 'enquete':
-            query = query.filter(Topico.tipo_post == 'enquete')
-        elif filtro_tipo == 'material':
-            # Pega tipo 'material' OU posts que tenham anexo de material
-            query = query.filter(or_(Topico.tipo_post == 'material', Topico.material_id != None))
-        elif filtro_tipo == 'midia':
-            # Pega posts com imagem/video ou tipo 'geral' com imagem
-            query = query.filter(Topico.imagem_post != None)
-            
-        # Ordenação: FIXADOS PRIMEIRO, depois os mais recentes
-        topicos = query.order_by(desc(Topico.fixado), desc(Topico.criado_em)).all()
-    
-    # ... (O RESTO DA FUNÇÃO CONTINUA IGUAL: likes, salvos, etc...)
-    likes_usuario = [l.topico_id for l in PostLike.query.filter_by(user_id=current_user.id).all()]
-    salvos_usuario = [s.topico_id for s in PostSalvo.query.filter_by(user_id=current_user.id).all()]
-    likes_respostas_usuario = [l.resposta_id for l in RespostaLike.query.filter_by(user_id=current_user.id).all()]
-    
-    votos_usuario = []
-    if tem_acesso:
-        ids_opcoes_votadas = db.session.query(EnqueteVoto.opcao_id).filter(EnqueteVoto.user_id == current_user.id).all()
-        votos_usuario = [v[0] for v in ids_opcoes_votadas]
-
+        # Fixados primeiro (só na 1ª página), depois uma página dos mais recentes
+        fixados, recentes, proximo = feed_da_comunidade(comunidade.id, filtro_tipo, antes)
+        topicos = fixados + recentes
+
+    # Curtidas/salvos/votos do usuário só dos tópicos desta página
+    # (os comentários vêm sob demanda, por respostas_do_topico)
+    ids_topicos = [t.id for t in topicos]
+    likes_usuario, salvos_usuario, votos_usuario = [], [], []
+    if ids_topicos:
+        likes_usuario = [l.topico_id for l in PostLike.query.filter(PostLike.user_id == current_user.id, PostLike.topico_id.in_(ids_topicos))]
+        salvos_usuario = [s.topico_id for s in PostSalvo.query.filter(PostSalvo.user_id == current_user.id, PostSalvo.topico_id.in_(ids_topicos))]
+        votos_usuario = votos_do_usuario(current_user.id, ids_topicos)
     solicitacao_pendente = False
     if not tem_acesso:
         if SolicitacaoParticipacao.query.filter_by(user_id=current_user.id, comunidade_id=comunidade.id).first():
@@ -369,11 +374,13 @@ def ver_comunidade(comunidade_id):
 
     return render_template('tela_comunidade_detalhe.html', 
         comunidade=comunidade, topicos=topicos, likes_usuario=likes_usuario, 
-        salvos_usuario=salvos_usuario, likes_respostas_usuario=likes_respostas_usuario, 
+        salvos_usuario=salvos_usuario, contagem_respostas=contar_respostas(ids_topicos), 
         tem_acesso=tem_acesso, solicitacao_pendente=solicitacao_pendente, 
+        papeis=papeis, moderadores_ids=ids_moderadores(comunidade),
         sugestoes=sugestoes, votos_usuario=votos_usuario, 
         lista_noticias=recent_noticias, lista_materiais=recent_materiais,
-        filtro_atual=filtro_tipo # Passamos o filtro para o template saber qual botão pintar
+        filtro_atual=filtro_tipo, # Passamos o filtro para o template saber qual botão pintar
+        antes=antes, proximo=proximo
     )
 
     
@@ -388,10 +395,7 @@ def configurar_comunidade(comunidade_id):
     comunidade = Comunidade.query.get_or_404(comunidade_id)
     
     # 1. Verificação de Permissões (Dono, Mod ou Admin)
-    eh_dono = (comunidade.criador_id == current_user.id)
-    eh_mod = (current_user in comunidade.moderadores)
-    
-    if not eh_dono and not eh_mod and not current_user.is_admin:
+    if not pode_moderar(comunidade) and not current_user.is_admin:
         flash('Você não tem permissão para configurar esta comunidade.', 'danger')
         return redirect(url_for('main.ver_comunidade', comunidade_id=comunidade.id))
 
@@ -466,8 +470,8 @@ def configurar_comunidade(comunidade_id):
     logs = AuditLog.query.filter_by(comunidade_id=comunidade.id).order_by(desc(AuditLog.data)).limit(20).all()
     
     stats = {
-        'membros': comunidade.membros.count(),
-        'posts': len(comunidade.topicos)
+        'membros': comunidade.membros_count,
+        'posts': comunidade.topicos_count
     }
 
     return render_template('tela_comunidade_config.html', 
@@ -475,14 +479,15 @@ def configurar_comunidade(comunidade_id):
                            solicitacoes=solicitacoes,
                            tags=tags, 
                            logs=logs,
-                           stats=stats)
+                           stats=stats,
+                           moderadores_ids=ids_moderadores(comunidade))
 
 
 @main_bp.route('/c/<int:comunidade_id>/tags/criar', methods=['POST'])
 @login_required
 def criar_tag(comunidade_id):
     comunidade = Comunidade.query.get_or_404(comunidade_id)
-    if current_user not in comunidade.moderadores: return redirect(request.referrer)
+    if not pode_moderar(comunidade): return redirect(request.referrer)
     
     nome = request.form.get('nome_tag')
     cor = request.form.get('cor_tag')
@@ -497,7 +502,7 @@ def criar_tag(comunidade_id):
 @login_required
 def excluir_tag(comunidade_id, tag_id):
     tag = ComunidadeTag.query.get_or_404(tag_id)
-    if current_user in tag.comunidade.moderadores:
+    if pode_moderar(tag.comunidade):
         db.session.delete(tag)
         db.session.commit()
     return redirect(url_for('main.configurar_comunidade', comunidade_id=comunidade_id))
@@ -513,7 +518,7 @@ def promover_moderador(comunidade_id, user_id):
         flash('Apenas o dono pode gerenciar moderadores.', 'danger')
         return redirect(url_for('main.configurar_comunidade', comunidade_id=comunidade_id))
         
-    if alvo not in comunidade.moderadores:
+    if not papeis_na_comunidade(comunidade, alvo).moderador:
         comunidade.moderadores.append(alvo)
         registrar_log(comunidade.id, f"Promoveu {alvo.name}")
         flash(f'{alvo.name} agora é moderador!', 'success')
@@ -531,7 +536,7 @@ def promover_moderador(comunidade_id, user_id):
 def gerenciar_solicitacao(comunidade_id, sol_id, acao):
     comunidade = Comunidade.query.get_or_404(comunidade_id)
     
-    if current_user not in comunidade.moderadores and not current_user.is_admin:
+    if not pode_moderar(comunidade) and not current_user.is_admin:
         return redirect(url_for('main.ver_comunidade', comunidade_id=comunidade_id))
         
     solicitacao = SolicitacaoParticipacao.query.get_or_404(sol_id)
@@ -539,9 +544,11 @@ def gerenciar_solicitacao(comunidade_id, sol_id, acao):
     if acao == 'aceitar':
         usuario = User.query.get(solicitacao.user_id)
         comunidade.membros.append(usuario)
+        ajustar_contadores(comunidade.id, membros=1)
         registrar_log(comunidade.id, f"Aceitou {usuario.name}")
         db.session.delete(solicitacao)
         db.session.commit()
+        invalidar_feed(usuario.id)
         flash(f'{usuario.name} aceito!', 'success')
     elif acao == 'recusar':
         db.session.delete(solicitacao)
@@ -558,49 +565,77 @@ def gerenciar_solicitacao(comunidade_id, sol_id, acao):
 @main_bp.route('/forum')
 @login_required
 def tela_foruns():
-    termo_pesquisa = request.args.get('q')
+    termo_pesquisa = (request.args.get('q') or '').strip()
     ordenar_por = request.args.get('ordenarPor')
     filtro = request.args.get('filtro')
+    pagina = request.args.get('pagina', 1, type=int)
 
-    # Query Base: Tópicos + Join com Comunidade
-    query = Topico.query.outerjoin(Comunidade)
-    
-    # --- FILTROS DE PRIVACIDADE E TIPO ---
-    query = query.filter(
-        # 1. Privacidade: Mostra posts Globais (sem comunidade) OU de Comunidades Públicas
-        or_(
-            Topico.comunidade_id == None,
-            Comunidade.tipo_acesso != 'Restrito'
+    # Busca textual (índice de busca, ranking e trecho destacado), paginada
+    resultado_busca = None
+    if termo_pesquisa:
+        resultado_busca = buscar_topicos(
+            termo_pesquisa, pagina,
+            ordem=ordenar_por or 'relevancia',
+            salvos_de=current_user.id if filtro == 'salvos' else None,
+            comunidades_de=current_user.id if filtro == 'meu_feed' else None
         )
-    ).filter(
-        # 2. Tipo: NÃO MOSTRAR Enquetes no feed global (Regra de Negócio)
-        Topico.tipo_post != 'enquete'
-    )
 
-    # Filtros de Pesquisa
-    if termo_pesquisa:
-        query = query.filter(or_(
-            Topico.titulo.ilike(f'%{termo_pesquisa}%'),
-            Topico.conteudo.ilike(f'%{termo_pesquisa}%')
-        ))
+    antes = request.args.get('antes', type=int)
+    trechos_busca, tem_proxima, proximo = {}, False, None
+    if filtro == 'meu_feed' and not termo_pesquisa:
+        # Comunidades seguidas: uma leitura por comunidade + merge (página em cache curto)
+        topicos, proximo = feed_do_usuario(current_user.id, antes)
+    elif termo_pesquisa:
+        if filtro == 'meu_feed':
+            # Busca dentro do "Meu feed": comunidades seguidas, sem enquetes
+            query = Topico.query.filter(
+                Topico.comunidade_id.in_(
+                    db.session.query(membros_comunidade.c.comunidade_id)
+                    .filter(membros_comunidade.c.user_id == current_user.id)
+                ),
+                Topico.tipo_post != 'enquete'
+            )
+        else:
+            # Privacidade (posts globais ou de comunidades públicas) e sem enquetes
+            query = visiveis_no_forum(Topico.query)
 
-    # Filtro de Salvos
-    if filtro == 'salvos':
-        query = query.join(PostSalvo).filter(PostSalvo.user_id == current_user.id)
+        if resultado_busca is not None:
+            ids_encontrados, trechos_busca, tem_proxima = resultado_busca
+            query = query.filter(Topico.id.in_(ids_encontrados))
+        else:
+            # Banco sem backend de busca: cai no LIKE
+            query = query.filter(or_(
+                Topico.titulo.ilike(f'%{termo_pesquisa}%'),
+                Topico.conteudo.ilike(f'%{termo_pesquisa}%')
+            ))
 
-    # Ordenação
-    if ordenar_por == 'relevancia':
-        query = query.outerjoin(PostLike).group_by(Topico.id).order_by(desc(func.count(PostLike.id)))
-    else:
-        query = query.order_by(desc(Topico.criado_em))
+        # Filtro de Salvos
+        if filtro == 'salvos':
+            query = query.join(PostSalvo).filter(PostSalvo.user_id == current_user.id)
 
-    topicos = query.all()
+        if ordenar_por == 'relevancia':
+            query = query.order_by(desc(Topico.relevancia), desc(Topico.id))
+        else:
+            query = query.order_by(desc(Topico.criado_em))
+
+        topicos = query.all()
+        if resultado_busca is not None:
+            # Mantém a ordem do ranking da busca
+            posicao = {topico_id: i for i, topico_id in enumerate(ids_encontrados)}
+            topicos.sort(key=lambda t: posicao[t.id])
+    else:
+        # Feed global em páginas por keyset; "relevancia" é a nota pré-calculada
+        # (likes, respostas, salvos e idade), ver app/relevancia.py
+        topicos, proximo = feed_do_forum(
+            ordenar_por, antes,
+            salvos_de=current_user.id if filtro == 'salvos' else None
+        )
 
     likes_usuario = [l.topico_id for l in PostLike.query.filter_by(user_id=current_user.id).all()]
     salvos_usuario = [s.topico_id for s in PostSalvo.query.filter_by(user_id=current_user.id).all()]
-    
-    # Carrega notificações
-    notificacoes = Notificacao.query.filter_by(usuario_id=current_user.id, lida=False).order_by(desc(Notificacao.data_criacao)).limit(30).all()
+
+    # O badge de notificações usa current_user.notificacoes_nao_lidas
+    # e a lista é carregada sob demanda pela API (/api/notificacoes)
 
     # Carrega comunidades do usuário para o modal de postagem
     comunidades = current_user.comunidades_seguidas
@@ -611,17 +646,23 @@ def tela_foruns():
         topicos=topicos,
         likes_usuario=likes_usuario,
         salvos_usuario=salvos_usuario,
-        notificacoes=notificacoes,
+        contagem_respostas=contar_respostas([t.id for t in topicos]),
         votos_usuario=[],
         comunidades=comunidades,
-        filtro_selecionado=filtro
+        filtro_selecionado=filtro,
+        termo_pesquisado=termo_pesquisa,
+        ordenacao_selecionada=ordenar_por,
+        trechos_busca=trechos_busca,
+        pagina=pagina,
+        tem_proxima=tem_proxima,
+        proximo=proximo
     )
 
 @main_bp.route('/forum/notificacoes/mark_all_seen', methods=['POST'])
 @login_required
 def marcar_todas_notificacoes_lidas_forum():
     try:
-        Notificacao.query.filter_by(usuario_id=current_user.id, lida=False).update({'lida': True})
+        marcar_todas_lidas(current_user.id)
         db.session.commit()
         flash('Todas as notificações foram marcadas como vistas.', 'success')
     except Exception as e:
@@ -634,7 +675,7 @@ def marcar_todas_notificacoes_lidas_forum():
 @login_required
 def marcar_todas_notificacoes_lidas():
     try:
-        Notificacao.query.filter_by(usuario_id=current_user.id, lida=False).update({'lida': True})
+        marcar_todas_lidas(current_user.id)
         db.session.commit()
         flash('Todas as notificações foram marcadas como vistas.', 'success')
     except Exception as e:
@@ -740,7 +781,12 @@ def criar_post():
     )
 
     db.session.add(novo_topico)
+    if comunidade_alvo:
+        ajustar_contadores(comunidade_alvo.id, topicos=1, atividade=True)
     db.session.commit()
+    if comunidade_alvo:
+        # O autor vê o próprio post no "Meu feed" na hora (os demais, em até FEED_TTL)
+        invalidar_feed(current_user.id)
 
     # 4. SALVAR OPÇÕES DA ENQUETE (Se for enquete)
     if tipo_selecionado == 'enquete':
@@ -751,6 +797,8 @@ def criar_post():
                 if verificar_automod(texto_opt, comunidade_alvo):
                     # Se tiver, apaga o tópico recém criado e avisa
                     db.session.delete(novo_topico)
+                    if comunidade_alvo:
+                        ajustar_contadores(comunidade_alvo.id, topicos=-1)
                     db.session.commit()
                     flash('🚫 Postagem bloqueada: Uma das opções da enquete contém palavras proibidas.', 'danger')
                     return redirect(request.referrer)
@@ -759,6 +807,19 @@ def criar_post():
                 db.session.add(nova_opcao)
         db.session.commit()
 
+        # Nova enquete numa comunidade: avisa os membros em segundo plano.
+        # Várias enquetes seguidas na mesma comunidade viram uma notificação só.
+        if comunidade_alvo:
+            enfileirar(
+                notificar_membros_comunidade,
+                comunidade_alvo.id,
+                f"📊 Nova enquete em {comunidade_alvo.nome}: {titulo}",
+                url_for('main.ver_comunidade', comunidade_id=comunidade_alvo.id),
+                chave=f'enquete:comunidade:{comunidade_alvo.id}',
+                mensagem_agrupada=f"📊 Nova enquete em {comunidade_alvo.nome}: {titulo} (e mais {{outros}} desde sua última visita)",
+                excluir_ids=[current_user.id]
+            )
+
     flash('Publicação criada com sucesso!', 'success')
     if comunidade_id:
         return redirect(url_for('main.ver_comunidade', comunidade_id=comunidade_id))
@@ -793,7 +854,11 @@ def comentar_post(topico_id):
         flash('O comentário não pode ficar vazio.', 'warning')
         return redirect(request.referrer)
 
-    pid = int(parent_id) if parent_id else None
+    try:
+        pid = pai_da_resposta(topico.id, parent_id) if parent_id else None
+    except ValueError:
+        flash('O comentário que você tentou responder não existe mais.', 'warning')
+        return redirect(request.referrer)
 
     nova_resposta = Resposta(
         conteudo=conteudo if conteudo else "",
@@ -816,28 +881,40 @@ def comentar_post(topico_id):
             flash(f'Erro ao salvar imagem: {e}', 'danger')
 
     db.session.add(nova_resposta)
+    ajustar_contadores(topico.comunidade_id, atividade=True)
 
     # Notificação (Versão Otimizada)
     try:
         link_destino = url_for('main.ver_comunidade', comunidade_id=topico.comunidade_id) if topico.comunidade_id else url_for('main.tela_foruns')
 
         # Se for resposta a um comentário
+        # (várias respostas seguidas viram uma só: "Fulano respondeu (e mais 3...)")
         if pid:
             comentario_pai = Resposta.query.get(pid)
             if comentario_pai and comentario_pai.autor_id != current_user.id:
-                db.session.add(Notificacao(
-                    mensagem=f"{current_user.name} respondeu seu comentário.",
-                    link_url=link_destino,
-                    usuario_id=comentario_pai.autor_id
-                ))
+                notificar_usuarios(
+                    [comentario_pai.autor_id],
+                    f"{current_user.name} respondeu seu comentário.",
+                    link_destino,
+                    chave=f'resposta:comentario:{pid}',
+                    mensagem_agrupada=f"{current_user.name} respondeu seu comentário (e mais {{outros}} resposta(s) não lida(s))."
+                )
 
         # Se for comentário no post (apenas avisa o dono do post)
         elif topico.autor_id != current_user.id:
-            db.session.add(Notificacao(
-                mensagem=f"{current_user.name} comentou no seu post.",
-                link_url=link_destino,
-                usuario_id=topico.autor_id
-            ))
+            notificar_usuarios(
+                [topico.autor_id],
+                f"{current_user.name} comentou no seu post.",
+                link_destino,
+                chave=f'comentario:topico:{topico.id}',
+                mensagem_agrupada=f"{current_user.name} comentou no seu post (e mais {{outros}} comentário(s) não lido(s))."
+            )
+
+        publicar_evento_topico(topico, 'resposta', {
+            'autor': current_user.name,
+            'parent_id': pid,
+            'incremento': 1
+        })
 
         db.session.commit()
         flash('Comentário enviado!', 'success')
@@ -849,6 +926,49 @@ def comentar_post(topico_id):
     return redirect(request.referrer)
 
 
+def _likes_do_usuario_em(respostas):
+    """Ids das respostas (entre as dadas) que o usuário atual curtiu."""
+    ids = [r.id for r in respostas]
+    if not ids:
+        return []
+    return [l.resposta_id for l in RespostaLike.query.filter(RespostaLike.user_id == current_user.id, RespostaLike.resposta_id.in_(ids))]
+
+
+@main_bp.route('/forum/<int:topico_id>/respostas')
+@login_required
+def respostas_do_topico(topico_id):
+    """
+    Fragmento HTML com os comentários de um tópico, pedido quando o usuário
+    abre os comentários. ?apos=<id> traz a próxima página de threads e
+    ?raiz=<id> traz as respostas mais fundas de um comentário.
+    """
+    topico = Topico.query.get_or_404(topico_id)
+    if topico.comunidade and topico.comunidade.tipo_acesso == 'Restrito' and not eh_membro(topico.comunidade):
+        abort(403)
+
+    raiz_id = request.args.get('raiz', type=int)
+    apos = request.args.get('apos', type=int)
+    proximo = None
+    if raiz_id:
+        raiz = Resposta.query.filter_by(id=raiz_id, topico_id=topico.id).first_or_404()
+        arvore, respostas = subarvore(raiz)
+        raizes = arvore[0].filhos_carregados if arvore else []
+    else:
+        raizes, respostas, proximo = threads_do_topico(topico.id, apos)
+
+    return render_template(
+        'partials/respostas.html',
+        topico=topico,
+        raizes=raizes,
+        raiz=raiz_id,
+        apos=apos,
+        proximo=proximo,
+        likes_respostas_usuario=_likes_do_usuario_em(respostas),
+        moderadores_ids=ids_moderadores(topico.comunidade),
+        permitir_resposta=request.args.get('responder') == '1'
+    )
+
+
 @main_bp.route('/comentario/<int:resposta_id>/like', methods=['POST'])
 @login_required
 def like_comentario(resposta_id):
@@ -879,6 +999,8 @@ def like_post(topico_id):
         novo_like = PostLike(user_id=current_user.id, topico_id=topico.id)
         db.session.add(novo_like)
 
+    publicar_evento_topico(topico, 'like', {'incremento': -1 if like_existente else 1})
+
     db.session.commit()
     return redirect(request.referrer)
 
@@ -907,12 +1029,13 @@ def excluir_post(topico_id):
     topico = Topico.query.get_or_404(topico_id)
 
     # Permissão: Admin, Dono do Post ou Moderador da Comunidade
-    eh_mod = topico.comunidade_id and (current_user in topico.comunidade.moderadores)
+    eh_mod = topico.comunidade_id and pode_moderar(topico.comunidade)
 
     if not current_user.is_admin and topico.autor_id != current_user.id and not eh_mod:
         flash('Você não tem permissão para fazer isso.', 'danger')
         return redirect(request.referrer)
 
+    ajustar_contadores(topico.comunidade_id, topicos=-1)
     db.session.delete(topico)
     db.session.commit()
 
@@ -941,6 +1064,7 @@ def denunciar_post(topico_id):
     try:
         db.session.add(nova_denuncia)
         db.session.commit()
+        invalidar_contadores()
         flash('Denúncia enviada com sucesso.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -1197,6 +1321,7 @@ def resolver_denuncia(denuncia_id):
 
     try:
         db.session.commit()
+        invalidar_contadores()
         flash('Denúncia resolvida.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -1655,6 +1780,7 @@ def suporte():
         try:
             db.session.add(nova_denuncia)
             db.session.commit()
+            invalidar_contadores()
             flash('Denúncia enviada com sucesso.', 'success')
         except Exception as e:
             db.session.rollback()
@@ -1687,12 +1813,15 @@ def suporte():
 @main_bp.route('/tela_admin')
 @login_required
 def tela_admin():
+    # Todos os contadores do topo vêm de uma consulta só (com cache curto)
+    contadores = contadores_painel()
+
     if current_user.is_admin:
         # Pega a quantidade exata de usuarios cadastrados
-        users_count = User.query.count()
+        users_count = contadores["usuarios"]
 
-        # Usuários normais
-        usuarios = User.query.filter_by(is_admin=False).all()
+        # A lista de usuários não vem mais no template: a busca do painel
+        # consulta /api/admin/usuarios (paginado) conforme o admin digita
 
         # ----- SISTEMA DE FILTRO -----
     filtro = request.args.get("filtro", "aberto")  
@@ -1707,7 +1836,11 @@ def tela_admin():
     else:
         query = Denuncia.query
 
-    total = query.count()
+    # O total do filtro atual também sai dos contadores (sem outro COUNT)
+    total = {
+        "aberto": contadores["denuncias_abertas"],
+        "resolvido": contadores["denuncias_resolvidas"]
+    }.get(filtro, contadores["denuncias"])
 
     # Paginação
     denuncias = query.order_by(Denuncia.data_envio.desc()) \
@@ -1718,8 +1851,8 @@ def tela_admin():
     total_paginas = max(1, (total + por_pagina - 1) // por_pagina)
 
     # Dados gerais
-    total_abertas = Denuncia.query.filter_by(status='Recebida').count()
-    total_resolvidas = Denuncia.query.filter_by(status='Resolvida').count()
+    total_abertas = contadores["denuncias_abertas"]
+    total_resolvidas = contadores["denuncias_resolvidas"]
     total_denuncias = total_abertas + total_resolvidas
 
     # Limitador de caracteres
@@ -1730,7 +1863,6 @@ def tela_admin():
     return render_template(
         "tela_admin.html",
         users_count=users_count,
-        usuarios=usuarios,
         denuncias=denuncias,
         filtro=filtro,
         page=page,
@@ -1747,21 +1879,12 @@ def tela_admin():
 @login_required
 def votar_enquete(opcao_id):
     opcao = EnqueteOpcao.query.get_or_404(opcao_id)
-    topico = opcao.topico
     
-    # Verifica se usuário já votou NESTE tópico (qualquer opção dele)
-    voto_existente = EnqueteVoto.query.join(EnqueteOpcao).filter(
-        EnqueteVoto.user_id == current_user.id,
-        EnqueteOpcao.topico_id == topico.id
-    ).first()
-    
-    if voto_existente:
-        flash('Você já votou nesta enquete.', 'warning')
-    else:
-        novo_voto = EnqueteVoto(user_id=current_user.id, opcao_id=opcao.id)
-        db.session.add(novo_voto)
-        db.session.commit()
+    # Um INSERT só: a restrição única (usuário, tópico) barra o segundo voto
+    if votar(opcao, current_user.id):
         flash('Voto computado!', 'success')
+    else:
+        flash('Você já votou nesta enquete.', 'warning')
         
     return redirect(request.referrer)
 
@@ -1771,13 +1894,24 @@ def fixar_post(topico_id):
     topico = Topico.query.get_or_404(topico_id)
     
     # Apenas moderadores ou dono da comunidade podem fixar
-    if not topico.comunidade or (current_user not in topico.comunidade.moderadores and current_user.id != topico.comunidade.criador_id):
+    if not topico.comunidade or not pode_moderar(topico.comunidade):
         flash('Sem permissão.', 'danger')
         return redirect(request.referrer)
     
     # Inverte o status (se ta fixado, desafixa e vice-versa)
     topico.fixado = not topico.fixado
     db.session.commit()
+
+    # Avisa os membros em segundo plano (comunidades grandes não travam o moderador)
+    if topico.fixado:
+        enfileirar(
+            notificar_membros_comunidade,
+            topico.comunidade_id,
+            f"📌 Novo post fixado em {topico.comunidade.nome}: {topico.titulo}",
+            url_for('main.ver_comunidade', comunidade_id=topico.comunidade_id),
+            chave=f'fixado:topico:{topico.id}',
+            excluir_ids=[current_user.id]
+        )
     
     msg = 'Tópico fixado no topo!' if topico.fixado else 'Tópico desafixado.'
     flash(msg, 'success')
@@ -1792,26 +1926,31 @@ def ver_post_individual(topico_id):
     
     # Verifica acesso se for comunidade restrita
     if topico.comunidade and topico.comunidade.tipo_acesso == 'Restrito':
-        if current_user not in topico.comunidade.membros:
+        if not eh_membro(topico.comunidade):
             flash('Este post é privado.', 'danger')
             return redirect(url_for('main.tela_inicial'))
 
     likes_usuario = [l.topico_id for l in PostLike.query.filter_by(user_id=current_user.id).all()]
-    likes_respostas_usuario = [l.resposta_id for l in RespostaLike.query.filter_by(user_id=current_user.id).all()]
+
+    # Árvore de comentários inteira numa consulta (ordenada pelo caminho materializado)
+    respostas_raiz, respostas = arvore_completa(topico.id)
+    likes_respostas_usuario = _likes_do_usuario_em(respostas)
     
-    votos_usuario = []
-    ids = db.session.query(EnqueteVoto.opcao_id).filter(EnqueteVoto.user_id == current_user.id).all()
-    votos_usuario = [v[0] for v in ids]
+    votos_usuario = votos_do_usuario(current_user.id, [topico.id])
 
     return render_template(
         'tela_post.html', 
         topico=topico,
+        respostas_raiz=respostas_raiz,
+        total_respostas=len(respostas),
         likes_usuario=likes_usuario,
         likes_respostas_usuario=likes_respostas_usuario,
-        votos_usuario=votos_usuario
+        votos_usuario=votos_usuario,
+        moderadores_ids=ids_moderadores(topico.comunidade)
     )
 
 @main_bp.route('/noticia/<int:id>')
+@politica_cache(PUBLICO, max_age=300)
 def ver_noticia(id):
     # Busca a notícia pelo ID. Se não achar, dá erro 404.
     noticia = Noticia.query.get_or_404(id)
@@ -0,0 +1,56 @@
+# app/tarefas.py
+"""
+Execução de tarefas em segundo plano.
+
+Trabalho que não precisa acontecer antes da resposta (ex: notificar todos os
+membros de uma comunidade) vai para um pool de threads do próprio processo,
+rodando dentro de um app context com a sua própria sessão do banco.
+
+Com `TAREFAS_SINCRONAS = True` (testes, comandos de CLI) a tarefa roda na hora,
+na mesma thread.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _obter_executor(app):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=app.config.get('TAREFAS_MAX_THREADS', 2),
+            thread_name_prefix='siif-tarefa'
+        )
+    return _executor
+
+
+def _executar(app, funcao, args, kwargs):
+    with app.app_context():
+        try:
+            funcao(*args, **kwargs)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception('Erro na tarefa em segundo plano %s', funcao.__name__)
+
+
+def enfileirar(funcao, *args, **kwargs):
+    """
+    Agenda `funcao(*args, **kwargs)` para rodar fora da requisição.
+    A tarefa faz commit no final (ou rollback se der erro). Passe apenas ids e
+    valores simples: objetos do ORM da requisição não valem na outra sessão.
+    """
+    app = current_app._get_current_object()
+
+    if app.config.get('TAREFAS_SINCRONAS'):
+        _executar(app, funcao, args, kwargs)
+        return None
+
+    return _obter_executor(app).submit(_executar, app, funcao, args, kwargs)
@@ -0,0 +1,204 @@
+# app/tempo_real.py
+"""
+Pub/sub em memória para o stream de eventos em tempo real (SSE).
+
+Cada página aberta do fórum/comunidade assina alguns canais
+('usuario:<id>', 'forum', 'comunidade:<id>') e recebe só os deltas
+(novo comentário, like, notificação) em vez de recarregar a página inteira.
+
+O barramento vive no processo. No PostgreSQL com o tempo real ligado os
+eventos passam por NOTIFY/LISTEN (canal CANAL_POSTGRES): cada worker do
+gunicorn escuta numa thread e entrega aos clientes conectados nele, então um
+comentário salvo no worker 1 chega a quem está no worker 2. No SQLite não há
+isso: cada worker só entrega os seus eventos (rodar com um worker só).
+
+Para conexões longas use um worker assíncrono (`gunicorn -k gevent`, ver
+gunicorn.conf.py); com o monkey patch do gevent a fila e a thread abaixo
+passam a ser cooperativas sem nenhuma mudança aqui.
+"""
+import json
+import logging
+import os
+import queue
+import select
+import threading
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+CANAL_POSTGRES = 'siif_tempo_real'
+
+# Espera máxima do select() da thread de escuta (segundos)
+ESPERA_OUVINTE = 30
+
+# Pausa antes de reconectar depois de um erro na escuta
+PAUSA_RECONEXAO = 5
+
+
+class Assinatura:
+    """Fila de eventos de uma conexão SSE."""
+
+    def __init__(self, canais, tamanho_fila):
+        self.canais = set(canais)
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+
+    def proximo(self, timeout):
+        """Retorna o próximo evento (nome, dados) ou None se estourar o timeout."""
+        try:
+            return self.fila.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class Barramento:
+    def __init__(self, tamanho_fila=100):
+        self._lock = threading.Lock()
+        self._assinantes = {}  # canal -> set(Assinatura)
+        self.tamanho_fila = tamanho_fila
+        # True: eventos saem por NOTIFY e chegam pela OuvintePostgres (init_app)
+        self.distribuido = False
+
+    @property
+    def total_conexoes(self):
+        with self._lock:
+            return len({a for assinantes in self._assinantes.values() for a in assinantes})
+
+    def assinar(self, canais):
+        assinatura = Assinatura(canais, self.tamanho_fila)
+        with self._lock:
+            for canal in assinatura.canais:
+                self._assinantes.setdefault(canal, set()).add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            for canal in assinatura.canais:
+                assinantes = self._assinantes.get(canal)
+                if assinantes:
+                    assinantes.discard(assinatura)
+                    if not assinantes:
+                        del self._assinantes[canal]
+
+    def publicar(self, canal, nome, dados):
+        with self._lock:
+            assinantes = list(self._assinantes.get(canal, ()))
+
+        for assinatura in assinantes:
+            try:
+                assinatura.fila.put_nowait((nome, dados))
+            except queue.Full:
+                # Cliente lento: descarta o evento em vez de travar quem publicou
+                pass
+
+
+barramento = Barramento()
+
+
+# ===================================================================
+# ENTRE WORKERS (POSTGRESQL NOTIFY/LISTEN)
+# ===================================================================
+
+class OuvintePostgres(threading.Thread):
+    """Thread (greenlet, com gevent) que repassa os NOTIFY ao barramento deste processo."""
+
+    def __init__(self, engine):
+        super().__init__(name='siif-tempo-real', daemon=True)
+        self.engine = engine
+
+    def run(self):
+        while True:
+            try:
+                self._escutar()
+            except Exception:
+                logger.exception('Escuta do tempo real caiu; reconectando em %ss', PAUSA_RECONEXAO)
+                time.sleep(PAUSA_RECONEXAO)
+
+    def _escutar(self):
+        # Conexão própria, fora do pool: fica presa no LISTEN enquanto o processo viver
+        conexao = self.engine.raw_connection()
+        conexao.detach()
+        try:
+            driver = conexao.driver_connection
+            driver.autocommit = True
+            with driver.cursor() as cursor:
+                cursor.execute(f'LISTEN {CANAL_POSTGRES}')
+
+            while True:
+                if select.select([driver], [], [], ESPERA_OUVINTE) == ([], [], []):
+                    continue
+                driver.poll()
+                while driver.notifies:
+                    canal, nome, dados = json.loads(driver.notifies.pop(0).payload)
+                    barramento.publicar(canal, nome, dados)
+        finally:
+            conexao.close()
+
+
+_ouvinte = {"pid": None}
+_lock_ouvinte = threading.Lock()
+
+
+def garantir_ouvinte():
+    """
+    Sobe a escuta deste processo na primeira conexão SSE. Não sobe no
+    create_app: o gunicorn faz fork depois dele e a thread não iria junto.
+    """
+    if not barramento.distribuido or _ouvinte["pid"] == os.getpid():
+        return
+    with _lock_ouvinte:
+        if _ouvinte["pid"] != os.getpid():
+            OuvintePostgres(db.engine).start()
+            _ouvinte["pid"] = os.getpid()
+
+
+def init_app(app):
+    barramento.distribuido = (
+        app.config['TEMPO_REAL_ATIVO']
+        and app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql')
+    )
+
+
+def formatar_sse(nome, dados):
+    """Formata um evento no protocolo text/event-stream."""
+    return f"event: {nome}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+# ===================================================================
+# PUBLICAÇÃO SÓ DEPOIS DO COMMIT
+# ===================================================================
+
+def publicar_apos_commit(canal, nome, dados):
+    """
+    Agenda a publicação do evento para quando a transação atual for confirmada.
+    Se houver rollback o evento é descartado (ninguém vê um comentário que não existe).
+    """
+    db.session.info.setdefault('eventos_tempo_real', []).append((canal, nome, dados))
+
+
+@event.listens_for(Session, 'before_commit')
+def _notificar_workers(session):
+    # NOTIFY é transacional: só é entregue (a todos os workers, inclusive este)
+    # se o commit passar, como o after_commit abaixo
+    if not barramento.distribuido:
+        return
+    for canal, nome, dados in session.info.pop('eventos_tempo_real', []):
+        session.execute(text('SELECT pg_notify(:canal, :carga)'), {
+            "canal": CANAL_POSTGRES,
+            "carga": json.dumps([canal, nome, dados], ensure_ascii=False, default=str)
+        })
+
+
+@event.listens_for(Session, 'after_commit')
+def _publicar_eventos_pendentes(session):
+    for canal, nome, dados in session.info.pop('eventos_tempo_real', []):
+        barramento.publicar(canal, nome, dados)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_eventos_pendentes(session):
+    session.info.pop('eventos_tempo_real', None)
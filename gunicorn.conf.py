@@ -0,0 +1,26 @@
+# gunicorn.conf.py
+"""
+Configuração do gunicorn (lida automaticamente quando ele roda na raiz do projeto).
+
+Com workers gevent (`-k gevent`, ver README) o psycopg2 precisa do patch do
+psycogreen: sem ele cada consulta ao PostgreSQL bloqueia todos os greenlets
+do worker, inclusive as conexões SSE abertas.
+"""
+import os
+import shutil
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+
+def on_starting(server):
+    # Métricas por worker (app/metricas.py): os contadores recomeçam a cada subida
+    # do servidor, senão os arquivos de pids antigos somariam para sempre
+    diretorio = os.environ.get('METRICAS_DIRETORIO', os.path.join(RAIZ, 'instance', 'metricas'))
+    if diretorio:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def post_fork(server, worker):
+    if 'gevent' in server.cfg.worker_class_str.lower():
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
@@ -51,6 +51,20 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    """Filtro do autogenerate/check: o que fica de fora da comparação."""
+    # Índice de busca do fórum (app/busca.py): criado pelo `flask siif init`, fora
+    # do model. No SQLite inclui as tabelas internas do FTS5 (busca_forum_data...)
+    if type_ == 'table' and name.startswith('busca_forum'):
+        return False
+
+    # Índices do model só para outro banco (ex: .ddl_if(dialect='postgresql'))
+    ddl_if = getattr(object, '_ddl_if', None)
+    if type_ == 'index' and not reflected and ddl_if is not None and ddl_if.dialect:
+        return ddl_if.dialect == context.get_context().dialect.name
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +79,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -95,6 +110,7 @@ def run_migrations_online():
         conf_args["process_revision_directives"] = process_revision_directives
 
     conf_args['render_as_batch'] = True
+    conf_args.setdefault('include_object', include_object)
 
     connectable = get_engine()
 
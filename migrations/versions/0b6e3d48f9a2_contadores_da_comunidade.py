@@ -0,0 +1,40 @@
+"""Contadores desnormalizados da comunidade (membros, tópicos, última atividade)
+
+Revision ID: 0b6e3d48f9a2
+Revises: f27c5a90b3d1
+Create Date: 2026-10-19 15:41:09.274116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b6e3d48f9a2'
+down_revision = 'f27c5a90b3d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('comunidade', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('membros_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('topicos_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('ultima_atividade_em', sa.DateTime(), nullable=True))
+
+    # Preenche com o que já existe (depois, `flask siif recalcular-comunidades` faz o mesmo)
+    op.execute(
+        'UPDATE comunidade SET '
+        'membros_count = (SELECT COUNT(*) FROM membros_comunidade '
+        'WHERE membros_comunidade.comunidade_id = comunidade.id), '
+        'topicos_count = (SELECT COUNT(*) FROM topico WHERE topico.comunidade_id = comunidade.id), '
+        'ultima_atividade_em = COALESCE((SELECT MAX(topico.criado_em) FROM topico '
+        'WHERE topico.comunidade_id = comunidade.id), comunidade.criado_em)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('comunidade', schema=None) as batch_op:
+        batch_op.drop_column('ultima_atividade_em')
+        batch_op.drop_column('topicos_count')
+        batch_op.drop_column('membros_count')
@@ -0,0 +1,65 @@
+"""Diretório de comunidades: nome normalizado, trigramas e índices de ordenação
+
+Revision ID: 1c8f4e27a5b3
+Revises: 0b6e3d48f9a2
+Create Date: 2026-10-19 16:20:37.905562
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+from unidecode import unidecode
+
+
+# revision identifiers, used by Alembic.
+revision = '1c8f4e27a5b3'
+down_revision = '0b6e3d48f9a2'
+branch_labels = None
+depends_on = None
+
+
+def _normalizar(texto):
+    # Mesma regra de app.comunidades.normalizar_nome (copiada: a migração não depende do app)
+    texto = unidecode(texto or '').lower()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', texto).split())
+
+
+def upgrade():
+    trigramas = op.create_table('comunidade_trigramas',
+        sa.Column('trigrama', sa.String(length=3), nullable=False),
+        sa.Column('comunidade_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['comunidade_id'], ['comunidade.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('trigrama', 'comunidade_id')
+    )
+
+    with op.batch_alter_table('comunidade', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('nome_normalizado', sa.String(length=100), nullable=True))
+        batch_op.create_index(batch_op.f('ix_comunidade_nome_normalizado'), ['nome_normalizado'], unique=False)
+        batch_op.create_index(batch_op.f('ix_comunidade_categoria'), ['categoria'], unique=False)
+        batch_op.create_index(batch_op.f('ix_comunidade_membros_count'), ['membros_count'], unique=False)
+        batch_op.create_index(batch_op.f('ix_comunidade_ultima_atividade_em'), ['ultima_atividade_em'], unique=False)
+
+    # Preenche o nome normalizado e os trigramas das comunidades existentes
+    conexao = op.get_bind()
+    comunidade = sa.table('comunidade', sa.column('id', sa.Integer), sa.column('nome', sa.String),
+                          sa.column('nome_normalizado', sa.String))
+    for comunidade_id, nome in conexao.execute(sa.select(comunidade.c.id, comunidade.c.nome)).all():
+        normalizado = _normalizar(nome)
+        conexao.execute(comunidade.update().where(comunidade.c.id == comunidade_id)
+                        .values(nome_normalizado=normalizado))
+        linhas = [{"trigrama": normalizado[i:i + 3], "comunidade_id": comunidade_id}
+                  for i in range(len(normalizado) - 2)]
+        if linhas:
+            op.bulk_insert(trigramas, list({l["trigrama"]: l for l in linhas}.values()))
+
+
+def downgrade():
+    with op.batch_alter_table('comunidade', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_comunidade_ultima_atividade_em'))
+        batch_op.drop_index(batch_op.f('ix_comunidade_membros_count'))
+        batch_op.drop_index(batch_op.f('ix_comunidade_categoria'))
+        batch_op.drop_index(batch_op.f('ix_comunidade_nome_normalizado'))
+        batch_op.drop_column('nome_normalizado')
+
+    op.drop_table('comunidade_trigramas')
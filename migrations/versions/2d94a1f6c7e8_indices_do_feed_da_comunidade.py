@@ -0,0 +1,28 @@
+"""Índices do feed da comunidade (keyset por data e fixados)
+
+Revision ID: 2d94a1f6c7e8
+Revises: 1c8f4e27a5b3
+Create Date: 2026-10-19 16:58:13.640271
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d94a1f6c7e8'
+down_revision = '1c8f4e27a5b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('topico', schema=None) as batch_op:
+        batch_op.create_index('ix_topico_comunidade_criado_em_id', ['comunidade_id', 'criado_em', 'id'], unique=False)
+        batch_op.create_index('ix_topico_comunidade_fixado', ['comunidade_id', 'fixado'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('topico', schema=None) as batch_op:
+        batch_op.drop_index('ix_topico_comunidade_fixado')
+        batch_op.drop_index('ix_topico_comunidade_criado_em_id')
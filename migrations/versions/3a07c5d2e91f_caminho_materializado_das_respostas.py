@@ -0,0 +1,39 @@
+"""Caminho materializado das respostas (árvore de comentários numa consulta)
+
+Revision ID: 3a07c5d2e91f
+Revises: 2d94a1f6c7e8
+Create Date: 2026-10-19 17:34:50.118392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a07c5d2e91f'
+down_revision = '2d94a1f6c7e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('resposta', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('caminho', sa.String(length=400), nullable=True))
+        batch_op.create_index('ix_resposta_topico_caminho', ['topico_id', 'caminho'], unique=False)
+
+    # Preenche o caminho das respostas existentes (pais sempre têm id menor que os filhos)
+    conexao = op.get_bind()
+    resposta = sa.table('resposta', sa.column('id', sa.Integer), sa.column('parent_id', sa.Integer),
+                        sa.column('caminho', sa.String))
+    caminhos = {}
+    for resposta_id, parent_id in conexao.execute(
+            sa.select(resposta.c.id, resposta.c.parent_id).order_by(resposta.c.id)).all():
+        caminhos[resposta_id] = caminhos.get(parent_id, '') + f'{resposta_id:010d}/'
+        conexao.execute(resposta.update().where(resposta.c.id == resposta_id)
+                        .values(caminho=caminhos[resposta_id]))
+
+
+def downgrade():
+    with op.batch_alter_table('resposta', schema=None) as batch_op:
+        batch_op.drop_index('ix_resposta_topico_caminho')
+        batch_op.drop_column('caminho')
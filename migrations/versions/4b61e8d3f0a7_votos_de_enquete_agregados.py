@@ -0,0 +1,55 @@
+"""Votos de enquete: contador por opção e um voto por usuário por enquete
+
+Revision ID: 4b61e8d3f0a7
+Revises: 3a07c5d2e91f
+Create Date: 2026-10-19 18:12:26.471953
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b61e8d3f0a7'
+down_revision = '3a07c5d2e91f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('enquete_opcao', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('votos_count', sa.Integer(), nullable=False, server_default='0'))
+
+    with op.batch_alter_table('enquete_voto', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('topico_id', sa.Integer(), nullable=True))
+
+    op.execute(
+        'UPDATE enquete_voto SET topico_id = ('
+        'SELECT enquete_opcao.topico_id FROM enquete_opcao WHERE enquete_opcao.id = enquete_voto.opcao_id)'
+    )
+    # Votos repetidos na mesma enquete (antes só havia checagem no código): fica o primeiro
+    op.execute(
+        'DELETE FROM enquete_voto WHERE id NOT IN ('
+        'SELECT MIN(id) FROM enquete_voto GROUP BY user_id, topico_id)'
+    )
+    op.execute(
+        'UPDATE enquete_opcao SET votos_count = ('
+        'SELECT COUNT(*) FROM enquete_voto WHERE enquete_voto.opcao_id = enquete_opcao.id)'
+    )
+
+    with op.batch_alter_table('enquete_voto', schema=None) as batch_op:
+        batch_op.alter_column('topico_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key('fk_enquete_voto_topico_id_topico', 'topico', ['topico_id'], ['id'])
+        batch_op.drop_constraint('_user_opcao_voto_uc', type_='unique')
+        batch_op.create_unique_constraint('_user_topico_voto_uc', ['user_id', 'topico_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('enquete_voto', schema=None) as batch_op:
+        batch_op.drop_constraint('_user_topico_voto_uc', type_='unique')
+        batch_op.create_unique_constraint('_user_opcao_voto_uc', ['user_id', 'opcao_id'])
+        batch_op.drop_constraint('fk_enquete_voto_topico_id_topico', type_='foreignkey')
+        batch_op.drop_column('topico_id')
+
+    with op.batch_alter_table('enquete_opcao', schema=None) as batch_op:
+        batch_op.drop_column('votos_count')
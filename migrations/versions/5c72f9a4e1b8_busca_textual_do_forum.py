@@ -0,0 +1,87 @@
+"""Índice de busca textual do fórum (FTS5 no SQLite, tsvector + GIN no PostgreSQL)
+
+Revision ID: 5c72f9a4e1b8
+Revises: 4b61e8d3f0a7
+Create Date: 2026-10-19 18:47:03.205116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5c72f9a4e1b8'
+down_revision = '4b61e8d3f0a7'
+branch_labels = None
+depends_on = None
+
+
+def _upgrade_sqlite():
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS busca_forum USING fts5("
+        "titulo, conteudo, topico_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    op.execute(
+        "INSERT INTO busca_forum (rowid, titulo, conteudo, topico_id) "
+        "SELECT id * 2, titulo, conteudo, id FROM topico"
+    )
+    op.execute(
+        "INSERT INTO busca_forum (rowid, titulo, conteudo, topico_id) "
+        "SELECT id * 2 + 1, NULL, conteudo, topico_id FROM resposta"
+    )
+
+
+def _upgrade_postgres():
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute("""
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'siif_portugues') THEN
+                CREATE TEXT SEARCH CONFIGURATION siif_portugues (COPY = portuguese);
+                ALTER TEXT SEARCH CONFIGURATION siif_portugues
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+            END IF;
+        END $$
+    """)
+    op.create_table(
+        'busca_forum',
+        sa.Column('id', sa.BigInteger(), primary_key=True),
+        sa.Column('topico_id', sa.Integer(), nullable=False),
+        sa.Column('titulo', sa.Text(), nullable=True),
+        sa.Column('conteudo', sa.Text(), nullable=True),
+        sa.Column('documento', postgresql.TSVECTOR(), nullable=True),
+    )
+    op.create_index('ix_busca_forum_documento', 'busca_forum', ['documento'], postgresql_using='gin')
+    op.create_index('ix_busca_forum_topico_id', 'busca_forum', ['topico_id'])
+
+    documento = (
+        "setweight(to_tsvector('siif_portugues', coalesce({titulo}, '')), 'A') || "
+        "setweight(to_tsvector('siif_portugues', coalesce(conteudo, '')), 'B')"
+    )
+    op.execute(
+        "INSERT INTO busca_forum (id, topico_id, titulo, conteudo, documento) "
+        "SELECT id * 2, id, titulo, conteudo, " + documento.format(titulo='titulo') + " FROM topico"
+    )
+    op.execute(
+        "INSERT INTO busca_forum (id, topico_id, titulo, conteudo, documento) "
+        "SELECT id * 2 + 1, topico_id, NULL, conteudo, " + documento.format(titulo='NULL') + " FROM resposta"
+    )
+
+
+def upgrade():
+    dialeto = op.get_bind().dialect.name
+    if dialeto == 'sqlite':
+        _upgrade_sqlite()
+    elif dialeto == 'postgresql':
+        _upgrade_postgres()
+
+
+def downgrade():
+    dialeto = op.get_bind().dialect.name
+    if dialeto == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS busca_forum")
+    elif dialeto == 'postgresql':
+        op.drop_index('ix_busca_forum_topico_id', table_name='busca_forum')
+        op.drop_index('ix_busca_forum_documento', table_name='busca_forum')
+        op.drop_table('busca_forum')
+        op.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS siif_portugues")
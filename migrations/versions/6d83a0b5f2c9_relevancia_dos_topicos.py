@@ -0,0 +1,58 @@
+"""Relevância pré-calculada dos tópicos (feed "em alta")
+
+Revision ID: 6d83a0b5f2c9
+Revises: 5c72f9a4e1b8
+Create Date: 2026-10-19 19:20:41.630275
+
+"""
+import math
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d83a0b5f2c9'
+down_revision = '5c72f9a4e1b8'
+branch_labels = None
+depends_on = None
+
+
+def _relevancia(interacoes, criado_em):
+    # Mesma fórmula de app/relevancia.py (HORAS_POR_ORDEM = 12, EPOCA = 2024-01-01)
+    criado_em = criado_em or datetime.now(timezone.utc).replace(tzinfo=None)
+    if criado_em.tzinfo is not None:
+        criado_em = criado_em.astimezone(timezone.utc).replace(tzinfo=None)
+    horas = (criado_em - datetime(2024, 1, 1)).total_seconds() / 3600
+    return math.log10(1 + max(interacoes or 0, 0)) + horas / 12
+
+
+def upgrade():
+    with op.batch_alter_table('topico', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('interacoes', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('relevancia', sa.Float(), nullable=False, server_default='0'))
+        batch_op.create_index('ix_topico_relevancia_id', ['relevancia', 'id'], unique=False)
+
+    # Likes valem 1, respostas 2 e salvos 3
+    op.execute(
+        'UPDATE topico SET interacoes = '
+        '(SELECT COUNT(*) FROM post_like WHERE post_like.topico_id = topico.id) + '
+        '2 * (SELECT COUNT(*) FROM resposta WHERE resposta.topico_id = topico.id) + '
+        '3 * (SELECT COUNT(*) FROM post_salvo WHERE post_salvo.topico_id = topico.id)'
+    )
+
+    conexao = op.get_bind()
+    topico = sa.table('topico', sa.column('id', sa.Integer), sa.column('interacoes', sa.Integer),
+                      sa.column('criado_em', sa.DateTime), sa.column('relevancia', sa.Float))
+    for topico_id, interacoes, criado_em in conexao.execute(
+            sa.select(topico.c.id, topico.c.interacoes, topico.c.criado_em)).all():
+        conexao.execute(topico.update().where(topico.c.id == topico_id)
+                        .values(relevancia=_relevancia(interacoes, criado_em)))
+
+
+def downgrade():
+    with op.batch_alter_table('topico', schema=None) as batch_op:
+        batch_op.drop_index('ix_topico_relevancia_id')
+        batch_op.drop_column('relevancia')
+        batch_op.drop_column('interacoes')
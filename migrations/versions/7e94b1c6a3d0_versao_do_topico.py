@@ -0,0 +1,26 @@
+"""Versão do tópico (chave do cache de fragmentos dos cards)
+
+Revision ID: 7e94b1c6a3d0
+Revises: 6d83a0b5f2c9
+Create Date: 2026-10-19 19:58:12.904417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e94b1c6a3d0'
+down_revision = '6d83a0b5f2c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('topico', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('versao', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('topico', schema=None) as batch_op:
+        batch_op.drop_column('versao')
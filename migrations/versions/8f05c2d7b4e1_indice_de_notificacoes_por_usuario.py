@@ -0,0 +1,26 @@
+"""Índice (usuario_id, id) para a listagem de notificações sem filtro
+
+Revision ID: 8f05c2d7b4e1
+Revises: 7e94b1c6a3d0
+Create Date: 2026-10-19 21:12:40.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f05c2d7b4e1'
+down_revision = '7e94b1c6a3d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notificacao', schema=None) as batch_op:
+        batch_op.create_index('ix_notificacao_usuario_id', ['usuario_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notificacao', schema=None) as batch_op:
+        batch_op.drop_index('ix_notificacao_usuario_id')
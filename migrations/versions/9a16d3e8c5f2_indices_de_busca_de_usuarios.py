@@ -0,0 +1,39 @@
+"""Índices que a busca por prefixo de usuários consegue usar
+
+Troca ix_user_name (nunca usado: a busca é sem diferenciar maiúsculas) por
+lower(name); no PostgreSQL os índices usam text_pattern_ops para o LIKE 'termo%'.
+
+Revision ID: 9a16d3e8c5f2
+Revises: 8f05c2d7b4e1
+Create Date: 2026-10-19 21:40:06.771942
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a16d3e8c5f2'
+down_revision = '8f05c2d7b4e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_name')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_index('ix_user_nome_minusculo', 'user', [sa.text('lower(name) text_pattern_ops')])
+        op.create_index('ix_user_matricula_padrao', 'user', [sa.text('matricula text_pattern_ops')])
+    else:
+        op.create_index('ix_user_nome_minusculo', 'user', [sa.text('lower(name)')])
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_user_matricula_padrao', table_name='user')
+    op.drop_index('ix_user_nome_minusculo', table_name='user')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_name', ['name'], unique=False)
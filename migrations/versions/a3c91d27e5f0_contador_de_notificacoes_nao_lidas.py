@@ -0,0 +1,39 @@
+"""Contador de notificações não lidas e índice da tabela de notificações
+
+Revision ID: a3c91d27e5f0
+Revises: 4617117b9b96
+Create Date: 2026-10-19 09:12:41.503112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c91d27e5f0'
+down_revision = '4617117b9b96'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('notificacoes_nao_lidas', sa.Integer(), nullable=False, server_default='0'))
+
+    with op.batch_alter_table('notificacao', schema=None) as batch_op:
+        batch_op.create_index('ix_notificacao_usuario_lida_id', ['usuario_id', 'lida', 'id'], unique=False)
+
+    # Preenche o contador com o que já existe na tabela
+    op.execute(
+        'UPDATE "user" SET notificacoes_nao_lidas = ('
+        'SELECT COUNT(*) FROM notificacao '
+        'WHERE notificacao.usuario_id = "user".id AND notificacao.lida = false)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('notificacao', schema=None) as batch_op:
+        batch_op.drop_index('ix_notificacao_usuario_lida_id')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('notificacoes_nao_lidas')
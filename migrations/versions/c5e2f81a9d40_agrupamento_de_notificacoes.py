@@ -0,0 +1,36 @@
+"""Agrupamento de notificações e índice de membros por comunidade
+
+Revision ID: c5e2f81a9d40
+Revises: a3c91d27e5f0
+Create Date: 2026-10-19 11:04:18.220931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e2f81a9d40'
+down_revision = 'a3c91d27e5f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notificacao', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('chave_agrupamento', sa.String(length=120), nullable=True))
+        batch_op.add_column(sa.Column('total_agrupado', sa.Integer(), nullable=False, server_default='1'))
+        batch_op.create_index('ix_notificacao_chave_lida', ['chave_agrupamento', 'lida'], unique=False)
+
+    with op.batch_alter_table('membros_comunidade', schema=None) as batch_op:
+        batch_op.create_index('ix_membros_comunidade_comunidade_id', ['comunidade_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('membros_comunidade', schema=None) as batch_op:
+        batch_op.drop_index('ix_membros_comunidade_comunidade_id')
+
+    with op.batch_alter_table('notificacao', schema=None) as batch_op:
+        batch_op.drop_index('ix_notificacao_chave_lida')
+        batch_op.drop_column('total_agrupado')
+        batch_op.drop_column('chave_agrupamento')
@@ -0,0 +1,26 @@
+"""Índice no nome do usuário (busca por prefixo do painel admin)
+
+Revision ID: d81b7c04e6a2
+Revises: c5e2f81a9d40
+Create Date: 2026-10-19 13:37:02.118304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81b7c04e6a2'
+down_revision = 'c5e2f81a9d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_name'), ['name'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_name'))
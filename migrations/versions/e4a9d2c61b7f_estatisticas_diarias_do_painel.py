@@ -0,0 +1,37 @@
+"""Estatísticas diárias do painel admin
+
+Revision ID: e4a9d2c61b7f
+Revises: d81b7c04e6a2
+Create Date: 2026-10-19 15:02:47.630195
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a9d2c61b7f'
+down_revision = 'd81b7c04e6a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('estatistica_diaria',
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('posts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('uploads', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('usuarios_ativos', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('dia')
+    )
+    op.create_table('usuario_ativo_dia',
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('dia', 'user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('usuario_ativo_dia')
+    op.drop_table('estatistica_diaria')
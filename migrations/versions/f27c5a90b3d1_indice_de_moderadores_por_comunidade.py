@@ -0,0 +1,26 @@
+"""Índice de moderadores por comunidade (selos de moderador nos posts)
+
+Revision ID: f27c5a90b3d1
+Revises: e4a9d2c61b7f
+Create Date: 2026-10-19 15:02:44.530817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f27c5a90b3d1'
+down_revision = 'e4a9d2c61b7f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('moderadores_comunidade', schema=None) as batch_op:
+        batch_op.create_index('ix_moderadores_comunidade_comunidade_id', ['comunidade_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('moderadores_comunidade', schema=None) as batch_op:
+        batch_op.drop_index('ix_moderadores_comunidade_comunidade_id')
@@ -6,4 +6,9 @@ app = create_app()
 if __name__ == '__main__':
     debug = os.getenv("DEBUG", True)
 
+    # Servidor de desenvolvimento: garante tabelas e admin (em produção: flask siif init)
+    from app.comandos import inicializar_banco
+    with app.app_context():
+        inicializar_banco()
+
     app.run(debug=debug)